@@ -1,9 +1,21 @@
 from django.contrib import admin
 from django.urls import path
 from django.shortcuts import render, redirect
-from django.db.models import Count
+from django.db.models import Avg, Count, DateTimeField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Abs, Coalesce, TruncDate
+from django.utils import timezone
+from datetime import timedelta
 from django import forms
-from .models import Keyword, NewsArticle
+from django.utils.html import format_html
+from .fetch_cache import get_fetch_cache
+from .governor import BACKGROUND, INTERACTIVE, get_governor, sync_quota_usage
+from .metrics import COUNTER, METRICS, get_metrics, histogram_summaries, live_samples
+from .models import (
+    ApiQuotaUsage, ApiToken, FetchCursor, Keyword, KeywordLanguage, KeywordStats, NewsArticle, RefreshJob, Source,
+)
+from .retention import read_archived
+from .search import filter_matching
+from .trending import SUBSCRIBERS, WINDOWS, top_trending
 
 
 class CustomIntervalForm(forms.Form):
@@ -18,14 +30,25 @@ class CustomIntervalForm(forms.Form):
 
 @admin.register(Keyword)
 class KeywordAdmin(admin.ModelAdmin):
-    list_display = ('keyword', 'user', 'last_searched', 'custom_refresh_interval')
+    list_display = ('keyword', 'user', 'last_searched', 'custom_refresh_interval', 'adaptive_interval',
+                    'next_refresh_at', 'custom_retention_days')
     search_fields = ('keyword', 'user__username')
+    # Maintained by the background refresh (see news/cadence.py).
+    readonly_fields = ('next_refresh_at', 'arrival_rate', 'adaptive_interval', 'predicted_yield', 'last_yield')
+
+    def save_model(self, request, obj, form, change):
+        """Reschedules the next background refresh when the interval changes."""
+        if 'custom_refresh_interval' in form.changed_data or 'last_searched' in form.changed_data:
+            obj.next_refresh_at = obj.get_next_refresh_at()
+        super().save_model(request, obj, form, change)
 
     def get_urls(self):
         """Adds the custom dashboard URL to the admin URLs."""
         urls = super().get_urls()
         custom_urls = [
             path('dashboard/', self.admin_site.admin_view(self.dashboard_view), name='keyword_dashboard'),
+            path('fetch-cache/', self.admin_site.admin_view(self.fetch_cache_view), name='keyword_fetch_cache'),
+            path('metrics/', self.admin_site.admin_view(self.metrics_view), name='keyword_metrics'),
         ]
         return custom_urls + urls
 
@@ -37,9 +60,14 @@ class KeywordAdmin(admin.ModelAdmin):
                 keyword_text = form.cleaned_data['keyword_text']
                 interval = form.cleaned_data['interval']
 
-                # Update all keywords with this text across all users
-                updated_count = Keyword.objects.filter(text__iexact=keyword_text).update(
-                    custom_refresh_interval=interval)
+                # Update all keywords with this text across all users, and
+                # reschedule them from their last search with the new interval.
+                next_refresh_at = ExpressionWrapper(
+                    Coalesce(F('last_searched'), Value(timezone.now())) + Value(timedelta(seconds=interval)),
+                    output_field=DateTimeField()
+                )
+                updated_count = Keyword.objects.filter(keyword__iexact=keyword_text).update(
+                    custom_refresh_interval=interval, next_refresh_at=next_refresh_at)
 
                 if updated_count > 0:
                     self.message_user(request,
@@ -50,22 +78,221 @@ class KeywordAdmin(admin.ModelAdmin):
         else:
             form = CustomIntervalForm()
 
-        # Calculate trending keywords (most users tracking the same keyword text)
-        trending_keywords = Keyword.objects.values('text').annotate(
-            user_count=Count('user', distinct=True)
-        ).order_by('-user_count')[:10]
+        # Trending keywords come from the incrementally maintained counters,
+        # ranked by article velocity in a window or by number of subscribers.
+        window = request.GET.get('window', '24h')
+        if window != SUBSCRIBERS and window not in WINDOWS:
+            window = '24h'
+        trending_keywords = top_trending(window, limit=10)
+
+        # How well the adaptive intervals' rates predicted the last refreshes.
+        measured = Keyword.objects.filter(predicted_yield__isnull=False)
+        cadence_summary = measured.aggregate(
+            keywords=Count('id'),
+            predicted=Sum('predicted_yield'),
+            actual=Sum('last_yield'),
+            mean_error=Avg(Abs(F('predicted_yield') - F('last_yield'))),
+        )
+        cadence_keywords = measured.select_related('user').order_by('-last_searched')[:20]
 
         context = dict(
             self.admin_site.each_context(request),
             trending_keywords=trending_keywords,
+            trending_window=window,
+            trending_windows=list(WINDOWS) + [SUBSCRIBERS],
+            cadence_summary=cadence_summary,
+            cadence_keywords=cadence_keywords,
             form=form,
             title="Keywords Dashboard"
         )
         return render(request, "admin/keyword_dashboard.html", context)
 
+    def fetch_cache_view(self, request):
+        """Shows the News API response cache counters, with a button to clear it."""
+        cache = get_fetch_cache()
+        if request.method == 'POST':
+            cache.clear()
+            self.message_user(request, "Cleared the News API response cache.")
+            return redirect('.')
+
+        context = dict(
+            self.admin_site.each_context(request),
+            stats=cache.stats(),
+            backend=type(cache).__name__,
+            ttl=cache.ttl,
+            max_entries=cache.max_entries,
+            title="News API Response Cache"
+        )
+        return render(request, "admin/fetch_cache.html", context)
+
+    def metrics_view(self, request):
+        """Summarizes the hot-path timings and counters served on /metrics, with a button to reset them."""
+        metrics = get_metrics()
+        if request.method == 'POST':
+            metrics.reset()
+            self.message_user(request, "Reset the recorded metrics.")
+            return redirect('.')
+
+        def label_text(labels):
+            return ', '.join(f'{label}={value}' for label, value in labels.items())
+
+        samples = metrics.samples()
+        counters = [
+            (name, label_text(labels), value)
+            for name, labels, value in samples if name in METRICS and METRICS[name][0] == COUNTER
+        ]
+        context = dict(
+            self.admin_site.each_context(request),
+            stages=histogram_summaries(samples, 'news_stage_seconds', 'stage'),
+            views=histogram_summaries(samples, 'news_view_seconds', 'view'),
+            counters=counters,
+            live=[(name, label_text(labels), value) for name, _, _, labels, value in live_samples()],
+            title="Hot-Path Metrics"
+        )
+        return render(request, "admin/metrics.html", context)
+
 
 @admin.register(NewsArticle)
 class NewsArticleAdmin(admin.ModelAdmin):
-    list_display = ('title', 'keyword', 'source_name', 'language', 'published_at')
-    list_filter = ('language', 'source_name', 'keyword')
+    list_display = ('title', 'keyword', 'source', 'language', 'published_at', 'archived_at')
+    # The source choices are read from the Source table, not from the articles.
+    list_filter = ('language', 'source', 'keyword', ('archived_at', admin.EmptyFieldListFilter))
+    list_select_related = ('keyword', 'source')
     search_fields = ('title', 'keyword__keyword')
+    autocomplete_fields = ('source',)
+    readonly_fields = ('archived_at', 'archived_text')
+
+    @admin.display(description='Archived description and content')
+    def archived_text(self, obj):
+        """Shows the text of an archived article, read back from its archive segment."""
+        record = read_archived(obj)
+        if record is None:
+            return '-'
+        return format_html('{}<br><br>{}', record['description'], record['content'])
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Matches the search box against the full-text index instead of running
+        LIKE '%...%' over titles, plus exact keyword text.
+        """
+        if not search_term:
+            return queryset, False
+        matches = filter_matching(queryset, search_term) | queryset.filter(keyword__keyword__iexact=search_term)
+        return matches, False
+
+
+@admin.register(Source)
+class SourceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+
+
+@admin.register(KeywordStats)
+class KeywordStatsAdmin(admin.ModelAdmin):
+    list_display = ('keyword', 'language', 'article_count', 'newest_published_at', 'oldest_published_at')
+    list_filter = ('language',)
+    search_fields = ('keyword__keyword',)
+    list_select_related = ('keyword',)
+    # Maintained by ingestion; edit with the rebuild_keyword_stats command instead.
+    readonly_fields = ('keyword', 'language', 'article_count', 'newest_published_at',
+                       'oldest_published_at', 'source_counts')
+
+
+@admin.register(KeywordLanguage)
+class KeywordLanguageAdmin(admin.ModelAdmin):
+    list_display = ('keyword', 'language', 'last_viewed_at')
+    list_filter = ('language',)
+    search_fields = ('keyword__keyword',)
+    list_select_related = ('keyword',)
+
+
+@admin.register(FetchCursor)
+class FetchCursorAdmin(admin.ModelAdmin):
+    list_display = ('text', 'language', 'next_page', 'from_date', 'to_date', 'updated_at')
+    list_filter = ('language',)
+    search_fields = ('text',)
+
+
+@admin.register(RefreshJob)
+class RefreshJobAdmin(admin.ModelAdmin):
+    list_display = ('text', 'language', 'due_at', 'lease_owner', 'lease_expires_at', 'attempts', 'created_at')
+    list_filter = ('language',)
+    search_fields = ('text', 'lease_owner')
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'created_at', 'last_used_at')
+    search_fields = ('user__username', 'name')
+    list_select_related = ('user',)
+    # Tokens are issued with the create_api_token command, which shows the secret once.
+    readonly_fields = ('user', 'digest', 'created_at', 'last_used_at')
+
+    def has_add_permission(self, request):
+        """Hides the add form; tokens are issued with the create_api_token command."""
+        return False
+
+
+@admin.register(ApiQuotaUsage)
+class ApiQuotaUsageAdmin(admin.ModelAdmin):
+    list_display = ('hour', 'channel', 'requests', 'rate_limited', 'errors')
+    list_filter = ('channel',)
+    date_hierarchy = 'hour'
+    # Copied from the governor's counters; see news.governor.sync_quota_usage.
+    readonly_fields = ('hour', 'channel', 'requests', 'rate_limited', 'errors')
+
+    def get_urls(self):
+        """Adds the quota chart URL to the admin URLs."""
+        urls = super().get_urls()
+        custom_urls = [
+            path('chart/', self.admin_site.admin_view(self.chart_view), name='api_quota_chart'),
+        ]
+        return custom_urls + urls
+
+    def chart_view(self, request):
+        """Charts News API calls per hour for the last two days and per day for the last 30 days."""
+        governor = get_governor()
+        sync_quota_usage(governor)
+        now = timezone.now()
+
+        hourly = self._chart_rows(
+            ApiQuotaUsage.objects.filter(hour__gte=now - timedelta(hours=48)).values('hour', 'channel')
+            .annotate(total=Sum('requests'), limited=Sum('rate_limited'), failed=Sum('errors')),
+            'hour',
+        )
+        daily = self._chart_rows(
+            ApiQuotaUsage.objects.filter(hour__gte=now - timedelta(days=30)).annotate(day=TruncDate('hour'))
+            .values('day', 'channel')
+            .annotate(total=Sum('requests'), limited=Sum('rate_limited'), failed=Sum('errors')),
+            'day',
+        )
+        context = dict(
+            self.admin_site.each_context(request),
+            hourly=hourly,
+            daily=daily,
+            daily_quota=governor.daily_quota,
+            remaining_interactive=governor.remaining(INTERACTIVE),
+            remaining_background=governor.remaining(BACKGROUND),
+            title="News API Quota Usage"
+        )
+        return render(request, "admin/api_quota_chart.html", context)
+
+    @staticmethod
+    def _chart_rows(usage, period_field):
+        """
+        Folds per-channel usage into one row per period, with bar widths as a
+        percentage of the busiest period.
+        """
+        rows = {}
+        for entry in usage.order_by(period_field):
+            row = rows.setdefault(entry[period_field], {
+                'period': entry[period_field], INTERACTIVE: 0, BACKGROUND: 0, 'rate_limited': 0, 'errors': 0,
+            })
+            row[entry['channel']] += entry['total']
+            row['rate_limited'] += entry['limited']
+            row['errors'] += entry['failed']
+        peak = max((row[INTERACTIVE] + row[BACKGROUND] for row in rows.values()), default=0) or 1
+        for row in rows.values():
+            row['interactive_width'] = 100 * row[INTERACTIVE] / peak
+            row['background_width'] = 100 * row[BACKGROUND] / peak
+        return list(rows.values())
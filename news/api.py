@@ -0,0 +1,331 @@
+"""
+JSON API for scripts and analytics jobs.
+
+Every endpoint authenticates with an `ApiToken` sent as
+`Authorization: Bearer <token>` (issue one with `manage.py create_api_token`)
+and answers in JSON; errors are `{"error": "..."}` with a 4xx or 5xx status.
+
+    GET  /api/v1/keywords/                  the user's keywords
+    POST /api/v1/keywords/                  track a keyword: {"keyword": "tesla", "language": "en"}
+    GET  /api/v1/keywords/<id>/articles/    one page of a keyword's articles
+    POST /api/v1/keywords/<id>/refresh/     fetch new articles now: {"language": "en"}
+    GET  /api/v1/export/                    every matching article, streamed
+
+Article lists take the keyword page's filters (`language`, `source` (an id),
+`source_name`, `start_date`, `end_date`, `sort=oldest`, `copies=all`), `fields` to choose
+the article fields returned, and keyset cursors: pass a page's `next` value as
+`after` to read the following page. The export takes the same filters, an
+optional `keyword` id (all the user's keywords if missing) and `format`,
+`ndjson` (the default) or `csv`. It streams rows from a database iterator, so
+its memory use does not grow with the number of articles.
+"""
+import csv
+import json
+from functools import wraps
+from operator import attrgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .dedup import hide_copies
+from .interactive import fetch_and_save_articles
+from .languages import LANGUAGE_MAP, record_language_view
+from .models import ApiToken, FeedEntry, Keyword, KeywordArticle, KeywordStats
+from .pagination import paginate_keyset
+from .tasks import is_first_search_pending, queue_first_search
+from .utils import normalize_keyword_text
+from .views import filter_article_rows
+
+# Article fields the API can return, and where each is read from on a
+# KeywordArticle or FeedEntry row.
+ARTICLE_FIELDS = {
+    'id': 'article_id',
+    'title': 'article__title',
+    'description': 'article__description',
+    'content': 'article__content',
+    'url': 'article__url',
+    'url_to_image': 'article__url_to_image',
+    'source_id': 'source_id',
+    'source_name': 'article__source__name',
+    'published_at': 'published_at',
+    'language': 'language',
+    'cluster_id': 'article__cluster_id',
+}
+DEFAULT_ARTICLE_FIELDS = ('id', 'title', 'description', 'url', 'url_to_image', 'source_name', 'published_at',
+                          'language')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Rows fetched from the database at a time, and written per response chunk, by the export.
+EXPORT_CHUNK_SIZE = 2000
+# How often a token's last use is written, in seconds.
+LAST_USED_RESOLUTION = 60
+
+
+class ApiError(Exception):
+    """A client error, answered with its message and status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def token_required(view):
+    """
+    Authenticates API requests by their bearer token, sets `request.user`,
+    and turns ApiErrors raised by the view into JSON error responses.
+    """
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        api_token = None
+        if scheme.lower() == 'bearer' and token.strip():
+            api_token = ApiToken.objects.select_related('user__profile').filter(
+                digest=ApiToken.hash(token.strip())
+            ).first()
+        if api_token is None or not api_token.user.is_active:
+            response = _error('Missing or invalid API token.', 401)
+            response['WWW-Authenticate'] = 'Bearer'
+            return response
+        if api_token.user.profile.is_blocked:
+            return _error('This account is blocked.', 403)
+
+        now = timezone.now()
+        if api_token.last_used_at is None or (now - api_token.last_used_at).total_seconds() > LAST_USED_RESOLUTION:
+            ApiToken.objects.filter(pk=api_token.pk).update(last_used_at=now)
+        request.user = api_token.user
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return _error(str(e), e.status)
+    return wrapper
+
+
+def _request_data(request):
+    """Returns the fields of a JSON or form-encoded request body."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError('The request body is not valid JSON.')
+        if not isinstance(data, dict):
+            raise ApiError('The request body must be a JSON object.')
+        return data
+    return request.POST
+
+
+def _article_fields(params):
+    """Returns the article fields requested with `fields`, or the default ones."""
+    requested = params.get('fields', '').strip()
+    if not requested:
+        return DEFAULT_ARTICLE_FIELDS
+    fields = tuple(field.strip() for field in requested.split(',') if field.strip())
+    unknown = [field for field in fields if field not in ARTICLE_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(ARTICLE_FIELDS)}.")
+    return fields
+
+
+def _filtered_rows(rows, params, default_language='en'):
+    """
+    Applies the keyword page filters to KeywordArticle or FeedEntry rows,
+    rejecting malformed dates instead of failing on them.
+    """
+    for name in ('start_date', 'end_date'):
+        value = params.get(name, '').strip()
+        if value and not (parse_date(value) or parse_datetime(value)):
+            raise ApiError(f"'{name}' must be an ISO date, e.g. 2025-06-30.")
+    rows = filter_article_rows(rows, params, default_language)
+    return rows if params.get('copies') == 'all' else hide_copies(rows, rows)
+
+
+def _keyword_json(keyword, article_count):
+    return {
+        'id': keyword.id,
+        'keyword': keyword.keyword,
+        'created_at': keyword.created_at,
+        'last_searched': keyword.last_searched,
+        'next_refresh_at': keyword.next_refresh_at,
+        'article_count': article_count,
+    }
+
+
+@token_required
+@require_http_methods(['GET', 'POST'])
+def keywords(request):
+    """
+    Lists the user's keywords with their article counts, or starts tracking
+    a keyword within the user's keyword quota.
+
+    Tracking a new keyword queues its first search in the `language` given,
+    English by default. Answers 201 for a new keyword, 200 for one already
+    tracked and 403 when the quota is used up.
+    """
+    if request.method == 'GET':
+        article_counts = dict(
+            KeywordStats.objects.filter(keyword__user=request.user)
+            .values('keyword').annotate(total=Sum('article_count')).values_list('keyword', 'total')
+        )
+        return JsonResponse({
+            'results': [
+                _keyword_json(keyword, article_counts.get(keyword.id, 0))
+                for keyword in Keyword.objects.filter(user=request.user).order_by('-created_at')
+            ],
+            'keyword_quota': request.user.profile.keyword_quota,
+        })
+
+    data = _request_data(request)
+    keyword_text = normalize_keyword_text(str(data.get('keyword', '')))
+    language = str(data.get('language', 'en'))
+    if not keyword_text:
+        raise ApiError("'keyword' is required.")
+    if language not in LANGUAGE_MAP:
+        raise ApiError(f"Unknown language '{language}'.")
+
+    keyword = Keyword.objects.filter(user=request.user, keyword=keyword_text).first()
+    if keyword:
+        return JsonResponse(_keyword_json(keyword, keyword.stats.aggregate(total=Sum('article_count'))['total'] or 0))
+    quota = request.user.profile.keyword_quota
+    if Keyword.objects.filter(user=request.user).count() >= quota:
+        raise ApiError(f'You have reached your keyword limit of {quota}.', status=403)
+    keyword, _ = Keyword.objects.get_or_create(user=request.user, keyword=keyword_text)
+    record_language_view(keyword.id, language)
+    queue_first_search(keyword.id, language)
+    return JsonResponse(_keyword_json(keyword, 0), status=201)
+
+
+@token_required
+@require_http_methods(['GET'])
+def keyword_articles(request, keyword_id):
+    """
+    Returns one page of a keyword's articles, newest first unless
+    `sort=oldest`, with the cursors of the pages either side. `pending` is
+    true while the first search for the language is still running.
+    """
+    keyword = get_object_or_404(Keyword, id=keyword_id, user=request.user)
+    params = request.GET
+    fields = _article_fields(params)
+    try:
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("'limit' must be a number.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ApiError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}.")
+
+    rows = _filtered_rows(KeywordArticle.objects.filter(keyword=keyword), params)
+    # Load only the requested columns; `content` can be large.
+    columns = {'published_at', 'article'} | {ARTICLE_FIELDS[field].removesuffix('_id') for field in fields}
+    related = {column.rpartition('__')[0] for column in columns if '__' in column} or {'article'}
+    page = paginate_keyset(
+        rows.select_related(*related).only(*columns),
+        sort_field='published_at',
+        id_field='article_id',
+        per_page=limit,
+        descending=params.get('sort') != 'oldest',
+        after=params.get('after'),
+        before=params.get('before'),
+    )
+    getters = {field: attrgetter(ARTICLE_FIELDS[field].replace('__', '.')) for field in fields}
+    language = params.get('language', 'en').strip()
+    record_language_view(keyword.id, language)
+    return JsonResponse({
+        'results': [{field: getter(row) for field, getter in getters.items()} for row in page.items],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+        'pending': bool(language) and is_first_search_pending(keyword.id, language),
+    })
+
+
+@token_required
+@require_http_methods(['POST'])
+def refresh_keyword(request, keyword_id):
+    """
+    Fetches a keyword's new articles in one language now, as the page's
+    "Fetch New" button does. Answers 429 with Retry-After during the cooldown
+    after a search, and 502 if the news provider fails.
+    """
+    keyword = get_object_or_404(Keyword, id=keyword_id, user=request.user)
+    language = str(_request_data(request).get('language', 'en'))
+    if language not in LANGUAGE_MAP:
+        raise ApiError(f"Unknown language '{language}'.")
+    cooldown_left = keyword.search_cooldown_left()
+    if cooldown_left:
+        response = _error('This keyword was searched recently.', 429)
+        response['Retry-After'] = str(int(cooldown_left.total_seconds()) + 1)
+        return response
+
+    record_language_view(keyword.id, language)
+    new_count, error_message = fetch_and_save_articles(keyword, fetch_only_new=True, language=language)
+    if error_message:
+        return _error(error_message, 502)
+    return JsonResponse({'new_articles': new_count})
+
+
+class _Echo:
+    """A file-like object that returns what is written, for streaming csv rows."""
+
+    def write(self, value):
+        return value
+
+
+@token_required
+@require_http_methods(['GET'])
+def export_articles(request):
+    """
+    Streams every article matching the filters, of one keyword or of all the
+    user's keywords, as NDJSON (one JSON object per line) or CSV with a
+    header row.
+    """
+    params = request.GET
+    export_format = params.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        raise ApiError("'format' must be 'ndjson' or 'csv'.")
+    fields = _article_fields(params)
+
+    if params.get('keyword'):
+        if not params['keyword'].isdigit():
+            raise ApiError("'keyword' must be a keyword id.")
+        keyword = get_object_or_404(Keyword, id=params['keyword'], user=request.user)
+        rows = _filtered_rows(KeywordArticle.objects.filter(keyword=keyword), params)
+    else:
+        # Feed entries hold each article once across all the user's keywords.
+        rows = _filtered_rows(FeedEntry.objects.filter(user=request.user), params, default_language='')
+    order = '' if params.get('sort') == 'oldest' else '-'
+    values = rows.order_by(f'{order}published_at', f'{order}article_id').values_list(
+        *(ARTICLE_FIELDS[field] for field in fields)
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        header = writer.writerow(fields)
+        encode = lambda row: writer.writerow(  # noqa: E731
+            [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+        )
+        content_type = 'text/csv'
+    else:
+        header = ''
+        encode = lambda row: json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'  # noqa: E731
+        content_type = 'application/x-ndjson'
+
+    def stream():
+        chunk = [header]
+        for row in values:
+            chunk.append(encode(row))
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk)
+
+    response = StreamingHttpResponse(stream(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="articles.{export_format}"'
+    return response
@@ -0,0 +1,75 @@
+"""
+Resumable multi-page fetches.
+
+Both fetch paths walk `/v2/everything` page by page over a fixed `from`/`to`
+window, newest first, storing each page before fetching the next. When a
+walk stops with pages left (at the NEWS_FETCH_MAX_PAGES limit, on an error or
+because the process died), the page to continue from is kept in a
+`FetchCursor`, and the next fetch of the same keyword text and language
+resumes that window instead of starting over. Fixing `to` for the whole walk
+keeps newly published articles from shifting the remaining pages.
+
+Cursors belong to a keyword text and language, not to the keywords the
+stored pages were linked to. A keyword with no articles in the language yet
+therefore starts a new walk at page 1 instead, since resuming would skip the
+newest pages, which only the earlier keywords received. The new walk's
+cursor replaces the old one, and its window covers the old one's remaining
+pages.
+"""
+from dateutil import parser
+from django.utils import timezone
+
+from .fetch_cache import bucket_to_date
+from .models import FetchCursor
+
+
+def plan_walks(from_dates, fresh=()):
+    """
+    Decides where each fetch starts, resuming stored cursors.
+
+    Args:
+        from_dates (dict): The `from` ISO timestamp, or None, that a new walk
+            would use, by (keyword text, language).
+        fresh (set): Keys fetched for a keyword with no stored articles in
+            the language, which start a new walk even if a cursor exists.
+
+    Returns:
+        dict: A (from_date, to_date, start_page) tuple by (keyword text,
+            language). Keys with a cursor resume its window and page; the
+            others start a new walk at page 1, up to the current time bucket.
+    """
+    cursors = {
+        (cursor.text, cursor.language): cursor
+        for cursor in FetchCursor.objects.filter(
+            text__in={text for text, _ in from_dates}, language__in={language for _, language in from_dates}
+        )
+    }
+    to_date = bucket_to_date(timezone.now()).isoformat()
+    plans = {}
+    for key, from_date in from_dates.items():
+        cursor = cursors.get(key)
+        if cursor and key not in fresh:
+            plans[key] = (
+                cursor.from_date.isoformat() if cursor.from_date else None,
+                cursor.to_date.isoformat(),
+                cursor.next_page,
+            )
+        else:
+            plans[key] = (from_date, to_date, 1)
+    return plans
+
+
+def save_progress(text, language, from_date, to_date, page, more):
+    """
+    Records that `page` of a walk has been stored. Keeps a cursor on the next
+    page while `more` pages remain, and removes it once the window is done.
+    """
+    if more:
+        FetchCursor.objects.update_or_create(text=text, language=language, defaults={
+            'from_date': parser.isoparse(from_date) if from_date else None,
+            'to_date': parser.isoparse(to_date),
+            'next_page': page + 1,
+        })
+    elif page > 1:
+        # A walk only has a cursor once it has gone past its first page.
+        FetchCursor.objects.filter(text=text, language=language).delete()
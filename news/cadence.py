@@ -0,0 +1,106 @@
+"""
+Adaptive refresh intervals.
+
+A keyword for a breaking story gains articles every few minutes and a quiet
+one a few a week, so polling both on one interval wastes quota on the quiet
+one and lags on the busy one. After each background refresh, the new
+articles it linked to a keyword over the time since the previous search give
+an observed arrival rate, which is folded into `Keyword.arrival_rate` as an
+exponentially weighted moving average. The next interval is the time the
+keyword takes to gather NEWS_REFRESH_TARGET_YIELD articles at that rate,
+stretched for keywords nobody has opened lately, and kept between
+NEWS_REFRESH_MIN_INTERVAL and NEWS_REFRESH_MAX_INTERVAL. An admin's
+`custom_refresh_interval` still wins over it.
+
+Each refresh also stores the yield the previous rate predicted next to the
+one observed, for the admin dashboard.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Keyword, KeywordArticle, KeywordLanguage
+
+# Weight of the newest observation in the moving average.
+RATE_SMOOTHING = 0.3
+# Intervals are multiplied by this much for keywords not viewed for at least
+# this long (not viewed at all counts as the longest).
+IDLE_BACKOFF = ((timedelta(days=1), 2), (timedelta(days=7), 4))
+# Searches closer together than this say too little about the rate.
+MIN_OBSERVATION = timedelta(minutes=1)
+
+
+def estimate_rate(previous_rate, new_articles, elapsed):
+    """
+    Folds one observation into the moving average of articles per hour.
+
+    Args:
+        previous_rate (float): The current average, or None for the first observation.
+        new_articles (int): Articles found.
+        elapsed (timedelta): The time they arrived over.
+    """
+    observed = new_articles / (elapsed.total_seconds() / 3600)
+    if previous_rate is None:
+        return observed
+    return RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * previous_rate
+
+
+def adaptive_interval(rate, last_viewed_at, now):
+    """
+    Returns the refresh interval in seconds for an arrival rate in articles
+    per hour and the keyword's last view.
+    """
+    if rate:
+        interval = settings.NEWS_REFRESH_TARGET_YIELD / rate * 3600
+    else:
+        interval = settings.NEWS_REFRESH_MAX_INTERVAL
+    for idle, factor in reversed(IDLE_BACKOFF):
+        if last_viewed_at is None or now - last_viewed_at >= idle:
+            interval *= factor
+            break
+    return int(min(max(interval, settings.NEWS_REFRESH_MIN_INTERVAL), settings.NEWS_REFRESH_MAX_INTERVAL))
+
+
+def update_refresh_intervals(keywords, since, now=None):
+    """
+    Updates the arrival rate, yields and interval of keywords whose
+    background refresh finished, and schedules their next refresh.
+
+    Args:
+        keywords (list): The refreshed Keyword instances as loaded before the
+            refresh, so `last_searched` is the previous search.
+        since (datetime): When the refresh started; links created since then
+            are its yield.
+        now (datetime): When the refresh finished.
+    """
+    if not keywords:
+        return
+    now = now or timezone.now()
+    keyword_ids = [keyword.id for keyword in keywords]
+    yields = dict(
+        KeywordArticle.objects.filter(keyword_id__in=keyword_ids, created_at__gte=since)
+        .values('keyword').annotate(found=Count('id')).values_list('keyword', 'found')
+    )
+    last_views = dict(
+        KeywordLanguage.objects.filter(keyword_id__in=keyword_ids)
+        .values('keyword').annotate(last_viewed_at=Max('last_viewed_at')).values_list('keyword', 'last_viewed_at')
+    )
+
+    for keyword in keywords:
+        found = yields.get(keyword.id, 0)
+        # The first refresh fills the history rather than measuring arrivals.
+        if keyword.last_searched is not None and since - keyword.last_searched >= MIN_OBSERVATION:
+            elapsed = since - keyword.last_searched
+            if keyword.arrival_rate is not None:
+                keyword.predicted_yield = keyword.arrival_rate * elapsed.total_seconds() / 3600
+            keyword.arrival_rate = estimate_rate(keyword.arrival_rate, found, elapsed)
+            keyword.adaptive_interval = adaptive_interval(keyword.arrival_rate, last_views.get(keyword.id), now)
+        keyword.last_yield = found
+        keyword.next_refresh_at = now + timedelta(seconds=keyword.refresh_interval)
+
+    Keyword.objects.bulk_update(
+        keywords, ['arrival_rate', 'adaptive_interval', 'predicted_yield', 'last_yield', 'next_refresh_at'],
+        batch_size=500,
+    )
@@ -0,0 +1,217 @@
+"""
+Near-duplicate detection for syndicated articles.
+
+The same wire story is published under many URLs with the same or a lightly
+edited title and description. Two articles are copies when the character
+shingles of their title and description have a Jaccard similarity of at least
+MIN_SIMILARITY.
+
+Comparing every new article with every stored one would not scale, so each
+article gets a MinHash signature of its shingles, cut into BANDS bands of
+ROWS values. Each band is hashed into an indexed column; articles sharing any
+band value are candidates, found with an index lookup per band instead of a
+scan (locality-sensitive hashing). Copies almost always share a band, and
+only the few candidates are compared exactly.
+
+An article with a copy among earlier ones joins that article's cluster:
+`NewsArticle.cluster` points at the cluster's first article, and is null for
+the first article itself and for articles without copies. `ingest_articles`
+signs and clusters each page with one candidate query; `cluster_articles`
+does the same for stored articles.
+"""
+import hashlib
+import re
+import struct
+from datetime import timedelta
+
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.functions import Coalesce
+
+from .models import NewsArticle
+
+# Shingles with a Jaccard similarity at least this high are copies. Reworded
+# copies of one story score above it; templated headlines from one source
+# ("Stock market update: Power stocks up ...") mostly score below.
+MIN_SIMILARITY = 0.8
+SHINGLE_SIZE = 5
+# Texts with fewer shingles are too short to tell copies from different stories.
+MIN_SHINGLES = 20
+# With 5 bands of 3 values, two articles at MIN_SIMILARITY share a band 97% of
+# the time, and at 0.5 only 49%, which keeps the candidates few.
+BANDS = 5
+ROWS = 3
+BAND_FIELDS = tuple(f'minhash_band_{band}' for band in range(BANDS))
+# Copies are only looked for among articles published this close to each other.
+CLUSTER_WINDOW = timedelta(days=3)
+
+WORD_RE = re.compile(r'\w+')
+# The MinHash functions are the 32-bit words of one BLAKE2b digest per shingle,
+# which is much cheaper than hashing each shingle once per function. Changing
+# them needs `cluster_articles --rebuild`.
+HASH_WORDS = struct.Struct(f'>{BANDS * ROWS}I')
+
+
+def shingles(text):
+    """
+    Returns the set of SHINGLE_SIZE-character shingles of a text, ignoring
+    case and punctuation, or an empty set if the text is too short to compare.
+    """
+    normalized = ' '.join(WORD_RE.findall(text.lower()))
+    found = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return found if len(found) >= MIN_SHINGLES else set()
+
+
+def similarity(first, second):
+    """Returns the Jaccard similarity of two shingle sets."""
+    return len(first & second) / len(first | second)
+
+
+def article_shingles(title, description):
+    """Returns the shingles of an article's title and description."""
+    return shingles(f'{title} {description or ""}')
+
+
+def signature_bands(found):
+    """
+    Returns the band values of the MinHash signature of a non-empty shingle
+    set, one per BAND_FIELDS entry, as non-negative 31-bit integers.
+    """
+    hashes = [
+        HASH_WORDS.unpack(hashlib.blake2b(shingle.encode(), digest_size=HASH_WORDS.size).digest())
+        for shingle in found
+    ]
+    signature = [min(column) for column in zip(*hashes)]
+    bands = []
+    for band in range(BANDS):
+        rows = b''.join(value.to_bytes(4, 'big') for value in signature[band * ROWS:(band + 1) * ROWS])
+        bands.append(int.from_bytes(hashlib.blake2b(rows, digest_size=4).digest(), 'big') >> 1)
+    return tuple(bands)
+
+
+def sign_articles(articles):
+    """
+    Sets the band fields of NewsArticle instances from their title and
+    description; they stay null for texts too short to sign.
+
+    Returns:
+        dict: The shingles of each signed article, by URL, for `assign_clusters`.
+    """
+    signed = {}
+    for article in articles:
+        found = article_shingles(article.title, article.description)
+        bands = signature_bands(found) if found else (None,) * BANDS
+        for field, value in zip(BAND_FIELDS, bands):
+            setattr(article, field, value)
+        if found:
+            signed[article.url] = found
+    return signed
+
+
+def assign_clusters(articles, signed):
+    """
+    Puts NewsArticle instances signed by `sign_articles` into the cluster of
+    their most similar earlier copy, looking up the candidates for all of
+    them with one query.
+
+    Articles are only compared with the first article of each cluster, not
+    its copies, so a story syndicated thousands of times costs one candidate.
+    A copy among the stored articles sets `cluster_id` directly. A copy found
+    only earlier in `articles` itself may not have an id yet, so those are
+    returned for the caller to link once the rows exist.
+
+    Args:
+        articles (list): NewsArticle instances; the oldest copy of a story
+            in them starts its cluster.
+        signed (dict): The shingles of each signed article, by URL, as
+            returned by `sign_articles`.
+
+    Returns:
+        dict: The URL of the cluster's first article, by URL of each article
+            whose only copy is earlier in `articles`.
+    """
+    articles = sorted((article for article in articles if article.url in signed), key=lambda a: a.published_at)
+    if not articles:
+        return {}
+
+    any_band = Q()
+    for field in BAND_FIELDS:
+        any_band |= Q(**{f'{field}__in': {getattr(article, field) for article in articles}})
+    candidates = (
+        NewsArticle.objects.filter(
+            any_band,
+            cluster__isnull=True,
+            language__in={article.language for article in articles},
+            published_at__gte=min(article.published_at for article in articles) - CLUSTER_WINDOW,
+            published_at__lte=max(article.published_at for article in articles) + CLUSTER_WINDOW,
+        ).exclude(url__in=signed)
+        .order_by('published_at', 'id')
+        .values_list('id', 'language', 'published_at', 'title', 'description', *BAND_FIELDS)
+    )
+
+    # Bucket the candidates by band value, as the index did, so each article
+    # is only compared with the ones sharing a band.
+    buckets = {}
+    for article_id, language, published_at, title, description, *bands in candidates:
+        candidate = (article_shingles(title, description), language, published_at, article_id)
+        for key in enumerate(bands):
+            buckets.setdefault(key, []).append(candidate)
+
+    pending = {}
+    for article in articles:
+        found = signed[article.url]
+        best, cluster = MIN_SIMILARITY, None
+        for key in enumerate(getattr(article, field) for field in BAND_FIELDS):
+            for other, language, published_at, leader in buckets.get(key, ()):
+                if (language == article.language and abs(published_at - article.published_at) <= CLUSTER_WINDOW
+                        and (score := similarity(found, other)) >= best):
+                    best, cluster = score, leader
+        if isinstance(cluster, str):
+            # A cluster started by an earlier article in `articles`, known by URL.
+            pending[article.url] = cluster
+            article.cluster_id = None
+        else:
+            article.cluster_id = cluster
+        if cluster is None:
+            # Later articles in the page can be copies of this one.
+            for key in enumerate(getattr(article, field) for field in BAND_FIELDS):
+                buckets.setdefault(key, []).append((found, article.language, article.published_at, article.url))
+    return pending
+
+
+def link_pending_clusters(pending, ids_by_url):
+    """Points the articles `assign_clusters` left pending at their cluster's first article."""
+    NewsArticle.objects.bulk_update(
+        [NewsArticle(id=ids_by_url[url], cluster_id=ids_by_url[leader]) for url, leader in pending.items()],
+        ['cluster'],
+    )
+
+
+def hide_copies(rows, scope):
+    """
+    Drops the rows whose article is a copy of another article in `scope`, so
+    each cluster is shown once.
+
+    Args:
+        rows (QuerySet): KeywordArticle or FeedEntry rows to list.
+        scope (QuerySet): Rows of the same model whose articles are listed,
+            e.g. all of a keyword's links.
+    """
+    return rows.exclude(
+        Q(article__cluster__isnull=False) & Exists(scope.filter(article_id=OuterRef('article__cluster_id')))
+    )
+
+
+def cluster_source_counts(scope, articles):
+    """
+    Returns the number of distinct sources within `scope` of each article's
+    cluster, by article id, with one query for a whole page.
+    """
+    keys = {article.id: article.cluster_id or article.id for article in articles}
+    counts = dict(
+        scope.filter(Q(article_id__in=set(keys.values())) | Q(article__cluster_id__in=set(keys.values())))
+        .annotate(cluster_key=Coalesce('article__cluster_id', 'article_id'))
+        .values('cluster_key').order_by()
+        .annotate(sources=Count('source', distinct=True))
+        .values_list('cluster_key', 'sources')
+    )
+    return {article_id: counts.get(key, 1) for article_id, key in keys.items()}
@@ -0,0 +1,97 @@
+"""
+Per-user feeds merging all of a user's keywords.
+
+`FeedEntry` holds one row per user and article. `ingest_articles` calls
+`record_feed_entries` in the transaction that writes the keyword links, so a
+user's feed page is a keyset range scan over the user's own entries instead of
+an OR across the links of every keyword sorted over the whole article table.
+An article matching several of a user's keywords gets a single entry. Entries
+that lose their last link when a keyword is deleted are removed by
+`prune_feed`; `rebuild_feeds` recomputes feeds from the links.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import FeedEntry, KeywordArticle
+
+
+def record_feed_entries(keywords, links):
+    """
+    Adds newly linked articles to the feeds of the keywords' users.
+
+    Args:
+        keywords (list): The keywords the links were created for.
+        links (list): The new KeywordArticle instances.
+    """
+    user_by_keyword = {keyword.id: keyword.user_id for keyword in keywords}
+    entries = {}
+    for link in links:
+        key = (user_by_keyword[link.keyword_id], link.article_id)
+        if key not in entries:
+            entries[key] = FeedEntry(
+                user_id=key[0], article_id=link.article_id, language=link.language,
+                published_at=link.published_at, source_id=link.source_id,
+            )
+    # The article may already be in a feed through another of the user's keywords.
+    FeedEntry.objects.bulk_create(entries.values(), ignore_conflicts=True)
+
+
+def prune_feed(user_id):
+    """
+    Removes the articles no longer linked to any of a user's keywords from
+    their feed.
+
+    Returns:
+        int: The number of entries removed.
+    """
+    linked = KeywordArticle.objects.filter(keyword__user_id=user_id).values('article_id')
+    deleted, _ = FeedEntry.objects.filter(user_id=user_id).exclude(article_id__in=linked).delete()
+    return deleted
+
+
+def rebuild_feeds(user_ids=None):
+    """
+    Recomputes feeds from the keyword links.
+
+    Args:
+        user_ids (iterable): Users to rebuild; all users if None.
+
+    Returns:
+        int: The number of feed entries written.
+    """
+    links = KeywordArticle.objects.all()
+    entries = FeedEntry.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        links = links.filter(keyword__user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+
+    rebuilt = {}
+    for user_id, article_id, language, published_at, source_id in (
+        links.values_list('keyword__user_id', 'article_id', 'language', 'published_at', 'source_id')
+        .iterator(chunk_size=5000)
+    ):
+        if (user_id, article_id) not in rebuilt:
+            rebuilt[(user_id, article_id)] = FeedEntry(
+                user_id=user_id, article_id=article_id, language=language, published_at=published_at,
+                source_id=source_id,
+            )
+    with transaction.atomic():
+        entries.delete()
+        FeedEntry.objects.bulk_create(rebuilt.values(), batch_size=1000)
+    return len(rebuilt)
+
+
+def matched_keywords(user, article_ids):
+    """
+    Returns the texts of a user's keywords that matched each article, by
+    article id, with one query for a whole feed page.
+    """
+    matches = defaultdict(list)
+    for article_id, text in (
+        KeywordArticle.objects.filter(keyword__user=user, article_id__in=list(article_ids))
+        .order_by('keyword__keyword').values_list('article_id', 'keyword__keyword')
+    ):
+        matches[article_id].append(text)
+    return matches
@@ -0,0 +1,224 @@
+"""
+Response cache for News API queries.
+
+Both fetch paths look a query up here before calling the API, so users asking
+for the same keyword, language and time window within the TTL share one
+upstream call. Keys are built from the normalized keyword text, the language,
+the page number and the `from` and `to` dates rounded outwards to a bucket;
+the fetch paths send the rounded dates upstream too, so a cached page always
+covers the requested window.
+
+The backend is chosen with the NEWS_FETCH_CACHE setting:
+
+    NEWS_FETCH_CACHE = {
+        'BACKEND': 'news.fetch_cache.SQLiteFetchCache',
+        'OPTIONS': {'path': BASE_DIR / 'fetch_cache.sqlite3', 'max_entries': 512, 'ttl': 300},
+    }
+
+`LocMemFetchCache` keeps entries per process; `SQLiteFetchCache` keeps them in
+a separate SQLite file shared by all processes and kept across restarts. Both
+evict the least recently used entry once `max_entries` is reached, and count
+hits, misses and evictions for the admin.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .utils import normalize_keyword_text
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 512
+
+
+def bucket_from_date(from_date):
+    """
+    Rounds a `from` datetime down to the start of its NEWS_FETCH_CACHE_BUCKET
+    window, so nearby watermarks share a cache key.
+    """
+    bucket = settings.NEWS_FETCH_CACHE_BUCKET
+    timestamp = from_date.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % bucket, tz=dt_timezone.utc)
+
+
+def bucket_to_date(to_date):
+    """
+    Rounds a `to` datetime up to the end of its NEWS_FETCH_CACHE_BUCKET
+    window, the counterpart of `bucket_from_date`.
+    """
+    return bucket_from_date(to_date) + timedelta(seconds=settings.NEWS_FETCH_CACHE_BUCKET)
+
+
+def make_cache_key(keyword_text, language, from_date=None, to_date=None, page=1):
+    """Returns the cache key for one page of a query; dates are ISO strings or None."""
+    return '|'.join([
+        normalize_keyword_text(keyword_text), language or '', from_date or '', to_date or '', str(page)
+    ])
+
+
+class BaseFetchCache:
+    """
+    Interface for fetch cache backends. Values are JSON-serializable dicts
+    holding a News API page's `articles` and `totalResults`.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss or expiry."""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Stores `value` under `key` for `ttl` seconds."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        raise NotImplementedError
+
+    def stats(self):
+        """Returns a dict of entries, hits, misses, evictions and hit_rate."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _with_hit_rate(stats):
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+class LocMemFetchCache(BaseFetchCache):
+    """An in-process LRU cache. Each worker process has its own entries and counters."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self):
+        with self._lock:
+            return self._with_hit_rate(dict(self._counters, entries=len(self._entries)))
+
+
+class SQLiteFetchCache(BaseFetchCache):
+    """
+    An LRU cache in its own SQLite file, shared by the web and worker processes
+    and kept across restarts. It is separate from the main database so cache
+    writes never wait on the application's write lock.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        super().__init__(max_entries, ttl)
+        self.path = str(path)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)')
+            db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            db.executemany(
+                'INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)',
+                [('hits',), ('misses',), ('evictions',)],
+            )
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread.
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _count(self, db, name, amount=1):
+        db.execute('UPDATE counters SET value = value + ? WHERE name = ?', (amount, name))
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute('SELECT value, expires_at FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._count(db, 'misses')
+                return None
+            db.execute('UPDATE entries SET used_at = ? WHERE key = ?', (now, key))
+            self._count(db, 'hits')
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            excess = db.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute(
+                    'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used_at LIMIT ?)',
+                    (excess,),
+                )
+                self._count(db, 'evictions', excess)
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute('DELETE FROM entries')
+            db.execute('UPDATE counters SET value = 0')
+
+    def stats(self):
+        db = self._connect()
+        stats = dict(db.execute('SELECT name, value FROM counters').fetchall())
+        stats['entries'] = db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return self._with_hit_rate(stats)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fetch_cache():
+    """Returns the process-wide cache configured by NEWS_FETCH_CACHE."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = settings.NEWS_FETCH_CACHE
+                _cache = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _cache
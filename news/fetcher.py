@@ -0,0 +1,309 @@
+"""
+Fetch stage shared by user-triggered searches and the background refresh cycle.
+
+Pages come from the configured news provider (see `news.providers`). Every
+call goes through the fetch cache and the shared governor in `news.governor`,
+which keeps each channel within its share of the plan's rate and daily quota
+and decides how long to back off after a 429 or a server error.
+`request_page` serves the interactive searches one blocking call at a time.
+The background cycle runs on asyncio over a single pooled
+`aiohttp.ClientSession`, with a semaphore bounding how many calls are in
+flight and a per-request timeout.
+Each job walks its result pages in order, up to a page depth limit, and
+every fetched page is handed over a queue to one writer coroutine, which runs
+the database work on a single thread so SQLite only ever sees one writer.
+Pages are streamed one at a time, so a deep walk never holds more than one
+page per job in memory.
+"""
+import asyncio
+import sqlite3
+import time
+from typing import NamedTuple
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .fetch_cache import make_cache_key
+from .governor import (
+    BACKGROUND, BACKGROUND_MAX_WAIT, INTERACTIVE, INTERACTIVE_MAX_WAIT, RateLimitExceeded, get_governor,
+)
+from .metrics import FETCH, timed
+from .providers import ProviderError, get_provider
+
+
+class FetchJob(NamedTuple):
+    """
+    One upstream query for a keyword text and language.
+
+    Attributes:
+        keyword_text (str): The normalized keyword text to search for.
+        language (str): The language code to request.
+        keyword_ids (list): The ids of every Keyword sharing this query.
+        from_date (str): ISO timestamp to fetch from, or None for a full fetch.
+        to_date (str): ISO timestamp to fetch up to, or None for no upper bound.
+        start_page (int): The first page to fetch; above 1 when resuming.
+    """
+    keyword_text: str
+    language: str
+    keyword_ids: list
+    from_date: str = None
+    to_date: str = None
+    start_page: int = 1
+
+
+class FetchResult(NamedTuple):
+    """
+    One fetched page of a FetchJob, or the error that stopped the job.
+
+    Attributes:
+        job (FetchJob): The job the page belongs to.
+        articles (list): The page's article records.
+        error (str): An error message if the page couldn't be fetched.
+        page (int): The page number.
+        more (bool): True if further pages exist after this one.
+        last (bool): True if this is the job's final page in this cycle.
+    """
+    job: FetchJob
+    articles: list
+    error: str = None
+    page: int = 1
+    more: bool = False
+    last: bool = True
+
+
+class CycleStats(NamedTuple):
+    """Counts and wall time for one `run_refresh_cycle` call."""
+    fetched: int
+    failed: int
+    elapsed: float
+    pages: int = 0
+
+    @property
+    def jobs_per_second(self):
+        return (self.fetched + self.failed) / self.elapsed if self.elapsed else 0.0
+
+
+def has_more_pages(page, article_count, total_results, page_size):
+    """Returns True if results remain after `page`, judging by a page's size and the reported total."""
+    if article_count < page_size:
+        return False
+    return total_results is None or page * page_size < total_results
+
+
+def page_cache_key(provider, job, page):
+    """Returns the fetch cache key for one page of a FetchJob from `provider`."""
+    return f'{provider.name}:' + make_cache_key(job.keyword_text, job.language, job.from_date, job.to_date, page)
+
+
+def request_page(provider, job, page, page_size=None, governor=None, cache=None, max_retries=None):
+    """
+    Fetches one page of a FetchJob, blocking, for user-triggered searches.
+    Answers from `cache` when it holds the same page. Calls are admitted by
+    `governor` on its interactive channel; retryable failures are retried up
+    to `max_retries` times.
+
+    Returns:
+        dict: The page's article records as `articles` and `totalResults`.
+
+    Raises:
+        RateLimitExceeded: If the governor won't admit the call in time.
+        ProviderError: If the call fails for good.
+    """
+    cache_key = page_cache_key(provider, job, page)
+    if cache is not None:
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return payload
+
+    governor = governor or get_governor()
+    page_size = page_size or settings.NEWS_FETCH_PAGE_SIZE
+    if max_retries is None:
+        max_retries = settings.NEWS_API_MAX_RETRIES
+    attempt = 0
+    while True:
+        governor.acquire(INTERACTIVE, INTERACTIVE_MAX_WAIT)
+        try:
+            with timed(FETCH):
+                result = provider.fetch_page(job, page, page_size)
+            break
+        except ProviderError as e:
+            if not e.retryable:
+                raise
+            error = e
+
+        delay = governor.report_failure(INTERACTIVE, error.status, error.rate_limit.retry_after, attempt)
+        if attempt >= max_retries:
+            raise error
+        attempt += 1
+        # The governor makes the next acquire wait out a 429's cooldown.
+        if error.status != 429:
+            time.sleep(delay)
+
+    payload = {'articles': result.articles, 'totalResults': result.total_results}
+    if cache is not None:
+        cache.set(cache_key, payload)
+    return payload
+
+
+async def fetch_page(session, provider, job, page, semaphore, governor, cache=None, page_size=None,
+                     max_retries=None):
+    """
+    The background counterpart of `request_page`: fetches one page of a
+    FetchJob on the governor's background channel, with at most as many
+    calls in flight as `semaphore` allows. The governor and the fetch cache
+    are SQLite files, so they are consulted on worker threads rather than on
+    the event loop, and a locked or unreadable file fails this job only.
+    Never raises.
+
+    Returns:
+        tuple: The page payload, a dict with `articles` and `totalResults`,
+            and an error message or None.
+    """
+    cache_key = page_cache_key(provider, job, page)
+    try:
+        if cache is not None:
+            payload = await asyncio.to_thread(cache.get, cache_key)
+            if payload is not None:
+                return payload, None
+
+        page_size = page_size or settings.NEWS_FETCH_PAGE_SIZE
+        if max_retries is None:
+            max_retries = settings.NEWS_API_MAX_RETRIES
+        attempt = 0
+        while True:
+            try:
+                await governor.acquire_async(BACKGROUND, BACKGROUND_MAX_WAIT)
+            except RateLimitExceeded as e:
+                return None, str(e)
+
+            async with semaphore:
+                try:
+                    with timed(FETCH):
+                        result = await provider.fetch_page_async(session, job, page, page_size)
+                    break
+                except ProviderError as e:
+                    if not e.retryable:
+                        return None, str(e)
+                    error = e
+
+            delay = await asyncio.to_thread(
+                governor.report_failure, BACKGROUND, error.status, error.rate_limit.retry_after, attempt
+            )
+            if attempt >= max_retries:
+                return None, str(error)
+            attempt += 1
+            # After a 429 the governor holds every caller back until the cooldown
+            # ends, so only other failures need a sleep here.
+            if error.status != 429:
+                await asyncio.sleep(delay)
+
+        payload = {'articles': result.articles, 'totalResults': result.total_results}
+        if cache is not None:
+            await asyncio.to_thread(cache.set, cache_key, payload)
+    except sqlite3.Error as e:
+        return None, f'Governor or fetch cache unavailable: {e}'
+    return payload, None
+
+
+async def fetch_job(session, provider, job, semaphore, governor, emit, cache=None,
+                    page_size=None, max_pages=None):
+    """
+    Walks the pages of a FetchJob from `job.start_page`, passing each one to
+    the `emit` coroutine as a FetchResult before fetching the next. Stops when
+    the results run out, after `max_pages` pages, or at the first error.
+    """
+    page_size = page_size or settings.NEWS_FETCH_PAGE_SIZE
+    max_pages = max_pages or settings.NEWS_FETCH_MAX_PAGES
+    last_page = job.start_page + max_pages - 1
+    page = job.start_page
+    while True:
+        payload, error = await fetch_page(session, provider, job, page, semaphore, governor, cache, page_size)
+        if error:
+            await emit(FetchResult(job, [], error, page))
+            return
+        articles = payload['articles']
+        more = has_more_pages(page, len(articles), payload.get('totalResults'), page_size)
+        last = not more or page >= last_page
+        await emit(FetchResult(job, articles, None, page, more, last))
+        if last:
+            return
+        page += 1
+
+
+async def run_refresh_cycle(jobs, save_result, concurrency=None, timeout=None, provider=None,
+                            cache=None, page_size=None, max_pages=None, governor=None):
+    """
+    Fetches every job concurrently and passes each page to `save_result`.
+
+    Args:
+        jobs (list): The FetchJobs to run.
+        save_result (callable): A synchronous function taking a FetchResult.
+            It is only ever called from one thread, one result at a time.
+        concurrency (int): Maximum requests in flight.
+        timeout (float): Per-request timeout in seconds.
+        provider (BaseProvider): Where to fetch from; defaults to the configured provider.
+        cache (BaseFetchCache): Response cache to consult; None disables it.
+        page_size (int): Articles requested per page.
+        max_pages (int): Maximum pages fetched per job.
+        governor (Governor): Admits each call; defaults to the shared governor.
+
+    Returns:
+        CycleStats: How many jobs were fetched and stored in full or failed
+            (a page couldn't be fetched or stored), the elapsed time and the
+            number of pages stored.
+    """
+    concurrency = concurrency or settings.NEWS_FETCH_CONCURRENCY
+    governor = governor or get_governor()
+    timeout = timeout or settings.NEWS_API_TIMEOUT
+    provider = provider or get_provider()
+
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(concurrency)
+    # A bounded queue applies back-pressure to the fetchers if the writer
+    # falls behind, so fetched pages don't pile up in memory.
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    write = sync_to_async(save_result, thread_sensitive=True)
+    counts = {'fetched': 0, 'failed': 0, 'pages': 0}
+    # Jobs with a page that couldn't be fetched or stored, by (keyword text, language).
+    failed_jobs = set()
+
+    async def writer():
+        while True:
+            result = await queue.get()
+            if result is None:
+                break
+            try:
+                await write(result)
+                stored = not result.error
+            except Exception as e:
+                print(f"FETCHER: Could not save results for '{result.job.keyword_text}': {e}")
+                stored = False
+            counts['pages'] += stored
+            job_key = (result.job.keyword_text, result.job.language)
+            if job_key in failed_jobs:
+                continue
+            if not stored:
+                failed_jobs.add(job_key)
+                counts['failed'] += 1
+            elif result.last:
+                counts['fetched'] += 1
+        await sync_to_async(connections.close_all, thread_sensitive=True)()
+
+    async def fetch_and_enqueue(session, job):
+        await fetch_job(session, provider, job, semaphore, governor, queue.put, cache, page_size, max_pages)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        writer_task = asyncio.create_task(writer())
+        await asyncio.gather(*(fetch_and_enqueue(session, job) for job in jobs))
+        await queue.put(None)
+        await writer_task
+
+    return CycleStats(counts['fetched'], counts['failed'], time.monotonic() - started, counts['pages'])
+
+
+def refresh(jobs, save_result, **options):
+    """Synchronous entry point for `run_refresh_cycle`, used by background tasks."""
+    return asyncio.run(run_refresh_cycle(jobs, save_result, **options))
@@ -0,0 +1,358 @@
+"""
+Shared governor for News API calls.
+
+Every upstream call asks the governor for permission first and reports
+failures back to it. Its state lives in a small SQLite file of its own
+(NEWS_API_GOVERNOR_PATH), so the web processes and the worker share one rate
+limit, one Retry-After cooldown and one set of counters; each decision is a
+single `BEGIN IMMEDIATE` transaction, so processes never over-admit.
+
+- Rate: NEWS_API_REQUESTS_PER_SECOND is split into two token buckets.
+  Interactive calls get NEWS_API_INTERACTIVE_SHARE of it and may borrow from
+  the background bucket; background refreshes only use their own, so a
+  refresh burst never makes a waiting user queue behind it.
+- Daily quota: NEWS_API_DAILY_QUOTA calls per UTC day (0 for no limit).
+  Background refreshes stop once they have used their share of it;
+  interactive calls may use whatever is left.
+- Failures: a 429 puts every process on a cooldown for its `Retry-After`, or
+  an exponential backoff with full jitter if there is none. Server and
+  network errors are retried after the same backoff.
+
+Calls are counted per hour and channel, and `sync_quota_usage` copies the
+counts into `ApiQuotaUsage` for the admin chart.
+"""
+import asyncio
+import email.utils
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ApiQuotaUsage
+
+INTERACTIVE = ApiQuotaUsage.INTERACTIVE
+BACKGROUND = ApiQuotaUsage.BACKGROUND
+# Responses worth retrying; anything else 4xx is a problem with the request.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# How long a caller may wait for permission before giving up. A user is
+# waiting on interactive calls; background calls give up and the keywords are
+# retried on a later cycle.
+INTERACTIVE_MAX_WAIT = 5
+BACKGROUND_MAX_WAIT = 60
+# Hourly counters are kept this long in the governor file.
+USAGE_RETENTION = timedelta(days=7)
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a call can't be made within the caller's wait limit, because
+    of the rate limit, a provider cooldown or a spent daily quota.
+
+    Attributes:
+        retry_after (float): Seconds until a call may be possible again.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Returns the delay in seconds given by a Retry-After header (seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=dt_timezone.utc)
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt, base, cap):
+    """Returns an exponential backoff with full jitter for a 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def hour_key(timestamp):
+    """Returns the ISO start of the UTC hour containing a Unix timestamp."""
+    hour = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return hour.isoformat()
+
+
+class Governor:
+    """
+    Rate limit, cooldown and quota state shared through a SQLite file.
+
+    Args:
+        path (str): The state file; ':memory:' keeps it private to one thread.
+        requests_per_second (float): Total rate allowed upstream; 0 disables limiting.
+        daily_quota (int): Calls allowed per UTC day; 0 for no limit.
+        interactive_share (float): Fraction of the rate and daily quota set
+            aside for interactive calls, from 0 to 1. At 0 interactive calls
+            only borrow from the background bucket; at 1 background calls are
+            never admitted.
+        backoff_base (float): First backoff delay in seconds.
+        backoff_cap (float): Longest backoff delay in seconds.
+    """
+
+    def __init__(self, path, requests_per_second=5, daily_quota=0, interactive_share=0.2,
+                 backoff_base=1.0, backoff_cap=60.0):
+        if not 0 <= interactive_share <= 1:
+            raise ValueError(f'The interactive share must be between 0 and 1, not {interactive_share}.')
+        self.path = str(path)
+        self.requests_per_second = requests_per_second
+        self.daily_quota = daily_quota
+        self.interactive_share = interactive_share
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rates = {
+            INTERACTIVE: requests_per_second * interactive_share,
+            BACKGROUND: requests_per_second * (1 - interactive_share),
+        }
+        self._local = threading.local()
+        db = self._connect()
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'channel TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        db.execute('CREATE TABLE IF NOT EXISTS cooldown (id INTEGER PRIMARY KEY, blocked_until REAL NOT NULL)')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS usage (hour TEXT NOT NULL, channel TEXT NOT NULL, '
+            'requests INTEGER NOT NULL DEFAULT 0, rate_limited INTEGER NOT NULL DEFAULT 0, '
+            'errors INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (hour, channel))'
+        )
+        db.executemany(
+            'INSERT OR IGNORE INTO buckets (channel, tokens, updated) VALUES (?, ?, ?)',
+            [(channel, self._capacity(channel), time.time()) for channel in self.rates],
+        )
+        db.execute('INSERT OR IGNORE INTO cooldown (id, blocked_until) VALUES (1, 0)')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, so keep one per
+        # thread; transactions are managed explicitly.
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _capacity(self, channel):
+        return max(1.0, self.rates[channel])
+
+    def _count(self, db, timestamp, channel, field):
+        db.execute(
+            f'INSERT INTO usage (hour, channel, {field}) VALUES (?, ?, 1) '
+            f'ON CONFLICT (hour, channel) DO UPDATE SET {field} = {field} + 1',
+            (hour_key(timestamp), channel),
+        )
+
+    def _used_today(self, db, now):
+        day = hour_key(now)[:10]
+        return dict(db.execute(
+            'SELECT channel, SUM(requests) FROM usage WHERE hour >= ? GROUP BY channel', (day,)
+        ).fetchall())
+
+    def _quota_left(self, used, channel):
+        if not self.daily_quota:
+            return None
+        if channel == BACKGROUND:
+            allowance = int(self.daily_quota * (1 - self.interactive_share))
+            return max(0, allowance - used.get(BACKGROUND, 0))
+        return max(0, self.daily_quota - sum(used.values()))
+
+    def _refill(self, db, channel, now):
+        tokens, updated = db.execute('SELECT tokens, updated FROM buckets WHERE channel = ?', (channel,)).fetchone()
+        return min(self._capacity(channel), tokens + (now - updated) * self.rates[channel])
+
+    def _take(self, channel):
+        """
+        Takes a token for one call if one is available. Returns 0 if the call
+        may go ahead, otherwise the seconds to wait before asking again.
+        """
+        now = time.time()
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            blocked_until = db.execute('SELECT blocked_until FROM cooldown').fetchone()[0]
+            if blocked_until > now:
+                db.execute('COMMIT')
+                return blocked_until - now
+
+            if self._quota_left(self._used_today(db, now), channel) == 0:
+                db.execute('COMMIT')
+                tomorrow = datetime.fromtimestamp(now, tz=dt_timezone.utc).date() + timedelta(days=1)
+                midnight = datetime.combine(tomorrow, datetime.min.time(), tzinfo=dt_timezone.utc)
+                raise RateLimitExceeded(f'The daily News API quota for {channel} calls is used up.',
+                                        retry_after=midnight.timestamp() - now)
+
+            wait = 0
+            if self.requests_per_second:
+                # Interactive calls fall back on the background bucket when
+                # their own share is spent; a channel without a share of the
+                # rate only has what it can borrow.
+                channels = [INTERACTIVE, BACKGROUND] if channel == INTERACTIVE else [BACKGROUND]
+                levels = {bucket: self._refill(db, bucket, now) for bucket in channels if self.rates[bucket]}
+                if not levels:
+                    db.execute('COMMIT')
+                    raise RateLimitExceeded(f'No share of the News API rate is set aside for {channel} calls.')
+                source = next((bucket for bucket, tokens in levels.items() if tokens >= 1), None)
+                if source is None:
+                    wait = min((1 - tokens) / self.rates[bucket] for bucket, tokens in levels.items())
+                elif source is not None:
+                    levels[source] -= 1
+                db.executemany(
+                    'UPDATE buckets SET tokens = ?, updated = ? WHERE channel = ?',
+                    [(tokens, now, bucket) for bucket, tokens in levels.items()],
+                )
+            if not wait:
+                self._count(db, now, channel, 'requests')
+            db.execute('COMMIT')
+            return wait
+        except BaseException:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+
+    def acquire(self, channel, max_wait=INTERACTIVE_MAX_WAIT):
+        """
+        Blocks until a call on `channel` may be made, and counts it.
+
+        Raises:
+            RateLimitExceeded: If that would take longer than `max_wait`
+                seconds, or the channel's daily quota is used up.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._take(channel)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f'News API rate limit reached; retry in {wait:.0f}s.', retry_after=wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, channel, max_wait=BACKGROUND_MAX_WAIT):
+        """
+        The asyncio counterpart of `acquire`. Each decision runs on a worker
+        thread, so a transaction waiting on the state file's lock doesn't
+        stall the event loop.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = await asyncio.to_thread(self._take, channel)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(f'News API rate limit reached; retry in {wait:.0f}s.', retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def report_failure(self, channel, status=None, retry_after=None, attempt=0):
+        """
+        Records a failed call and returns the seconds to wait before retrying.
+
+        A 429 also starts a cooldown shared by every process, lasting for
+        `Retry-After` if the response had one.
+
+        Args:
+            channel (str): INTERACTIVE or BACKGROUND.
+            status (int): The HTTP status, or None for a network error.
+            retry_after (str): The response's Retry-After header, if any.
+            attempt (int): How many retries this call has had already.
+        """
+        now = time.time()
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if status == 429:
+                header_delay = parse_retry_after(retry_after)
+                if header_delay is not None:
+                    # A little jitter so waiting callers don't all return at once.
+                    delay = header_delay + random.uniform(0, self.backoff_base)
+                db.execute('UPDATE cooldown SET blocked_until = MAX(blocked_until, ?)', (now + delay,))
+                self._count(db, now, channel, 'rate_limited')
+            else:
+                self._count(db, now, channel, 'errors')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return delay
+
+    def remaining(self, channel):
+        """Returns how many more calls `channel` may make today, or None if there is no daily quota."""
+        return self._quota_left(self._used_today(self._connect(), time.time()), channel)
+
+    def usage_since(self, since):
+        """Returns (hour, channel, requests, rate_limited, errors) rows for hours from `since` on."""
+        return self._connect().execute(
+            'SELECT hour, channel, requests, rate_limited, errors FROM usage WHERE hour >= ?',
+            (since.astimezone(dt_timezone.utc).isoformat(),),
+        ).fetchall()
+
+    def prune_usage(self, before):
+        """Deletes hourly counters for hours before `before`."""
+        self._connect().execute(
+            'DELETE FROM usage WHERE hour < ?', (before.astimezone(dt_timezone.utc).isoformat(),)
+        )
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Returns the process-wide governor configured by the NEWS_API_* settings."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = Governor(
+                    settings.NEWS_API_GOVERNOR_PATH,
+                    requests_per_second=settings.NEWS_API_REQUESTS_PER_SECOND,
+                    daily_quota=settings.NEWS_API_DAILY_QUOTA,
+                    interactive_share=settings.NEWS_API_INTERACTIVE_SHARE,
+                )
+    return _governor
+
+
+def sync_quota_usage(governor=None, hours=48):
+    """
+    Copies the governor's hourly counters for the last `hours` hours into
+    ApiQuotaUsage, and prunes counters the governor no longer needs.
+    """
+    governor = governor or get_governor()
+    now = datetime.now(dt_timezone.utc)
+    since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+    rows = governor.usage_since(since)
+    with transaction.atomic():
+        existing = {
+            (usage.hour, usage.channel): usage
+            for usage in ApiQuotaUsage.objects.filter(hour__gte=since)
+        }
+        changed, created = [], []
+        for hour, channel, requests, rate_limited, errors in rows:
+            hour = datetime.fromisoformat(hour)
+            usage = existing.get((hour, channel))
+            if usage is None:
+                created.append(ApiQuotaUsage(
+                    hour=hour, channel=channel, requests=requests, rate_limited=rate_limited, errors=errors
+                ))
+            elif (usage.requests, usage.rate_limited, usage.errors) != (requests, rate_limited, errors):
+                usage.requests, usage.rate_limited, usage.errors = requests, rate_limited, errors
+                changed.append(usage)
+        ApiQuotaUsage.objects.bulk_create(created)
+        ApiQuotaUsage.objects.bulk_update(changed, ['requests', 'rate_limited', 'errors'])
+    governor.prune_usage(now - USAGE_RETENTION)
+    return len(created) + len(changed)
@@ -0,0 +1,224 @@
+"""
+Bulk ingestion of fetched article pages.
+
+Both the interactive views and the background tasks hand a whole page of
+provider article records (see `news.providers`) to `ingest_articles`, which
+normalizes it in memory, resolves already-known URLs with a single query and
+writes the remainder in one transaction. Articles are stored once per URL and
+linked to every keyword the page was fetched for, so one API call can serve
+all users tracking the same keyword text. This keeps the number of round
+trips per page constant instead of two per article. The source names of new
+articles are interned into `Source` rows (see `news.sources`), whose id is
+copied onto the links like the language and date. New articles are signed
+and put into the cluster of any syndicated copy already stored (see
+`news.dedup`). The new links are added to each keyword's `KeywordStats` row,
+to the trending counters and to the users' feeds in the same transaction.
+Once the transaction commits, the new links are published to the live
+streams of `news.live`. The time spent finding copies and the rest of the
+transaction are recorded as the `dedup` and `write` stages of `news.metrics`.
+"""
+import time
+from functools import partial
+from typing import NamedTuple
+
+from dateutil import parser
+from django.db import transaction
+
+from .dedup import assign_clusters, link_pending_clusters, sign_articles
+from .feed import record_feed_entries
+from .live import publish_links
+from .metrics import DEDUP, WRITE, get_metrics
+from .models import Keyword, KeywordArticle, NewsArticle, Source
+from .sources import intern_sources
+from .stats import record_new_links
+from .trending import record_articles
+
+# Field limits mirrored from the models so a single over-long value can't
+# abort the whole bulk insert.
+URL_MAX_LENGTH = NewsArticle._meta.get_field('url').max_length
+TITLE_MAX_LENGTH = NewsArticle._meta.get_field('title').max_length
+SOURCE_NAME_MAX_LENGTH = Source._meta.get_field('name').max_length
+
+
+class IngestResult(NamedTuple):
+    """
+    Counts returned by `ingest_articles`.
+
+    `inserted` and `skipped` describe NewsArticle rows for the page, while
+    `linked` is the number of new keyword/article links across all keywords.
+    """
+    inserted: int
+    linked: int
+    skipped: int
+
+
+def normalize_article(article_data, language):
+    """
+    Converts one provider article record into a dict of NewsArticle field
+    values, with the source's name under `source_name` until it is interned.
+
+    Returns None for entries that can't be stored (no URL, title or publish
+    date, unparsable dates, or URLs longer than the column allows).
+    """
+    url = article_data.get('url')
+    title = article_data.get('title')
+    published_at = article_data.get('published_at')
+    if not url or not title or not published_at or len(url) > URL_MAX_LENGTH:
+        return None
+
+    try:
+        published_time = parser.isoparse(published_at)
+    except (TypeError, ValueError):
+        return None
+
+    url_to_image = article_data.get('url_to_image')
+    if url_to_image and len(url_to_image) > URL_MAX_LENGTH:
+        url_to_image = None
+
+    source_name = article_data.get('source_name') or 'Unknown Source'
+
+    return {
+        'title': title[:TITLE_MAX_LENGTH],
+        'description': article_data.get('description') or '',
+        'content': article_data.get('content') or '',
+        'url': url,
+        'url_to_image': url_to_image,
+        'published_at': published_time,
+        'source_name': source_name[:SOURCE_NAME_MAX_LENGTH],
+        'language': language,
+    }
+
+
+def normalize_articles(raw_articles, language):
+    """
+    Normalizes a page of article records, dropping invalid entries and repeated
+    URLs within the page. Returns a list of field dicts in API order.
+    """
+    records = []
+    seen_urls = set()
+    for article_data in raw_articles:
+        record = normalize_article(article_data, language)
+        if record is None or record['url'] in seen_urls:
+            continue
+        seen_urls.add(record['url'])
+        records.append(record)
+    return records
+
+
+def ingest_articles(keywords, raw_articles, language):
+    """
+    Stores a page of article records and links it to keywords.
+
+    Already-known URLs are resolved with one `url__in` query, the new rows are
+    written with a single `bulk_create` and the keyword links with another,
+    all inside one transaction, so the SQLite write lock is held once per
+    page rather than once per article.
+
+    Args:
+        keywords (Keyword or list): The keyword, or all keywords sharing the
+            same search text, the articles were fetched for.
+        raw_articles (list): The article records of a fetched page.
+        language (str): The language code the articles were requested in.
+
+    Returns:
+        IngestResult: How many articles were inserted, how many new keyword
+            links were created, and how many articles were skipped because
+            they were invalid, repeated or already stored.
+    """
+    if isinstance(keywords, Keyword):
+        keywords = [keywords]
+    keywords = list(keywords)
+    raw_articles = list(raw_articles)
+    records = normalize_articles(raw_articles, language)
+    metrics = get_metrics()
+    if not records or not keywords:
+        metrics.inc('news_articles_total', len(raw_articles), outcome='skipped')
+        return IngestResult(inserted=0, linked=0, skipped=len(raw_articles))
+
+    urls = [record['url'] for record in records]
+    stored_fields = ('url', 'id', 'language', 'published_at', 'source_id')
+    started = time.perf_counter()
+    dedup_seconds = 0.0
+    with transaction.atomic():
+        stored = {
+            url: fields
+            for url, *fields in NewsArticle.objects.filter(url__in=urls).values_list(*stored_fields)
+        }
+        new_records = [record for record in records if record['url'] not in stored]
+        source_ids = intern_sources(record['source_name'] for record in new_records) if new_records else {}
+        new_articles = [
+            NewsArticle(keyword=keywords[0], source_id=source_ids[record.pop('source_name')], **record)
+            for record in new_records
+        ]
+        if new_articles:
+            # Signatures are computed and copies looked up for the whole page at once.
+            dedup_started = time.perf_counter()
+            pending_clusters = assign_clusters(new_articles, sign_articles(new_articles))
+            dedup_seconds = time.perf_counter() - dedup_started
+            # ignore_conflicts covers a URL inserted by another writer between
+            # the lookup above and this insert; on SQLite the transaction
+            # already serializes the two statements. Such rows are left out
+            # of `new_articles`: only a row with this instance's created_at
+            # was written by this call.
+            NewsArticle.objects.bulk_create(new_articles, ignore_conflicts=True)
+            created_at = {article.url: article.created_at for article in new_articles}
+            inserted_urls = set()
+            for url, *fields, row_created_at in NewsArticle.objects.filter(
+                url__in=list(created_at)
+            ).values_list(*stored_fields, 'created_at'):
+                stored[url] = fields
+                if row_created_at == created_at[url]:
+                    inserted_urls.add(url)
+            new_articles = [article for article in new_articles if article.url in inserted_urls]
+            link_pending_clusters(pending_clusters, {url: fields[0] for url, fields in stored.items()})
+
+        existing_links = set(
+            KeywordArticle.objects.filter(
+                keyword__in=keywords, article_id__in=[fields[0] for fields in stored.values()]
+            ).values_list('keyword_id', 'article_id')
+        )
+        # Links copy the stored article's language, date and source so the
+        # keyword page can be served from the link table's indexes alone.
+        new_links = [
+            KeywordArticle(
+                keyword=keyword,
+                article_id=article_id,
+                language=article_language,
+                published_at=published_at,
+                source_id=source_id,
+            )
+            for keyword in keywords
+            for article_id, article_language, published_at, source_id in stored.values()
+            if (keyword.id, article_id) not in existing_links
+        ]
+        KeywordArticle.objects.bulk_create(new_links, ignore_conflicts=True)
+        if new_links:
+            # As for the articles, links another writer created first are
+            # dropped by ignore_conflicts and must not be counted again.
+            created_at = {(link.keyword_id, link.article_id): link.created_at for link in new_links}
+            created = set()
+            for keyword_id, article_id, row_created_at in KeywordArticle.objects.filter(
+                keyword__in=keywords, article_id__in={article_id for _, article_id in created_at}
+            ).values_list('keyword_id', 'article_id', 'created_at'):
+                key = (keyword_id, article_id)
+                if key not in created_at:
+                    continue
+                if row_created_at == created_at[key]:
+                    created.add(key)
+                else:
+                    existing_links.add(key)
+            new_links = [link for link in new_links if (link.keyword_id, link.article_id) in created]
+        record_new_links(new_links)
+        record_articles(keywords, new_links, existing_links)
+        record_feed_entries(keywords, new_links)
+        if new_links:
+            transaction.on_commit(partial(publish_links, new_links))
+
+    if dedup_seconds:
+        metrics.observe('news_stage_seconds', dedup_seconds, stage=DEDUP)
+    metrics.observe('news_stage_seconds', time.perf_counter() - started - dedup_seconds, stage=WRITE)
+    inserted = len(new_articles)
+    metrics.inc('news_articles_total', inserted, outcome='inserted')
+    metrics.inc('news_articles_total', len(raw_articles) - inserted, outcome='skipped')
+    metrics.inc('news_keyword_links_total', len(new_links))
+    return IngestResult(inserted=inserted, linked=len(new_links), skipped=len(raw_articles) - inserted)
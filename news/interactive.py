@@ -0,0 +1,73 @@
+"""
+User-triggered fetches.
+
+Fetches a single keyword in a single language, page by page, and stores each
+page through the shared ingestion path, going through the shared fetch cache
+and resuming unfinished walks (see `news.backfill`). The background refresh
+cycle uses `news.fetcher.run_refresh_cycle` instead. Calls are admitted by
+the shared governor on its interactive channel.
+"""
+from django.conf import settings
+from datetime import timedelta
+from .backfill import plan_walks, save_progress
+from .fetch_cache import bucket_from_date, get_fetch_cache
+from .fetcher import FetchJob, has_more_pages, request_page
+from .governor import RateLimitExceeded
+from .ingestion import ingest_articles
+from .providers import ProviderError, get_provider
+from .utils import normalize_keyword_text
+
+
+def fetch_and_save_articles(keyword, fetch_only_new=False, language='en'):
+    """
+    Fetches articles for a keyword from the news provider and saves them.
+
+    Used for user-triggered searches, both directly by views and from the
+    first-search background task.
+
+    Returns:
+        tuple: The number of articles newly linked to the keyword, and an
+            error message or None.
+    """
+    provider = get_provider()
+    configuration_error = provider.configuration_error()
+    if configuration_error:
+        print(f"ERROR: {configuration_error}")
+        return 0, configuration_error
+
+    keyword_text = normalize_keyword_text(keyword.keyword)
+    key = (keyword_text, language)
+
+    stats = keyword.stats.filter(language=language).first()
+    new_from_date = None
+    if fetch_only_new and stats and stats.newest_published_at:
+        new_from_date = bucket_from_date(stats.newest_published_at + timedelta(seconds=1)).isoformat()
+    # A keyword's first walk starts at page 1, not where another keyword's walk stopped.
+    from_date, to_date, start_page = plan_walks({key: new_from_date}, fresh={key} if stats is None else ())[key]
+    job = FetchJob(keyword_text, language, [keyword.id], from_date, to_date, start_page)
+
+    cache = get_fetch_cache()
+    page_size = settings.NEWS_FETCH_PAGE_SIZE
+    linked = 0
+    for page in range(start_page, start_page + settings.NEWS_FETCH_MAX_PAGES):
+        try:
+            payload = request_page(provider, job, page, page_size, cache=cache)
+        except (ProviderError, RateLimitExceeded) as e:
+            print(f"API Request failed: {e}")
+            if page == start_page:
+                if isinstance(e, RateLimitExceeded):
+                    return 0, f"The news provider's request limit has been reached. {e}"
+                return 0, f"Could not fetch news from the provider: {e}"
+            # Keep the pages already stored; the cursor resumes the rest.
+            break
+
+        # Each page is stored before the next is fetched.
+        articles = payload['articles']
+        linked += ingest_articles(keyword, articles, language).linked
+        more = has_more_pages(page, len(articles), payload.get('totalResults'), page_size)
+        save_progress(keyword_text, language, from_date, to_date, page, more)
+        if not more:
+            break
+
+    keyword.mark_searched()
+    return linked, None
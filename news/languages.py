@@ -0,0 +1,90 @@
+"""
+The languages each keyword is refreshed in.
+
+The keyword page shows one language at a time, and a user only reads the
+languages they pick, so the background refresh fetches each keyword in the
+languages it was viewed in within NEWS_REFRESH_LANGUAGE_DAYS, each
+(keyword text, language) pair from its own watermark in `KeywordStats`.
+Languages nobody has looked at lately are skipped rather than fetched on
+every cycle. A keyword not viewed in any language lately keeps the one it
+was viewed in last, so My News still gets its new articles, and a keyword
+never viewed at all is refreshed in DEFAULT_LANGUAGE. Only the codes of
+LANGUAGE_MAP are recorded, so a made-up `language` parameter can't make the
+refresh spend quota on it.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import KeywordLanguage
+
+# Mapping of language codes to full names
+LANGUAGE_MAP = {
+    'ar': 'Arabic',
+    'de': 'German',
+    'en': 'English',
+    'es': 'Spanish',
+    'fr': 'French',
+    'he': 'Hebrew',
+    'it': 'Italian',
+    'nl': 'Dutch',
+    'no': 'Norwegian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'sv': 'Swedish',
+    'zh': 'Chinese',
+}
+
+# The language of the keyword page when none is picked, and of the refresh of
+# keywords with no recorded views.
+DEFAULT_LANGUAGE = 'en'
+# A keyword viewed again in a language within this long isn't written again.
+LANGUAGE_VIEW_RESOLUTION = timedelta(hours=1)
+
+
+def record_language_view(keyword_id, language, now=None):
+    """
+    Records that a keyword was viewed in a language, unless this process
+    already did within LANGUAGE_VIEW_RESOLUTION. Unknown codes are ignored.
+    """
+    if language not in LANGUAGE_MAP:
+        return
+    cache_key = f'keyword-language:{keyword_id}:{language}'
+    if cache.get(cache_key):
+        return
+    KeywordLanguage.objects.update_or_create(
+        keyword_id=keyword_id, language=language, defaults={'last_viewed_at': now or timezone.now()}
+    )
+    cache.set(cache_key, True, LANGUAGE_VIEW_RESOLUTION.total_seconds())
+
+
+def refresh_languages(keywords, now=None):
+    """
+    Returns the languages to refresh each keyword in, with one query.
+
+    Args:
+        keywords (list): Keyword instances.
+        now (datetime): The reference time for recent views.
+
+    Returns:
+        dict: A list of language codes by keyword id.
+    """
+    since = (now or timezone.now()) - timedelta(days=settings.NEWS_REFRESH_LANGUAGE_DAYS)
+    viewed = {}
+    for keyword_id, language, last_viewed_at in KeywordLanguage.objects.filter(
+        keyword_id__in=[keyword.id for keyword in keywords]
+    ).order_by('-last_viewed_at').values_list('keyword_id', 'language', 'last_viewed_at'):
+        viewed.setdefault(keyword_id, []).append((language, last_viewed_at))
+
+    languages = {}
+    for keyword in keywords:
+        views = viewed.get(keyword.id)
+        if not views:
+            languages[keyword.id] = [DEFAULT_LANGUAGE]
+            continue
+        # Most recent first, so the fallback is the last language viewed.
+        recent = [language for language, last_viewed_at in views if last_viewed_at >= since]
+        languages[keyword.id] = recent or [views[0][0]]
+    return languages
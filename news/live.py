@@ -0,0 +1,467 @@
+"""
+Live article arrival, streamed to the keyword page as server-sent events.
+
+Whichever process ingests a page of articles (a web process for a "Fetch
+New", a worker for a refresh) publishes the keyword links it created, after
+its transaction commits, to a small event log in a SQLite file shared by
+every process (NEWS_LIVE_PATH). Each ASGI process runs one `LiveHub`: a
+single coroutine that reads the log every NEWS_LIVE_POLL_INTERVAL seconds,
+or straight away when the process published the events itself, renders the
+new articles' cards once and hands them to the connections subscribed to
+their keyword. An idle connection is only a queue and a coroutine waiting on
+it, so one process holds thousands, and streaming never calls the News API.
+
+Streams are served by `LiveStreamApplication`, which `asgi.py` puts in front
+of Django: Django's ASGI handler gives every request a thread of its own for
+as long as it runs, which a long-lived stream can't afford. Events are kept
+for EVENT_RETENTION, so a client that reconnects with `Last-Event-ID`
+receives what it missed.
+"""
+import asyncio
+import contextvars
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from importlib import import_module
+from types import SimpleNamespace
+from typing import NamedTuple
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http.cookie import parse_cookie
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+
+from .models import Keyword, NewsArticle
+
+# How long published events stay in the log for reconnecting clients.
+EVENT_RETENTION = 3600
+# Old events are deleted at most this often, in seconds.
+PRUNE_INTERVAL = 60
+# Events read from the log at a time.
+READ_BATCH = 1000
+# A comment is sent on idle streams this often, in seconds, so proxies keep
+# them open and closed connections are noticed.
+KEEPALIVE_INTERVAL = 15
+# Milliseconds the browser waits before reconnecting a dropped stream.
+RECONNECT_DELAY = 5000
+# Events a connection may fall behind by before it is told to reload.
+SUBSCRIBER_BACKLOG = 100
+# The article columns a card needs.
+CARD_FIELDS = ('title', 'description', 'url', 'url_to_image', 'source__name', 'published_at')
+
+
+class ArticleEvent(NamedTuple):
+    """
+    New articles linked to one keyword in one language by an ingested page.
+
+    Attributes:
+        id (int): The event's position in the log, sent as the SSE event id.
+        keyword_id (int): The keyword the articles were linked to.
+        language (str): The articles' language.
+        article_ids (list): The NewsArticle ids.
+    """
+    id: int
+    keyword_id: int
+    language: str
+    article_ids: list
+
+
+class ArticleEvents:
+    """
+    The event log in its SQLite file. Ids only ever grow, so a reader's
+    position is the last id it has seen.
+
+    Args:
+        path (str): The log file.
+        retention (float): Seconds events are kept.
+    """
+
+    def __init__(self, path, retention=EVENT_RETENTION):
+        self.path = str(path)
+        self.retention = retention
+        self._local = threading.local()
+        self._pruned_at = 0.0
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'keyword_id INTEGER NOT NULL, language TEXT NOT NULL, article_ids TEXT NOT NULL, '
+                'created REAL NOT NULL)'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS events_keyword ON events (keyword_id, id)')
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread.
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def publish(self, links):
+        """
+        Appends an event for each keyword and language among `links`.
+
+        Args:
+            links (list): New KeywordArticle instances.
+        """
+        article_ids = defaultdict(list)
+        for link in links:
+            article_ids[(link.keyword_id, link.language)].append(link.article_id)
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                'INSERT INTO events (keyword_id, language, article_ids, created) VALUES (?, ?, ?, ?)',
+                [(keyword_id, language, json.dumps(ids), now) for (keyword_id, language), ids in article_ids.items()],
+            )
+            if now - self._pruned_at >= PRUNE_INTERVAL:
+                db.execute('DELETE FROM events WHERE created < ?', (now - self.retention,))
+                self._pruned_at = now
+
+    def read(self, after, keyword_ids=None, limit=READ_BATCH):
+        """
+        Returns up to `limit` ArticleEvents after the id `after`, oldest
+        first, optionally only those of `keyword_ids`.
+        """
+        query = 'SELECT id, keyword_id, language, article_ids FROM events WHERE id > ?'
+        params = [after]
+        if keyword_ids is not None:
+            query += f" AND keyword_id IN ({', '.join('?' * len(keyword_ids))})"
+            params.extend(keyword_ids)
+        rows = self._connect().execute(query + ' ORDER BY id LIMIT ?', (*params, limit)).fetchall()
+        return [ArticleEvent(event_id, keyword_id, language, json.loads(ids))
+                for event_id, keyword_id, language, ids in rows]
+
+    def last_id(self):
+        """Returns the id of the last event published, or 0."""
+        row = self._connect().execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        return row[0] if row else 0
+
+
+_events = None
+_events_lock = threading.Lock()
+
+
+def get_article_events():
+    """Returns the process-wide event log at NEWS_LIVE_PATH."""
+    global _events
+    if _events is None:
+        with _events_lock:
+            if _events is None:
+                _events = ArticleEvents(settings.NEWS_LIVE_PATH)
+    return _events
+
+
+def publish_links(links):
+    """
+    Publishes new keyword links to the live streams. Called by the ingest
+    path once its transaction has committed; a failure is only printed.
+    """
+    try:
+        get_article_events().publish(links)
+    except sqlite3.Error as e:
+        print(f"LIVE: Could not publish {len(links)} new links: {e}")
+        return
+    if _hub is not None:
+        _hub.notify()
+
+
+def render_events(events):
+    """
+    Renders the article cards of events, loading each article once.
+
+    Returns:
+        list: (event, payload) pairs, with the payload as the JSON text of
+            the SSE `articles` event.
+    """
+    close_old_connections()
+    articles = NewsArticle.objects.select_related('source').only(*CARD_FIELDS).in_bulk(
+        {article_id for event in events for article_id in event.article_ids}
+    )
+    cards = {}
+    rendered = []
+    for event in events:
+        items = []
+        for article_id in event.article_ids:
+            if article_id not in articles:
+                continue
+            if article_id not in cards:
+                cards[article_id] = render_to_string('news/_article_card.html', {'article': articles[article_id]})
+            items.append({'id': article_id, 'html': cards[article_id]})
+        if items:
+            rendered.append((event, json.dumps({'language': event.language, 'articles': items})))
+    close_old_connections()
+    return rendered
+
+
+def format_event(data, event=None, event_id=None):
+    """Returns one server-sent event in the wire format."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in data.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """
+    One stream's place in the hub: the rendered events for its keyword and
+    language, waiting to be sent.
+
+    Attributes:
+        keyword_id (int): The keyword streamed.
+        language (str): The language streamed, or '' for all of them.
+        queue (asyncio.Queue): (event id, payload) pairs to send.
+        overflowed (bool): True once the stream fell SUBSCRIBER_BACKLOG
+            events behind and events were dropped.
+    """
+
+    def __init__(self, keyword_id, language):
+        self.keyword_id = keyword_id
+        self.language = language
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self.overflowed = False
+
+    def offer(self, event, payload):
+        """Queues an event if it is in the stream's language."""
+        if self.language and event.language != self.language:
+            return
+        try:
+            self.queue.put_nowait((event.id, payload))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class LiveHub:
+    """
+    Fans the event log out to the streams of one process. Its poll loop runs
+    on the process's event loop while anything is subscribed.
+
+    Args:
+        events (ArticleEvents): The event log.
+        poll_interval (float): Seconds between reads of the log.
+    """
+
+    def __init__(self, events, poll_interval):
+        self.events = events
+        self.poll_interval = poll_interval
+        self._subscriptions = defaultdict(set)
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+    def subscribe(self, keyword_id, language):
+        """Returns a new Subscription, starting the poll loop if it isn't running. Call from the event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._subscriptions.clear()
+            self._task = None
+        subscription = Subscription(keyword_id, language)
+        self._subscriptions[keyword_id].add(subscription)
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            # A context of its own, so the loop doesn't hold on to the request it was started from.
+            self._task = loop.create_task(self._run(), context=contextvars.Context())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Removes a Subscription; the poll loop stops after the last one."""
+        subscribers = self._subscriptions.get(subscription.keyword_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.keyword_id]
+
+    @property
+    def connections(self):
+        """The number of streams subscribed."""
+        return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+    def notify(self):
+        """Makes the poll loop read the log now. Safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is not None and wake is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wake.set)
+
+    async def _run(self):
+        read = sync_to_async(self._collect, thread_sensitive=False)
+        after = await sync_to_async(self.events.last_id, thread_sensitive=False)()
+        while self._subscriptions:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                after, rendered = await read(after, set(self._subscriptions))
+            except Exception as e:
+                print(f"LIVE: Could not read new events: {e}")
+                continue
+            for event, payload in rendered:
+                for subscription in list(self._subscriptions.get(event.keyword_id, ())):
+                    subscription.offer(event, payload)
+
+    def _collect(self, after, keyword_ids):
+        """Reads every event after `after` and renders those of `keyword_ids`. Returns the new position too."""
+        wanted = []
+        while True:
+            events = self.events.read(after)
+            if not events:
+                break
+            after = events[-1].id
+            wanted.extend(event for event in events if event.keyword_id in keyword_ids)
+            if len(events) < READ_BATCH:
+                break
+        return after, render_events(wanted) if wanted else []
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_live_hub():
+    """Returns the process-wide hub configured by the NEWS_LIVE_* settings."""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = LiveHub(get_article_events(), settings.NEWS_LIVE_POLL_INTERVAL)
+    return _hub
+
+
+async def stream_events(hub, keyword_id, language, after=None):
+    """
+    Yields the server-sent events of one stream: first the events after
+    `after` still in the log, then new ones as the hub delivers them, with a
+    keep-alive comment on idle intervals. A stream that falls too far behind
+    is told to reload. Unsubscribes when the client disconnects.
+
+    Args:
+        hub (LiveHub): The process's hub.
+        keyword_id (int): The keyword to stream.
+        language (str): The language to stream, or '' for all of them.
+        after (int): The last event id the client has, or None to start
+            from now.
+    """
+    # Subscribing before reading the log leaves no gap between the two.
+    subscription = hub.subscribe(keyword_id, language)
+    try:
+        missed = []
+        if after is None:
+            after = await sync_to_async(hub.events.last_id, thread_sensitive=False)()
+        else:
+            missed = await sync_to_async(_render_missed, thread_sensitive=False)(hub.events, keyword_id, after)
+        yield f'retry: {RECONNECT_DELAY}\n\n'
+        for event, payload in missed:
+            if not language or event.language == language:
+                yield format_event(payload, 'articles', event.id)
+            after = event.id
+        while not subscription.overflowed:
+            try:
+                event_id, payload = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            # The hub may deliver events the catch-up above already sent.
+            if event_id > after:
+                yield format_event(payload, 'articles', event_id)
+                after = event_id
+        yield format_event('{}', 'reload')
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def _render_missed(events, keyword_id, after):
+    return render_events(events.read(after, keyword_ids=[keyword_id]))
+
+
+def can_stream(cookie_header, keyword_id):
+    """
+    Returns True if the session in a request's Cookie header belongs to a
+    logged-in user who owns the keyword. Runs on a thread of the shared
+    pool, closing its database connection when done if it's old.
+    """
+    close_old_connections()
+    try:
+        session_key = parse_cookie(cookie_header).get(settings.SESSION_COOKIE_NAME)
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = get_user(SimpleNamespace(session=session))
+        return user.is_authenticated and Keyword.objects.filter(id=keyword_id, user=user).exists()
+    finally:
+        close_old_connections()
+
+
+class LiveStreamApplication:
+    """
+    An ASGI application that serves the `keyword_live` URL as a stream of
+    server-sent events and passes every other request on to Django.
+
+    Args:
+        application: The Django ASGI application.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            try:
+                match = resolve(scope['path'])
+            except Resolver404:
+                match = None
+            if match is not None and match.url_name == 'keyword_live':
+                await self.stream(scope, receive, send, match.kwargs['keyword_id'])
+                return
+        await self.application(scope, receive, send)
+
+    async def stream(self, scope, receive, send, keyword_id):
+        """Checks the session and streams the keyword's events until the client disconnects."""
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        if not await sync_to_async(can_stream, thread_sensitive=False)(headers.get('cookie', ''), keyword_id):
+            await send({'type': 'http.response.start', 'status': 403, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        language = query.get('language', [''])[0].strip()
+        after = headers.get('last-event-id') or query.get('after', [None])[0]
+        try:
+            after = int(after)
+        except (TypeError, ValueError):
+            after = None
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Keeps nginx from buffering the stream.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+
+        async def send_events():
+            async for chunk in stream_events(get_live_hub(), keyword_id, language, after):
+                await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(send_events()), asyncio.ensure_future(wait_for_disconnect())]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
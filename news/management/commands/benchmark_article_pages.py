@@ -0,0 +1,94 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from news.models import Keyword, KeywordArticle, NewsArticle
+from news.pagination import encode_cursor, paginate_keyset
+from news.sources import intern_sources
+from news.views import ARTICLE_CARD_FIELDS, ARTICLES_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks keyset pagination of the keyword articles page against OFFSET paging '
+            'at several article counts. All rows are written in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help='Articles per keyword to measure at, in increasing order.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement.')
+
+    def handle(self, *args, **options):
+        """
+        Grows a single keyword's article set to each size in turn and times the
+        first, middle and last pages with keyset cursors and with OFFSET.
+        """
+        with transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            keyword = Keyword.objects.create(user=user, keyword='benchmark')
+            links = (
+                KeywordArticle.objects.filter(keyword=keyword, language='en')
+                .select_related('article__source').only(*ARTICLE_CARD_FIELDS)
+            )
+            self.stdout.write(f"{'articles':>10} {'page':>7} {'keyset ms':>10} {'offset ms':>10}")
+
+            created = 0
+            for size in options['sizes']:
+                self._create_articles(keyword, created, size)
+                created = size
+                ordered = links.order_by('-published_at', '-article_id')
+                for label, offset in (('first', 0), ('middle', size // 2), ('last', size - ARTICLES_PER_PAGE)):
+                    cursor = None
+                    if offset:
+                        edge = ordered[offset - 1]
+                        cursor = encode_cursor(edge.published_at, edge.article_id)
+                    keyset = self._time(options['repeat'], lambda: paginate_keyset(
+                        links, 'published_at', 'article_id', ARTICLES_PER_PAGE, after=cursor))
+                    offset_paged = self._time(options['repeat'], lambda: list(
+                        ordered[offset:offset + ARTICLES_PER_PAGE]))
+                    self.stdout.write(f'{size:>10} {label:>7} {keyset:>10.2f} {offset_paged:>10.2f}')
+
+            transaction.set_rollback(True)
+
+    def _create_articles(self, keyword, start, end, batch_size=5000):
+        """Adds synthetic articles and links numbered start..end-1 to the keyword."""
+        base = timezone.now()
+        source_ids = intern_sources(f'Source {i}' for i in range(50))
+        for batch_start in range(start, end, batch_size):
+            batch = range(batch_start, min(batch_start + batch_size, end))
+            articles = NewsArticle.objects.bulk_create([
+                NewsArticle(
+                    keyword=keyword,
+                    title=f'Benchmark article {i}',
+                    description='Synthetic article used to benchmark pagination.',
+                    url=f'https://benchmark.local/{keyword.id}/{i}',
+                    published_at=base - timedelta(minutes=i),
+                    source_id=source_ids[f'Source {i % 50}'],
+                    language='en',
+                )
+                for i in batch
+            ])
+            # bulk_create doesn't set primary keys on every backend, so read them back.
+            article_ids = NewsArticle.objects.filter(
+                url__in=[article.url for article in articles]
+            ).values_list('id', 'published_at', 'source_id')
+            KeywordArticle.objects.bulk_create([
+                KeywordArticle(
+                    keyword=keyword, article_id=article_id, language='en', published_at=published_at,
+                    source_id=source_id,
+                )
+                for article_id, published_at, source_id in article_ids
+            ])
+
+    def _time(self, repeat, query):
+        """Returns the median wall time of `query` in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,173 @@
+import contextlib
+import secrets
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import RequestFactory
+from django.utils import timezone
+
+from news.ingestion import ingest_articles
+from news.models import Keyword, NewsArticle, TrendingKeyword
+from news.views import keyword_articles
+
+# What the sqlite profile sets up in settings.py, and SQLite's own defaults,
+# for --compare.
+TUNED = 'tuned'
+DEFAULTS = 'defaults'
+
+
+class Command(BaseCommand):
+    help = ("Measures the read throughput of the keyword page while an ingester writes new articles "
+            "for the same keyword, as the web process and the process_tasks worker do. Readers and "
+            "the writer are threads with their own database connections. Creates a throwaway user in "
+            "the configured database and deletes it afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=5000, help='Articles stored before the run.')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent page readers.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run for.')
+        parser.add_argument('--page-size', type=int, default=100, help='Articles per ingested page.')
+        parser.add_argument('--compare', action='store_true',
+                            help="On SQLite, also run with SQLite's default journal and locking settings.")
+
+    def handle(self, *args, **options):
+        """
+        Fills one keyword with `--articles` articles, then runs the readers
+        and the writer for `--duration` seconds and reports reads per second,
+        read latency, pages written and "database is locked" errors.
+        """
+        prefix = f'benchmark-{time.time_ns()}'
+        user = User.objects.create(username=prefix)
+        keyword = Keyword.objects.create(user=user, keyword=f'{prefix} topic', last_searched=timezone.now())
+        counter = iter(range(10 ** 9))
+
+        def page(size):
+            base = timezone.now()
+            return [
+                {
+                    'url': f'https://benchmark.local/{prefix}/{n}',
+                    # Random text, so the articles are not near-duplicates of each other.
+                    'title': f'Benchmark article {n} {secrets.token_hex(16)}',
+                    'description': secrets.token_hex(48),
+                    'published_at': (base - timedelta(seconds=n)).isoformat(),
+                    'source_name': f'Source {n % 50}',
+                }
+                for n in (next(counter) for _ in range(size))
+            ]
+
+        try:
+            for _ in range(0, options['articles'], 1000):
+                ingest_articles(keyword, page(1000), 'en')
+
+            profiles = [TUNED]
+            if options['compare'] and connection.vendor == 'sqlite':
+                profiles.append(DEFAULTS)
+            self.stdout.write(
+                f"{connection.vendor}, {options['readers']} readers, 1 writer, {options['duration']:.0f}s"
+            )
+            self.stdout.write(
+                f"{'profile':>9} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'pages/s':>8} {'locked':>7}"
+            )
+            for profile in profiles:
+                with self._profile(profile):
+                    result = self._run(keyword, page, options)
+                self.stdout.write(
+                    f"{profile:>9} {result['reads'] / options['duration']:>9.1f} {result['p50']:>8.1f} "
+                    f"{result['p95']:>8.1f} {result['pages'] / options['duration']:>8.1f} {result['locked']:>7}"
+                )
+        finally:
+            user.delete()
+            NewsArticle.objects.filter(url__startswith=f'https://benchmark.local/{prefix}/').delete()
+            TrendingKeyword.objects.filter(text__startswith=prefix).delete()
+
+    def _run(self, keyword, page, options):
+        """Runs the readers and the writer and returns their counts and read latencies."""
+        factory = RequestFactory()
+        stop = threading.Event()
+        latencies = []
+        counts = {'pages': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def reader():
+            timings = []
+            try:
+                while not stop.is_set():
+                    request = factory.get(f'/keyword/{keyword.id}/', {'language': 'en'})
+                    request.user = keyword.user
+                    request.session = SessionBase()
+                    started = time.perf_counter()
+                    try:
+                        keyword_articles(request, keyword.id)
+                    except OperationalError:
+                        with lock:
+                            counts['locked'] += 1
+                        continue
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(timings)
+
+        def writer():
+            try:
+                while not stop.is_set():
+                    try:
+                        ingest_articles(keyword, page(options['page_size']), 'en')
+                    except OperationalError:
+                        with lock:
+                            counts['locked'] += 1
+                        continue
+                    with lock:
+                        counts['pages'] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies.sort()
+        return {
+            'reads': len(latencies),
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            **counts,
+        }
+
+    @contextlib.contextmanager
+    def _profile(self, profile):
+        """
+        Opens the threads' connections with SQLite's default settings for
+        the `defaults` profile, and restores the configured ones afterwards.
+        """
+        if profile != DEFAULTS:
+            yield
+            return
+        database = connections['default'].settings_dict
+        tuned = database['OPTIONS']
+        self._switch_sqlite(database, {}, 'DELETE')
+        try:
+            yield
+        finally:
+            self._switch_sqlite(database, tuned, 'WAL')
+
+    def _switch_sqlite(self, database, options, journal_mode):
+        """
+        Replaces the options new SQLite connections are opened with and
+        switches the file's journal mode, which needs the only connection to it.
+        """
+        database['OPTIONS'] = options
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
@@ -0,0 +1,119 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from news.feed import matched_keywords, record_feed_entries
+from news.models import FeedEntry, Keyword, KeywordArticle, NewsArticle
+from news.pagination import encode_cursor, paginate_keyset
+from news.sources import intern_sources
+from news.views import ARTICLE_CARD_FIELDS, ARTICLES_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the first page of a user's merged feed read from the precomputed feed entries "
+            "against the same page queried across the links of every keyword. All rows are written in "
+            "a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keywords', type=int, default=50, help='Keywords tracked by the user.')
+        parser.add_argument('--articles', type=int, default=2000, help='Articles linked to each keyword.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement.')
+
+    def handle(self, *args, **options):
+        """
+        Gives one user `--keywords` keywords whose articles overlap, so some
+        articles match two keywords, and times the first and a deep page both ways.
+        """
+        with transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            Keyword.objects.bulk_create(
+                [Keyword(user=user, keyword=f'benchmark {i}') for i in range(options['keywords'])]
+            )
+            keywords = list(Keyword.objects.filter(user=user).order_by('id'))
+            self._create_articles(keywords, options['articles'])
+            self.stdout.write(
+                f"{len(keywords)} keywords, {FeedEntry.objects.filter(user=user).count()} feed entries, "
+                f"{KeywordArticle.objects.filter(keyword__user=user).count()} keyword links"
+            )
+
+            def feed_page(after=None):
+                page = paginate_keyset(
+                    FeedEntry.objects.filter(user=user).select_related('article__source').only(*ARTICLE_CARD_FIELDS),
+                    'published_at', 'article_id', ARTICLES_PER_PAGE, after=after,
+                )
+                matched_keywords(user, [entry.article_id for entry in page.items])
+                return page
+
+            def links_page(offset=0):
+                # What the feed costs without the precomputed table: the
+                # user's links across every keyword, deduplicated and sorted.
+                return list(
+                    NewsArticle.objects.filter(keyword_links__keyword__user=user).distinct()
+                    .select_related('source')
+                    .only('title', 'description', 'url', 'url_to_image', 'source__name', 'published_at')
+                    .order_by('-published_at', '-id')[offset:offset + ARTICLES_PER_PAGE]
+                )
+
+            deep = FeedEntry.objects.filter(user=user).count() // 2
+            edge = FeedEntry.objects.filter(user=user).order_by('-published_at', '-article_id')[deep - 1]
+            deep_cursor = encode_cursor(edge.published_at, edge.article_id)
+
+            self.stdout.write(f"{'page':>7} {'feed ms':>10} {'links ms':>10}")
+            for label, cursor, offset in (('first', None, 0), ('middle', deep_cursor, deep)):
+                feed = self._time(options['repeat'], lambda: feed_page(cursor))
+                links = self._time(options['repeat'], lambda: links_page(offset))
+                self.stdout.write(f'{label:>7} {feed:>10.2f} {links:>10.2f}')
+
+            transaction.set_rollback(True)
+
+    def _create_articles(self, keywords, per_keyword, batch_size=5000):
+        """
+        Links `per_keyword` synthetic articles to each keyword. Every other
+        article of a keyword is also linked to the next keyword.
+        """
+        base = timezone.now()
+        total = len(keywords) * per_keyword
+        source_ids = intern_sources(f'Source {i}' for i in range(50))
+        for batch_start in range(0, total, batch_size):
+            batch = range(batch_start, min(batch_start + batch_size, total))
+            NewsArticle.objects.bulk_create([
+                NewsArticle(
+                    title=f'Benchmark article {i}',
+                    description='Synthetic article used to benchmark the feed.',
+                    url=f'https://benchmark.local/feed/{keywords[0].id}/{i}',
+                    published_at=base - timedelta(minutes=i),
+                    source_id=source_ids[f'Source {i % 50}'],
+                    language='en',
+                )
+                for i in batch
+            ])
+            articles = NewsArticle.objects.filter(
+                url__in=[f'https://benchmark.local/feed/{keywords[0].id}/{i}' for i in batch]
+            ).values_list('id', 'published_at', 'source_id', 'url')
+            links = []
+            for article_id, published_at, source_id, url in articles:
+                i = int(url.rsplit('/', 1)[1])
+                owners = [i % len(keywords)] + ([(i + 1) % len(keywords)] if i % 2 else [])
+                links.extend(
+                    KeywordArticle(
+                        keyword=keywords[k], article_id=article_id, language='en', published_at=published_at,
+                        source_id=source_id,
+                    )
+                    for k in set(owners)
+                )
+            KeywordArticle.objects.bulk_create(links)
+            record_feed_entries(keywords, links)
+
+    def _time(self, repeat, query):
+        """Returns the median wall time of `query` in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
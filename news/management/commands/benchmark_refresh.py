@@ -0,0 +1,114 @@
+import asyncio
+import json
+import multiprocessing
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand
+
+from news.fetcher import FetchJob, run_refresh_cycle
+from news.governor import Governor
+from news.providers.newsapi import NewsAPIProvider
+
+
+def build_stub_response(keyword_text, page=1, page_size=20, total_results=20):
+    """Returns a synthetic `/v2/everything` response body for one page of a keyword's results."""
+    first = (page - 1) * page_size
+    articles = [
+        {
+            'source': {'id': None, 'name': f'Stub Source {i % 5}'},
+            'title': f'{keyword_text} story {i}',
+            'description': f'Synthetic article {i} about {keyword_text}.',
+            'url': f'https://stub.local/{keyword_text}/{i}',
+            'urlToImage': None,
+            'publishedAt': '2025-01-01T00:00:00Z',
+            'content': '',
+        }
+        for i in range(first, min(first + page_size, total_results))
+    ]
+    return json.dumps({'status': 'ok', 'totalResults': total_results, 'articles': articles}).encode()
+
+
+def serve_stub(port_queue, latency, total_results=20):
+    """
+    Runs a minimal keep-alive HTTP/1.1 server answering every GET with a stub
+    NewsAPI page after `latency` seconds, out of `total_results` results per
+    keyword. Started in a separate process so it doesn't compete with the
+    fetcher for the GIL.
+    """
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                target = request_line.split()[1].decode()
+                query = parse_qs(urlsplit(target).query)
+                keyword_text = query.get('q', ['stub'])[0].strip('"')
+                await asyncio.sleep(latency)
+                body = build_stub_response(
+                    keyword_text,
+                    page=int(query.get('page', [1])[0]),
+                    page_size=int(query.get('pageSize', [20])[0]),
+                    total_results=total_results,
+                )
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\n\r\n%s' % (len(body), body))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the background refresh fetcher against a local stub NewsAPI server '
+            'and reports keywords refreshed per second at several concurrency levels.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keywords', type=int, default=512, help='Keyword groups fetched per run.')
+        parser.add_argument('--latency', type=float, default=50, help='Stub server latency in milliseconds.')
+        parser.add_argument('--results', type=int, default=20,
+                            help='Results per keyword on the stub server; more than a page makes each job walk pages.')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128],
+                            help='Concurrency levels to measure.')
+
+    def handle(self, *args, **options):
+        """
+        Starts the stub server on a free local port in a child process and runs
+        one refresh cycle per concurrency level. Rate limiting is disabled with
+        a private in-memory governor and results are discarded by the writer,
+        so the numbers measure the fetch stage and writer hand-off.
+        """
+        port_queue = multiprocessing.Queue()
+        server = multiprocessing.Process(
+            target=serve_stub, args=(port_queue, options['latency'] / 1000, options['results']), daemon=True
+        )
+        server.start()
+        base_url = f'http://127.0.0.1:{port_queue.get(timeout=10)}/v2/'
+
+        jobs = [FetchJob(f'keyword{i}', 'en', [i]) for i in range(options['keywords'])]
+        self.stdout.write(f"{len(jobs)} keywords, stub latency {options['latency']:.0f} ms")
+        try:
+            for concurrency in options['concurrency']:
+                stats = asyncio.run(run_refresh_cycle(
+                    jobs,
+                    lambda result: None,
+                    concurrency=concurrency,
+                    governor=Governor(':memory:', requests_per_second=0),
+                    provider=NewsAPIProvider(base_url=base_url, api_key='benchmark'),
+                ))
+                self.stdout.write(
+                    f'concurrency={concurrency:>4}  {stats.jobs_per_second:8.1f} keywords/s  '
+                    f'({stats.fetched} ok, {stats.failed} failed, {stats.pages} pages, {stats.elapsed:.2f}s)'
+                )
+        finally:
+            server.terminate()
@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from news.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = ('Issues a JSON API token for a user and prints it. Only a digest is stored, so the token '
+            'cannot be shown again; revoke it by deleting it in the admin.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='The user the token acts as.')
+        parser.add_argument('--name', default='', help='What the token is for, e.g. "analytics export".')
+
+    def handle(self, *args, **options):
+        """Creates the token and prints it once."""
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['username']}'.")
+        _, token = ApiToken.issue(user, options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Issued an API token for {user.username}:'))
+        self.stdout.write(token)
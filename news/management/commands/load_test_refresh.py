@@ -0,0 +1,138 @@
+import contextlib
+import multiprocessing
+import os
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from news.governor import Governor
+from news.models import FetchCursor, Keyword, NewsArticle, RefreshJob, TrendingKeyword
+from news.providers.stub import StubProvider
+from news.refresh_queue import enqueue_due_keywords
+from news.tasks import work_refresh_queue
+
+
+class Command(BaseCommand):
+    help = ('Load-tests the background refresh pipeline, from fetching through ingestion, against the '
+            'offline stub provider. Creates throwaway users and keywords in the configured database, '
+            'refreshes them for a number of cycles and reports throughput, then deletes everything it wrote.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keywords', type=int, default=1000, help='Distinct keyword texts.')
+        parser.add_argument('--subscribers', type=int, default=2, help='Users tracking each keyword text.')
+        parser.add_argument('--articles-per-hour', type=float, default=12,
+                            help='Articles the stub publishes per keyword text per hour.')
+        parser.add_argument('--history-days', type=float, default=2,
+                            help='How far back the first fetch of a keyword reaches.')
+        parser.add_argument('--latency', type=float, default=50, help='Stub latency per call in milliseconds.')
+        parser.add_argument('--cycles', type=int, default=2,
+                            help='Refresh cycles to run; the first fetches history, later ones only new articles.')
+        parser.add_argument('--concurrency', type=int, default=settings.NEWS_FETCH_CONCURRENCY,
+                            help='Requests in flight per worker.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes claiming the refresh jobs, as refresh_worker processes do.')
+        parser.add_argument('--keep', action='store_true', help="Keep the test data instead of deleting it.")
+
+    def handle(self, *args, **options):
+        """
+        Queues every test keyword in each cycle and has --workers processes
+        work off the jobs through `work_refresh_queue`, each with a stub
+        provider, a private in-memory governor without rate limiting and no
+        fetch cache, so the numbers measure the pipeline itself. The per-page
+        task output is shown with --verbosity 2.
+        """
+        prefix = f'loadtest-{time.time_ns()}'
+        User.objects.bulk_create([User(username=f'{prefix}-{n}') for n in range(options['subscribers'])])
+        users = list(User.objects.filter(username__startswith=prefix))
+        Keyword.objects.bulk_create(
+            [
+                Keyword(user=user, keyword=f'{prefix} topic {i}')
+                for user in users
+                for i in range(options['keywords'])
+            ],
+            batch_size=1000,
+        )
+        keywords = Keyword.objects.filter(user__in=users)
+        articles = NewsArticle.objects.filter(url__startswith=f'https://stub.local/en/{quote(prefix)}')
+
+        provider_options = {
+            'latency': options['latency'] / 1000,
+            'articles_per_hour': options['articles_per_hour'],
+            'history_days': options['history_days'],
+        }
+        self.stdout.write(
+            f"{options['keywords']} keyword texts x {options['subscribers']} subscribers, "
+            f"stub latency {options['latency']:.0f} ms, {options['workers']} workers "
+            f"with concurrency {options['concurrency']}"
+        )
+
+        try:
+            for cycle in range(1, options['cycles'] + 1):
+                keywords.update(next_refresh_at=timezone.now())
+                enqueue_due_keywords(keywords)
+                stored_before = articles.count()
+                started = time.monotonic()
+                work = (prefix, provider_options, options['concurrency'], options['verbosity'])
+                if options['workers'] == 1:
+                    counts = [_work_off_jobs(*work)]
+                else:
+                    # Each worker process opens its own database connections.
+                    connections.close_all()
+                    with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                        counts = pool.starmap(_work_off_jobs, [work] * options['workers'])
+                fetched, failed, pages = (sum(column) for column in zip(*counts))
+                elapsed = time.monotonic() - started
+                stored = articles.count() - stored_before
+                self.stdout.write(
+                    f'cycle {cycle}: {fetched} groups ({failed} failed), {pages} pages, {stored} new articles '
+                    f'in {elapsed:.2f}s: {fetched / elapsed:.1f} groups/s, {stored / elapsed:.1f} articles/s'
+                )
+        finally:
+            if options['keep']:
+                self.stdout.write(f"Kept the test data; its users' names start with '{prefix}'.")
+            else:
+                User.objects.filter(username__startswith=prefix).delete()
+                articles.delete()
+                FetchCursor.objects.filter(text__startswith=prefix).delete()
+                RefreshJob.objects.filter(text__startswith=prefix).delete()
+                TrendingKeyword.objects.filter(text__startswith=prefix).delete()
+
+        self.stdout.write(self.style.SUCCESS('Load test finished.'))
+
+
+def _work_off_jobs(prefix, provider_options, concurrency, verbosity):
+    """
+    Claims and refreshes the test run's jobs until none are left, in the
+    calling process.
+
+    Returns:
+        tuple: The groups fetched and failed, and the pages fetched.
+    """
+    with _task_output(verbosity):
+        batches = work_refresh_queue(
+            RefreshJob.objects.filter(text__startswith=prefix),
+            provider=StubProvider(**provider_options),
+            governor=Governor(':memory:', requests_per_second=0),
+            cache=None,
+            concurrency=concurrency,
+        )
+    return (
+        sum(stats.fetched for stats in batches),
+        sum(stats.failed for stats in batches),
+        sum(stats.pages for stats in batches),
+    )
+
+
+@contextlib.contextmanager
+def _task_output(verbosity):
+    """Hides the tasks' progress output below verbosity 2."""
+    if verbosity >= 2:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
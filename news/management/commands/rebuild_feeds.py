@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from news.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the users' merged feeds from their keywords' article links. "
+            'Ingestion keeps them up to date; run this after bulk changes made outside the ORM.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', type=int, nargs='*',
+                            help='User ids to rebuild. Rebuilds every feed if omitted.')
+
+    def handle(self, *args, **options):
+        """Rebuilds the requested users' feeds in one transaction."""
+        written = rebuild_feeds(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} feed entries.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from news.stats import rebuild_keyword_stats
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the per-keyword article statistics from the keyword links. '
+            'Ingestion keeps them up to date; run this after deleting articles in bulk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('keyword_ids', type=int, nargs='*',
+                            help='Keyword ids to rebuild. Rebuilds every keyword if omitted.')
+
+    def handle(self, *args, **options):
+        """Rebuilds the requested keywords' statistics in one transaction."""
+        written = rebuild_keyword_stats(options['keyword_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} keyword statistics rows.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from news.trending import rebuild_trending
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the trending keyword counters from the keywords and their article links. '
+            'They are kept up to date incrementally; run this after bulk changes made outside the ORM.')
+
+    def handle(self, *args, **options):
+        """Rebuilds every trending row in one transaction."""
+        written = rebuild_trending()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} trending keyword rows.'))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.governor import get_governor, sync_quota_usage
+from news.metrics import get_metrics
+from news.providers import get_provider
+from news.refresh_queue import worker_name
+from news.tasks import refresh_due_keywords
+
+
+class Command(BaseCommand):
+    help = ('Runs a background refresh worker: queues the keywords that are due and fetches queued refresh '
+            'jobs, sleeping while there are none. Start several to refresh in parallel; each job is leased '
+            'to one worker at a time, and the jobs of a worker that dies are taken over by the others.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=5,
+                            help='Seconds to wait before looking for due keywords again when there are none.')
+        parser.add_argument('--once', action='store_true', help='Exit once no keyword is due and the queue is empty.')
+
+    def handle(self, *args, **options):
+        """
+        Runs `refresh_due_keywords` in a loop. Every worker also queues the
+        due keywords itself, so the workers don't depend on the master task
+        running in `process_tasks`.
+        """
+        configuration_error = get_provider().configuration_error()
+        if configuration_error:
+            self.stderr.write(configuration_error)
+            return
+
+        owner = worker_name()
+        governor = get_governor()
+        self.stdout.write(f'Refresh worker {owner} started.')
+        while True:
+            cycles = refresh_due_keywords(owner=owner, governor=governor)
+            if cycles:
+                sync_quota_usage(governor)
+                get_metrics().flush()
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Refresh worker {owner} finished.'))
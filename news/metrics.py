@@ -0,0 +1,355 @@
+"""
+Timings and counters for the hot paths, served in the Prometheus text format
+on /metrics and summarized on an admin page.
+
+The web processes and the worker each add to their own in-memory counters
+and write them out to a small SQLite file shared by every process
+(NEWS_METRICS_PATH) at most every NEWS_METRICS_FLUSH_INTERVAL seconds, so a
+scrape of any web process sees the totals of all of them without adding a
+database write to every request. Recorded:
+
+- `news_stage_seconds{stage}`: a histogram of each stage of fetching and
+  serving articles: the upstream `fetch` (including the parse), the JSON
+  `parse`, the near-duplicate lookup (`dedup`), the rest of the ingest
+  transaction (`write`), a worker's refresh of one claimed batch of
+  keywords (`cycle`) and template rendering of the article lists (`render`).
+- `news_view_seconds{view}`: a histogram of request handling time per URL
+  name, recorded by `news.middleware.RequestMetricsMiddleware`.
+- `news_articles_total{outcome}`: fetched articles `inserted`, or `skipped`
+  as invalid, repeated or already stored.
+- `news_keyword_links_total`: keyword links created by ingestion.
+- `news_page_cache_total{result}`: keyword page fragment cache lookups.
+
+Queue lag, the refresh job queue and the News API response cache counters
+are read from where they are kept when /metrics is scraped (see `live_samples`).
+"""
+import atexit
+import bisect
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from background_task.models import Task
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from .fetch_cache import get_fetch_cache
+from .models import Keyword, RefreshJob
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+FETCH = 'fetch'
+PARSE = 'parse'
+DEDUP = 'dedup'
+WRITE = 'write'
+CYCLE = 'cycle'
+RENDER = 'render'
+STAGES = (FETCH, PARSE, DEDUP, WRITE, CYCLE, RENDER)
+
+# Histogram bucket upper bounds in seconds, from a fast query to a slow cycle.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+DEFAULT_FLUSH_INTERVAL = 10
+
+# The recorded metrics: type and help text by name.
+METRICS = {
+    'news_stage_seconds': (HISTOGRAM, 'Time spent in each stage of fetching and serving articles.'),
+    'news_view_seconds': (HISTOGRAM, 'Time to handle a request, by URL name.'),
+    'news_articles_total': (COUNTER, 'Fetched articles by outcome: inserted, or skipped as invalid, '
+                                     'repeated or already stored.'),
+    'news_keyword_links_total': (COUNTER, 'Keyword links created by ingestion.'),
+    'news_page_cache_total': (COUNTER, 'Keyword page fragment cache lookups, by result.'),
+}
+
+
+def _label_key(labels):
+    """Returns the stored form of a label dict: sorted (name, value) pairs as JSON."""
+    return json.dumps(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class Metrics:
+    """
+    Counters and histograms buffered in memory and flushed to a SQLite file
+    shared by all processes.
+
+    Histogram observations are buffered as counts per bucket and written as
+    the cumulative `_bucket` series, `_sum` and `_count`, with a row for
+    every bucket, so the stored rows are Prometheus samples as they are
+    exposed.
+
+    Args:
+        path (str): The SQLite file.
+        flush_interval (float): Seconds between writes of the buffered counts.
+    """
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._flushed_at = time.monotonic()
+        with self._connect() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (name, labels))'
+            )
+        atexit.register(self.flush)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads, so keep one per thread.
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def inc(self, name, amount=1, **labels):
+        """Adds `amount` to a counter."""
+        if not amount:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] += amount
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def observe(self, name, seconds, **labels):
+        """Records one observation of a histogram."""
+        key = (name, _label_key(labels))
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Observations per bucket (the last one is +Inf), then the sum.
+                histogram = self._histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            histogram[bucket] += 1
+            histogram[-1] += seconds
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Observes the time taken by the `with` block in a histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _histogram_rows(name, labels, histogram):
+        """Expands buffered observations into cumulative `_bucket` rows, `_sum` and `_count`."""
+        label_dict = dict(json.loads(labels))
+        rows = []
+        total = 0
+        for bound, observations in zip((*BUCKETS, float('inf')), histogram):
+            total += observations
+            rows.append((f'{name}_bucket', _label_key({**label_dict, 'le': _format_bound(bound)}), total))
+        rows.append((f'{name}_sum', labels, histogram[-1]))
+        rows.append((f'{name}_count', labels, total))
+        return rows
+
+    def flush(self):
+        """Writes the counts buffered by this process to the shared file."""
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(float)
+            histograms, self._histograms = self._histograms, {}
+            self._flushed_at = time.monotonic()
+        if not counters and not histograms:
+            return
+        rows = [(name, labels, value) for (name, labels), value in counters.items()]
+        for (name, labels), histogram in histograms.items():
+            rows.extend(self._histogram_rows(name, labels, histogram))
+        try:
+            with self._connect() as db:
+                db.executemany(
+                    'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    rows,
+                )
+        except sqlite3.Error as e:
+            print(f"METRICS: Could not write metrics, keeping them for the next flush: {e}")
+            with self._lock:
+                for key, amount in counters.items():
+                    self._counters[key] += amount
+                for key, histogram in histograms.items():
+                    merged = self._histograms.setdefault(key, [0] * (len(BUCKETS) + 1) + [0.0])
+                    for position, value in enumerate(histogram):
+                        merged[position] += value
+
+    def samples(self):
+        """
+        Flushes this process's counts and returns every stored sample.
+
+        Returns:
+            list: (name, labels, value) tuples, with labels as a dict.
+        """
+        self.flush()
+        rows = self._connect().execute('SELECT name, labels, value FROM samples ORDER BY name, labels').fetchall()
+        return [(name, dict(json.loads(labels)), value) for name, labels, value in rows]
+
+    def reset(self):
+        """Drops every stored and buffered sample."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        with self._connect() as db:
+            db.execute('DELETE FROM samples')
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Returns the process-wide metrics configured by the NEWS_METRICS_* settings."""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics(settings.NEWS_METRICS_PATH, settings.NEWS_METRICS_FLUSH_INTERVAL)
+    return _metrics
+
+
+def timed(stage):
+    """Times a `with` block as one of the STAGES."""
+    return get_metrics().time('news_stage_seconds', stage=stage)
+
+
+def live_samples(now=None):
+    """
+    Reads the metrics kept elsewhere: how far the background task queue and
+    the refresh schedule lag behind, the refresh jobs waiting and leased, and
+    the News API response cache counters.
+
+    Returns:
+        list: (name, type, help, labels, value) tuples.
+    """
+    now = now or timezone.now()
+    waiting = Task.objects.filter(run_at__lte=now, locked_by__isnull=True, failed_at__isnull=True)
+    oldest_task = waiting.aggregate(oldest=Min('run_at'))['oldest']
+    oldest_due = Keyword.objects.filter(next_refresh_at__lte=now).aggregate(oldest=Min('next_refresh_at'))['oldest']
+    leased = RefreshJob.objects.filter(lease_expires_at__gt=now).count()
+    queued = RefreshJob.objects.count() - leased
+    cache_stats = get_fetch_cache().stats()
+    return [
+        ('news_task_queue_depth', GAUGE, 'Background tasks due and waiting for a worker.', {},
+         waiting.count()),
+        ('news_task_queue_lag_seconds', GAUGE, 'How long the oldest waiting background task has been due.', {},
+         (now - oldest_task).total_seconds() if oldest_task else 0.0),
+        ('news_refresh_lag_seconds', GAUGE, 'How long the most overdue keyword refresh has been due.', {},
+         (now - oldest_due).total_seconds() if oldest_due else 0.0),
+        ('news_refresh_jobs', GAUGE, 'Queued refresh jobs, by state: waiting for a worker or leased to one.',
+         {'state': 'waiting'}, queued),
+        ('news_refresh_jobs', GAUGE, 'Queued refresh jobs, by state: waiting for a worker or leased to one.',
+         {'state': 'leased'}, leased),
+        ('news_fetch_cache_lookups_total', COUNTER, 'News API response cache lookups, by result.',
+         {'result': 'hit'}, cache_stats['hits']),
+        ('news_fetch_cache_lookups_total', COUNTER, 'News API response cache lookups, by result.',
+         {'result': 'miss'}, cache_stats['misses']),
+        ('news_fetch_cache_entries', GAUGE, 'Entries in the News API response cache.', {}, cache_stats['entries']),
+    ]
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample_line(name, labels, value):
+    label_text = ','.join(f'{label}="{_escape(label_value)}"' for label, label_value in labels.items())
+    return f'{name}{{{label_text}}} {value:g}' if label_text else f'{name} {value:g}'
+
+
+def render_prometheus(samples, live):
+    """
+    Formats stored and live samples in the Prometheus text exposition format.
+
+    Args:
+        samples (list): (name, labels, value) tuples from `Metrics.samples`.
+        live (list): (name, type, help, labels, value) tuples from `live_samples`.
+    """
+    lines = []
+    by_metric = defaultdict(list)
+    for name, labels, value in samples:
+        base = name.removesuffix('_bucket').removesuffix('_sum').removesuffix('_count')
+        by_metric[base if base in METRICS else name].append((name, labels, value))
+    for metric, (metric_type, help_text) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        # Each series' buckets in increasing order, then its sum and count.
+        ordered = sorted(by_metric.get(metric, ()), key=lambda sample: (
+            sorted((label, value) for label, value in sample[1].items() if label != 'le'),
+            not sample[0].endswith('_bucket'),
+            float(sample[1].get('le', 0)),
+            sample[0],
+        ))
+        lines.extend(_sample_line(*sample) for sample in ordered)
+
+    described = set()
+    for name, metric_type, help_text, labels, value in live:
+        if name not in described:
+            described.add(name)
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+        lines.append(_sample_line(name, labels, value))
+    return '\n'.join(lines) + '\n'
+
+
+def histogram_summaries(samples, name, label):
+    """
+    Summarizes a histogram per value of one label for the admin page: the
+    count, the mean and the 50th and 95th percentiles, estimated by linear
+    interpolation within the buckets. Times are in milliseconds.
+
+    Returns:
+        list: One dict per label value, in name order.
+    """
+    histograms = defaultdict(lambda: {'buckets': {}, 'sum': 0.0, 'count': 0})
+    for sample_name, labels, value in samples:
+        if label not in labels:
+            continue
+        histogram = histograms[labels[label]]
+        if sample_name == f'{name}_bucket':
+            histogram['buckets'][float(labels['le'])] = value
+        elif sample_name == f'{name}_sum':
+            histogram['sum'] = value
+        elif sample_name == f'{name}_count':
+            histogram['count'] = int(value)
+
+    def quantile(buckets, count, q):
+        rank = q * count
+        lower_bound = lower_count = 0.0
+        for bound in sorted(buckets):
+            if buckets[bound] >= rank:
+                if bound == float('inf'):
+                    return lower_bound
+                share = (rank - lower_count) / ((buckets[bound] - lower_count) or 1)
+                return lower_bound + (bound - lower_bound) * share
+            lower_bound, lower_count = bound, buckets[bound]
+        return lower_bound
+
+    return [
+        {
+            label: key,
+            'count': histogram['count'],
+            'mean_ms': 1000 * histogram['sum'] / histogram['count'],
+            'p50_ms': 1000 * quantile(histogram['buckets'], histogram['count'], 0.5),
+            'p95_ms': 1000 * quantile(histogram['buckets'], histogram['count'], 0.95),
+        }
+        for key, histogram in sorted(histograms.items()) if histogram['count']
+    ]
@@ -0,0 +1,104 @@
+"""
+Request middleware for the metrics in `news.metrics` and for the opt-in
+query counter.
+"""
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import get_metrics
+
+# Runs of placeholders in an IN (...) list, so the same statement with a
+# different number of values is counted as one.
+IN_LIST_RE = re.compile(r'\((?:%s, )*%s\)')
+
+
+class RepeatedQueries(Exception):
+    """Raised by QueryCountMiddleware in 'raise' mode when a request repeats a statement too often."""
+
+
+class QueryCounter:
+    """
+    Counts the queries run on a database connection inside a `with` block,
+    by statement with its parameters left out. A statement run once per row
+    of a list is the N+1 pattern; `repeated` finds them.
+
+    Args:
+        using (str): The database alias.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.statements = Counter()
+        self._wrapper = None
+
+    def __enter__(self):
+        self.statements.clear()
+        self._wrapper = connections[self.using].execute_wrapper(self._count)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def _count(self, execute, sql, params, many, context):
+        self.statements[IN_LIST_RE.sub('(...)', sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self):
+        """The number of queries run."""
+        return sum(self.statements.values())
+
+    def repeated(self, limit):
+        """Returns (statement, times) for each statement run at least `limit` times, most repeated first."""
+        return [(sql, times) for sql, times in self.statements.most_common() if times >= limit]
+
+
+class RequestMetricsMiddleware:
+    """Records how long each request takes in `news_view_seconds`, by URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        # Unmatched URLs share one label, so random paths can't add series.
+        view = (match.view_name if match else '') or 'unmatched'
+        get_metrics().observe('news_view_seconds', time.perf_counter() - started, view=view)
+        return response
+
+
+class QueryCountMiddleware:
+    """
+    Counts each request's queries when NEWS_QUERY_COUNTER is set, and adds
+    the total as an `X-Query-Count` header. A statement run
+    NEWS_QUERY_REPEAT_LIMIT times or more in one request is printed with
+    'warn', and raises RepeatedQueries with 'raise', which makes tests
+    that use the test client fail on an N+1 pattern.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.NEWS_QUERY_COUNTER
+        if not mode:
+            return self.get_response(request)
+
+        with QueryCounter() as queries:
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(queries.total)
+        repeated = queries.repeated(settings.NEWS_QUERY_REPEAT_LIMIT)
+        if repeated:
+            report = '; '.join(f'{times}x {sql[:200]}' for sql, times in repeated)
+            message = f'{request.method} {request.path} ran {queries.total} queries, repeating: {report}'
+            if mode == 'raise':
+                raise RepeatedQueries(message)
+            print(f"QUERIES: {message}")
+        return response
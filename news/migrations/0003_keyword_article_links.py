@@ -0,0 +1,66 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_existing_articles(apps, schema_editor):
+    """Creates a KeywordArticle link for every article's original keyword."""
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    links = [
+        KeywordArticle(keyword_id=keyword_id, article_id=article_id)
+        for article_id, keyword_id in NewsArticle.objects.filter(keyword__isnull=False)
+        .values_list('id', 'keyword_id').iterator()
+    ]
+    KeywordArticle.objects.bulk_create(links, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_alter_keyword_options_remove_keyword_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsarticle',
+            name='keyword',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='discovered_articles', to='news.keyword'),
+        ),
+        migrations.CreateModel(
+            name='KeywordArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keyword_links', to='news.newsarticle')),
+                ('keyword', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_links', to='news.keyword')),
+            ],
+            options={
+                'unique_together': {('keyword', 'article')},
+            },
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='keywords',
+            field=models.ManyToManyField(related_name='articles', through='news.KeywordArticle', to='news.keyword'),
+        ),
+        migrations.RunPython(link_existing_articles, migrations.RunPython.noop),
+        # SearchLog and UserProfile were dropped from news.models before this
+        # migration (users.Profile replaces UserProfile). Only the migration
+        # state forgets them; their tables and rows are left in place.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='userprofile',
+                    name='user',
+                ),
+                migrations.DeleteModel(
+                    name='SearchLog',
+                ),
+                migrations.DeleteModel(
+                    name='UserProfile',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:44
+
+import django.utils.timezone
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+
+
+def schedule_existing_keywords(apps, schema_editor):
+    """Sets next_refresh_at from each keyword's last search and interval."""
+    Keyword = apps.get_model('news', 'Keyword')
+    keywords = []
+    for keyword in Keyword.objects.filter(last_searched__isnull=False).iterator():
+        interval = keyword.custom_refresh_interval or settings.REFRESH_INTERVAL_GLOBAL
+        keyword.next_refresh_at = keyword.last_searched + timedelta(seconds=interval)
+        keywords.append(keyword)
+    Keyword.objects.bulk_update(keywords, ['next_refresh_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_keyword_article_links'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keyword',
+            name='next_refresh_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(schedule_existing_keywords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:48
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_article_fields(apps, schema_editor):
+    """Copies each linked article's language and publish date onto its link."""
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    article = NewsArticle.objects.filter(pk=OuterRef('article_id'))
+    KeywordArticle.objects.update(
+        language=Subquery(article.values('language')[:1]),
+        published_at=Subquery(article.values('published_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_keyword_next_refresh_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keywordarticle',
+            name='language',
+            field=models.CharField(default='en', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='keywordarticle',
+            name='published_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_article_fields, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='keywordarticle',
+            name='published_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='keywordarticle',
+            index=models.Index(fields=['keyword', 'language', 'published_at', 'article'], name='news_keywor_keyword_42e66b_idx'),
+        ),
+    ]
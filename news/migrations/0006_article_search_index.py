@@ -0,0 +1,81 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE news_article_fts USING fts5(
+        title, description, content,
+        content='news_newsarticle', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER news_article_fts_insert AFTER INSERT ON news_newsarticle BEGIN
+        INSERT INTO news_article_fts(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER news_article_fts_delete AFTER DELETE ON news_newsarticle BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER news_article_fts_update AFTER UPDATE OF title, description, content ON news_newsarticle BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description, old.content);
+        INSERT INTO news_article_fts(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, new.content);
+    END
+    """,
+    "INSERT INTO news_article_fts(news_article_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS news_article_fts_insert',
+    'DROP TRIGGER IF EXISTS news_article_fts_delete',
+    'DROP TRIGGER IF EXISTS news_article_fts_update',
+    'DROP TABLE IF EXISTS news_article_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE news_newsarticle ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(content, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX news_newsarticle_search_vector_idx ON news_newsarticle USING GIN (search_vector)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS news_newsarticle_search_vector_idx',
+    'ALTER TABLE news_newsarticle DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run_for_vendor(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Creates the full-text search index used by `news.search`: an FTS5 table
+    kept in sync by triggers on SQLite, or a generated tsvector column with a
+    GIN index on PostgreSQL. Other databases get no index.
+    """
+
+    dependencies = [
+        ('news', '0005_keyword_article_sort_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run_for_vendor({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def build_keyword_stats(apps, schema_editor):
+    """Computes the statistics of every keyword and language from the existing links."""
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    KeywordStats = apps.get_model('news', 'KeywordStats')
+
+    sources = defaultdict(dict)
+    for keyword_id, language, source_name, count in (
+        KeywordArticle.objects.values_list('keyword_id', 'language', 'article__source_name')
+        .annotate(count=Count('id')).order_by()
+    ):
+        sources[(keyword_id, language)][source_name] = count
+
+    KeywordStats.objects.bulk_create([
+        KeywordStats(
+            keyword_id=keyword_id,
+            language=language,
+            article_count=count,
+            newest_published_at=newest,
+            oldest_published_at=oldest,
+            source_counts=sources[(keyword_id, language)],
+        )
+        for keyword_id, language, count, newest, oldest in (
+            KeywordArticle.objects.values_list('keyword_id', 'language')
+            .annotate(count=Count('id'), newest=Max('published_at'), oldest=Min('published_at'))
+            .order_by()
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_article_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeywordStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10)),
+                ('article_count', models.PositiveIntegerField(default=0)),
+                ('newest_published_at', models.DateTimeField(blank=True, null=True)),
+                ('oldest_published_at', models.DateTimeField(blank=True, null=True)),
+                ('source_counts', models.JSONField(blank=True, default=dict)),
+                ('keyword', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='news.keyword')),
+            ],
+            options={
+                'verbose_name_plural': 'keyword stats',
+                'unique_together': {('keyword', 'language')},
+            },
+        ),
+        migrations.RunPython(build_keyword_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:02
+
+import math
+from datetime import datetime, timezone as dt_timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copies of news.trending.EPOCH and WINDOWS.
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+WINDOWS = {'1h': 3600, '24h': 24 * 3600, '7d': 7 * 24 * 3600}
+
+
+def build_trending(apps, schema_editor):
+    """Counts the subscribers and decayed article velocity of every keyword text."""
+    Keyword = apps.get_model('news', 'Keyword')
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    TrendingKeyword = apps.get_model('news', 'TrendingKeyword')
+
+    def normalize(text):
+        return ' '.join(text.lower().split())
+
+    now = timezone.now()
+    rows = {}
+    for user_id, text in set((user_id, normalize(text)) for user_id, text in Keyword.objects.values_list('user_id', 'keyword')):
+        row = rows.setdefault(text, TrendingKeyword(text=text))
+        row.subscriber_count += 1
+
+    # Collect the forward-decay exponents per window, then sum them stably.
+    exponents = {}
+    counted = set()
+    links = KeywordArticle.objects.values_list('keyword__keyword', 'article_id', 'published_at')
+    for text, article_id, published_at in links.iterator(chunk_size=5000):
+        text = normalize(text)
+        if (text, article_id) in counted:
+            continue
+        counted.add((text, article_id))
+        row = rows.setdefault(text, TrendingKeyword(text=text))
+        published_at = min(published_at, now)
+        if row.last_article_at is None or published_at > row.last_article_at:
+            row.last_article_at = published_at
+        seconds = (published_at - EPOCH).total_seconds()
+        for window, tau in WINDOWS.items():
+            exponents.setdefault((text, window), []).append(seconds / tau)
+
+    for (text, window), values in exponents.items():
+        high = max(values)
+        log_score = high + math.log(sum(math.exp(value - high) for value in values))
+        setattr(rows[text], f'log_score_{window}', log_score)
+
+    TrendingKeyword.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0007_keyword_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=100, unique=True)),
+                ('subscriber_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('log_score_1h', models.FloatField(blank=True, db_index=True, null=True)),
+                ('log_score_24h', models.FloatField(blank=True, db_index=True, null=True)),
+                ('log_score_7d', models.FloatField(blank=True, db_index=True, null=True)),
+                ('last_article_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_trending, migrations.RunPython.noop),
+    ]
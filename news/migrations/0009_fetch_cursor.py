@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_trending_keyword'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=100)),
+                ('language', models.CharField(max_length=10)),
+                ('from_date', models.DateTimeField(blank=True, null=True)),
+                ('to_date', models.DateTimeField()),
+                ('next_page', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('text', 'language')},
+            },
+        ),
+    ]
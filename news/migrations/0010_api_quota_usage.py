@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_fetch_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiQuotaUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('channel', models.CharField(choices=[('interactive', 'Interactive'), ('background', 'Background')], max_length=20)),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('rate_limited', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'API quota usage',
+                'ordering': ['-hour', 'channel'],
+                'unique_together': {('hour', 'channel')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_feeds(apps, schema_editor):
+    """Adds every article linked to a user's keywords to that user's feed, once."""
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    FeedEntry = apps.get_model('news', 'FeedEntry')
+
+    seen = set()
+    batch = []
+    links = KeywordArticle.objects.values_list('keyword__user_id', 'article_id', 'language', 'published_at')
+    for user_id, article_id, language, published_at in links.iterator(chunk_size=5000):
+        if (user_id, article_id) in seen:
+            continue
+        seen.add((user_id, article_id))
+        batch.append(FeedEntry(user_id=user_id, article_id=article_id, language=language, published_at=published_at))
+        if len(batch) >= 5000:
+            FeedEntry.objects.bulk_create(batch)
+            batch = []
+    FeedEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_api_quota_usage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(default='en', max_length=10)),
+                ('published_at', models.DateTimeField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='news.newsarticle')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'published_at', 'article'], name='news_feeden_user_id_d3fc04_idx'), models.Index(fields=['user', 'language', 'published_at', 'article'], name='news_feeden_user_id_584e71_idx')],
+                'unique_together': {('user', 'article')},
+            },
+        ),
+        migrations.RunPython(build_feeds, migrations.RunPython.noop),
+    ]
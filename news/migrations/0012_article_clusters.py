@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0011_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticle',
+            name='cluster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='news.newsarticle'),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='minhash_band_0',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='minhash_band_1',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='minhash_band_2',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='minhash_band_3',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='minhash_band_4',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0012_article_clusters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keyword',
+            name='custom_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text="Days to keep this keyword's articles in full before archiving their text. Leave blank to use the global default.", null=True),
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
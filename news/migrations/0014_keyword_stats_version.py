@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:36
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def copy_newest_link_dates(apps, schema_editor):
+    """Sets each statistics row's change time to the creation of its newest link."""
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    KeywordStats = apps.get_model('news', 'KeywordStats')
+    newest = (
+        KeywordArticle.objects.filter(keyword_id=OuterRef('keyword_id'), language=OuterRef('language'))
+        .values('keyword_id').annotate(newest=Max('created_at')).values('newest')
+    )
+    KeywordStats.objects.update(changed_at=Subquery(newest[:1]), version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0013_article_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keywordstats',
+            name='changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='keywordstats',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(copy_newest_link_dates, migrations.RunPython.noop),
+    ]
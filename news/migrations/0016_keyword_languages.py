@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def add_stored_languages(apps, schema_editor):
+    """
+    Records the languages each keyword already has articles in as viewed now,
+    so they keep being refreshed until they go unviewed for the cutoff.
+    """
+    KeywordStats = apps.get_model('news', 'KeywordStats')
+    KeywordLanguage = apps.get_model('news', 'KeywordLanguage')
+    now = timezone.now()
+    KeywordLanguage.objects.bulk_create(
+        [
+            KeywordLanguage(keyword_id=keyword_id, language=language, last_viewed_at=now)
+            for keyword_id, language in KeywordStats.objects.filter(article_count__gt=0)
+            .exclude(language='').values_list('keyword_id', 'language')
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0015_api_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeywordLanguage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10)),
+                ('last_viewed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('keyword', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='languages', to='news.keyword')),
+            ],
+            options={
+                'unique_together': {('keyword', 'language')},
+            },
+        ),
+        migrations.RunPython(add_stored_languages, migrations.RunPython.noop),
+    ]
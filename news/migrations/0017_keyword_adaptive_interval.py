@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0016_keyword_languages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='keyword',
+            name='adaptive_interval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='keyword',
+            name='arrival_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='keyword',
+            name='last_yield',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='keyword',
+            name='predicted_yield',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
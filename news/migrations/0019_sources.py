@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Adds the source references as nullable columns; 0020 fills them in and 0021
+# makes them required. Each step is a migration of its own, as PostgreSQL
+# can't alter a table in the transaction that updated its rows.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0018_refresh_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Source',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='newsarticle',
+            name='source',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='articles', to='news.source'),
+        ),
+        migrations.AddField(
+            model_name='keywordarticle',
+            name='source',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='news.source'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='source',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='news.source'),
+        ),
+    ]
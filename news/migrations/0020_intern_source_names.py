@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:19
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def intern_source_names(apps, schema_editor):
+    """
+    Creates a Source for each distinct source name, points the articles at it
+    and copies it onto their links and feed entries, and re-keys the keyword
+    statistics' source counts by source id.
+    """
+    NewsArticle = apps.get_model('news', 'NewsArticle')
+    KeywordArticle = apps.get_model('news', 'KeywordArticle')
+    FeedEntry = apps.get_model('news', 'FeedEntry')
+    KeywordStats = apps.get_model('news', 'KeywordStats')
+    Source = apps.get_model('news', 'Source')
+
+    names = NewsArticle.objects.values_list('source_name', flat=True).distinct().order_by()
+    Source.objects.bulk_create([Source(name=name) for name in names], batch_size=1000)
+    source_ids = dict(Source.objects.values_list('name', 'id'))
+    # One update per source, served by the source_name index removed in 0021.
+    for name, source_id in source_ids.items():
+        NewsArticle.objects.filter(source_name=name).update(source_id=source_id)
+
+    article = NewsArticle.objects.filter(pk=OuterRef('article_id'))
+    KeywordArticle.objects.update(source_id=Subquery(article.values('source_id')[:1]))
+    FeedEntry.objects.update(source_id=Subquery(article.values('source_id')[:1]))
+
+    stats_rows = list(KeywordStats.objects.all())
+    for stats in stats_rows:
+        stats.source_counts = {
+            str(source_ids[name]): count for name, count in stats.source_counts.items() if name in source_ids
+        }
+    KeywordStats.objects.bulk_update(stats_rows, ['source_counts'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0019_sources'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_source_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.3 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Rebuilding news_newsarticle on SQLite (the AlterField and RemoveField below)
+# drops the triggers that keep the full-text index of 0006 in sync, so they
+# are created again and the index is rebuilt from the table.
+SQLITE_SEARCH_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS news_article_fts_insert',
+    'DROP TRIGGER IF EXISTS news_article_fts_delete',
+    'DROP TRIGGER IF EXISTS news_article_fts_update',
+    """
+    CREATE TRIGGER news_article_fts_insert AFTER INSERT ON news_newsarticle BEGIN
+        INSERT INTO news_article_fts(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER news_article_fts_delete AFTER DELETE ON news_newsarticle BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER news_article_fts_update AFTER UPDATE OF title, description, content ON news_newsarticle BEGIN
+        INSERT INTO news_article_fts(news_article_fts, rowid, title, description, content)
+        VALUES ('delete', old.id, old.title, old.description, old.content);
+        INSERT INTO news_article_fts(rowid, title, description, content)
+        VALUES (new.id, new.title, new.description, new.content);
+    END
+    """,
+    "INSERT INTO news_article_fts(news_article_fts) VALUES ('rebuild')",
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    """Re-creates the full-text search triggers on SQLite and rebuilds the index."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_SEARCH_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0020_intern_source_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsarticle',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='articles', to='news.source'),
+        ),
+        migrations.AlterField(
+            model_name='keywordarticle',
+            name='source',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='news.source'),
+        ),
+        migrations.AlterField(
+            model_name='feedentry',
+            name='source',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='news.source'),
+        ),
+        migrations.RemoveIndex(
+            model_name='newsarticle',
+            name='news_newsar_source__941f2d_idx',
+        ),
+        migrations.RemoveField(
+            model_name='newsarticle',
+            name='source_name',
+        ),
+        migrations.AddIndex(
+            model_name='keywordarticle',
+            index=models.Index(fields=['keyword', 'source', 'language', 'published_at', 'article'], name='news_keywor_keyword_9e588a_idx'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
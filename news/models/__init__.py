@@ -1,2 +1,12 @@
 from .keyword import Keyword
-from .news_article import NewsArticle
\ No newline at end of file
+from .source import Source
+from .news_article import NewsArticle
+from .keyword_article import KeywordArticle
+from .keyword_stats import KeywordStats
+from .trending_keyword import TrendingKeyword
+from .fetch_cursor import FetchCursor
+from .api_quota_usage import ApiQuotaUsage
+from .feed_entry import FeedEntry
+from .api_token import ApiToken
+from .keyword_language import KeywordLanguage
+from .refresh_job import RefreshJob
@@ -0,0 +1,37 @@
+from django.db import models
+
+class ApiQuotaUsage(models.Model):
+    """
+    News API calls made in one hour by one kind of caller.
+
+    Counted by the governor in `news.governor` and copied here by
+    `sync_quota_usage`, so the admin can chart how the daily quota is spent.
+
+    Attributes:
+        hour (DateTimeField): The start of the hour, in UTC.
+        channel (CharField): 'interactive' for user-triggered searches, 'background' for refreshes.
+        requests (PositiveIntegerField): Calls sent upstream, including retries.
+        rate_limited (PositiveIntegerField): Calls answered with 429 Too Many Requests.
+        errors (PositiveIntegerField): Calls that failed with a server or network error.
+    """
+    INTERACTIVE = 'interactive'
+    BACKGROUND = 'background'
+    CHANNEL_CHOICES = [
+        (INTERACTIVE, 'Interactive'),
+        (BACKGROUND, 'Background'),
+    ]
+
+    hour = models.DateTimeField()
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    requests = models.PositiveIntegerField(default=0)
+    rate_limited = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('hour', 'channel')
+        ordering = ['-hour', 'channel']
+        verbose_name_plural = 'API quota usage'
+
+    def __str__(self):
+        """Returns a string representation of the usage row."""
+        return f'{self.hour:%Y-%m-%d %H:00} {self.channel}: {self.requests} requests'
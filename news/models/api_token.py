@@ -0,0 +1,48 @@
+import hashlib
+import secrets
+
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class ApiToken(models.Model):
+    """
+    A secret that authenticates a user's requests to the JSON API.
+
+    Only a SHA-256 digest of the token is stored, so a token can be shown once
+    when issued and never again; a lost token is revoked by deleting its row.
+    Requests send it as `Authorization: Bearer <token>`.
+
+    Attributes:
+        user (ForeignKey): The User the token acts as.
+        name (CharField): What the token is for, e.g. "analytics export".
+        digest (CharField): SHA-256 hex digest of the token.
+        created_at (DateTimeField): When the token was issued.
+        last_used_at (DateTimeField): When the token last authenticated a
+            request, to the minute. Null if never used.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, blank=True)
+    digest = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    @staticmethod
+    def hash(token):
+        """Returns the digest stored for a token."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name=''):
+        """
+        Creates a token for `user`.
+
+        Returns:
+            tuple: The ApiToken row and the token itself, which is not stored.
+        """
+        token = secrets.token_urlsafe(32)
+        return cls.objects.create(user=user, name=name, digest=cls.hash(token)), token
+
+    def __str__(self):
+        """Returns a string representation of the token, without the secret."""
+        return f'{self.user} ({self.name or "unnamed"})'
@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.db import models
+from news.models.news_article import NewsArticle
+from news.models.source import Source
+
+class FeedEntry(models.Model):
+    """
+    One article in a user's merged feed across all their keywords.
+
+    Entries are written when articles are linked to the user's keywords, once
+    per user and article however many of the user's keywords matched it, so
+    the feed page is a range scan over one index instead of a query over the
+    links of every keyword. The article's language, publish date and source
+    are copied onto the entry, as on KeywordArticle.
+
+    Attributes:
+        user (ForeignKey): The User whose feed the article is in.
+        article (ForeignKey): The NewsArticle.
+        language (CharField): The article's language, copied from the article.
+        published_at (DateTimeField): The article's publish date, copied from the article.
+        source (ForeignKey): The article's Source, copied from the article.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    article = models.ForeignKey(NewsArticle, on_delete=models.CASCADE, related_name='feed_entries')
+    language = models.CharField(max_length=10, default='en')
+    published_at = models.DateTimeField()
+    source = models.ForeignKey(Source, on_delete=models.PROTECT, related_name='+', db_index=False)
+
+    class Meta:
+        unique_together = ('user', 'article')
+        indexes = [
+            # Serve the feed page in (published_at, article) keyset order,
+            # across all languages or within one.
+            models.Index(fields=['user', 'published_at', 'article']),
+            models.Index(fields=['user', 'language', 'published_at', 'article']),
+        ]
+
+    def __str__(self):
+        """Returns a string representation of the entry."""
+        return f'{self.user} <- {self.article}'
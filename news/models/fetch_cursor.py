@@ -0,0 +1,34 @@
+from django.db import models
+
+class FetchCursor(models.Model):
+    """
+    The resume point of an unfinished multi-page fetch for one keyword text
+    and language.
+
+    A fetch walks the `/v2/everything` pages of a fixed time window, newest
+    first. A cursor is only stored while pages remain, after a walk stopped
+    at the page depth limit or on an error, and is deleted once the window is
+    exhausted. The next fetch for the same text and language resumes from it
+    with the same window, so the page numbers still line up.
+
+    Attributes:
+        text (CharField): The normalized keyword text being fetched.
+        language (CharField): The language code being fetched.
+        from_date (DateTimeField): Start of the window, or null for no lower bound.
+        to_date (DateTimeField): End of the window, fixed when the walk started.
+        next_page (PositiveIntegerField): The first page not yet stored.
+        updated_at (DateTimeField): When a page was last stored for the walk.
+    """
+    text = models.CharField(max_length=100)
+    language = models.CharField(max_length=10)
+    from_date = models.DateTimeField(null=True, blank=True)
+    to_date = models.DateTimeField()
+    next_page = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('text', 'language')
+
+    def __str__(self):
+        """Returns a string representation of the cursor."""
+        return f'{self.text} ({self.language}) page {self.next_page}'
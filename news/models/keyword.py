@@ -4,8 +4,11 @@ Data models for the 'news' application.
 This file defines the database structure for storing keywords tracked by users
 and the news articles associated with those keywords.
 """
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Keyword(models.Model):
     """
@@ -22,8 +25,21 @@ class Keyword(models.Model):
         last_searched (DateTimeField): The timestamp of the most recent API search
             for this keyword. Null if never searched.
         custom_refresh_interval (PositiveIntegerField): A custom interval in seconds
-            for the background task to refresh this keyword. If null, the global
-            default interval is used.
+            for the background task to refresh this keyword. If null, the
+            adaptive interval is used, or the global default before there is one.
+        next_refresh_at (DateTimeField): When the background task should next
+            refresh this keyword. Indexed so each cycle only reads due keywords.
+        custom_retention_days (PositiveIntegerField): How many days this keyword's
+            articles are kept in full before their text is archived. If null,
+            the global default is used (see news/retention.py).
+        arrival_rate (FloatField): Moving average of the new articles per hour
+            found by background refreshes. Null until the second refresh.
+        adaptive_interval (PositiveIntegerField): The refresh interval in
+            seconds set from `arrival_rate` and recent views (see news/cadence.py).
+        predicted_yield (FloatField): The new articles `arrival_rate` predicted
+            for the last background refresh.
+        last_yield (PositiveIntegerField): The new articles the last background
+            refresh actually found.
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     keyword = models.CharField(max_length=100)
@@ -35,10 +51,47 @@ class Keyword(models.Model):
         blank=True,
         help_text="Custom refresh interval in seconds. Leave blank to use the global default."
     )
+    next_refresh_at = models.DateTimeField(default=timezone.now, db_index=True)
+    custom_retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Days to keep this keyword's articles in full before archiving their text. "
+                  "Leave blank to use the global default."
+    )
+
+    arrival_rate = models.FloatField(null=True, blank=True)
+    adaptive_interval = models.PositiveIntegerField(null=True, blank=True)
+    predicted_yield = models.FloatField(null=True, blank=True)
+    last_yield = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         unique_together = ('user', 'keyword')
 
+    @property
+    def refresh_interval(self):
+        """The effective refresh interval in seconds: the admin's, else the adaptive one."""
+        return self.custom_refresh_interval or self.adaptive_interval or settings.REFRESH_INTERVAL_GLOBAL
+
+    def get_next_refresh_at(self):
+        """Returns when the keyword is next due, based on its last search and interval."""
+        return (self.last_searched or timezone.now()) + timedelta(seconds=self.refresh_interval)
+
+    def search_cooldown_left(self, now=None):
+        """
+        Returns how long until a user may refresh this keyword again, or None
+        if they may now.
+        """
+        if not self.last_searched:
+            return None
+        left = self.last_searched + timedelta(minutes=settings.SEARCH_COOLDOWN_MINUTES) - (now or timezone.now())
+        return left if left > timedelta(0) else None
+
+    def mark_searched(self, when=None):
+        """Records a completed search and schedules the next background refresh."""
+        self.last_searched = when or timezone.now()
+        self.next_refresh_at = self.get_next_refresh_at()
+        self.save(update_fields=['last_searched', 'next_refresh_at'])
+
     def __str__(self):
         """Returns a string representation of the keyword, which is its text."""
         return self.keyword
@@ -0,0 +1,42 @@
+from django.db import models
+from news.models.keyword import Keyword
+from news.models.news_article import NewsArticle
+from news.models.source import Source
+
+class KeywordArticle(models.Model):
+    """
+    Links a stored article to every keyword whose search returned it.
+
+    Articles are stored once per URL, so users tracking the same keyword text
+    share a single NewsArticle row through one link each. The article's
+    language, publish date and source are copied onto the link so a keyword's
+    article list, whole or of one source, is a range scan over one index.
+
+    Attributes:
+        keyword (ForeignKey): The Keyword the article was matched for.
+        article (ForeignKey): The matched NewsArticle.
+        language (CharField): The article's language, copied from the article.
+        published_at (DateTimeField): The article's publish date, copied from the article.
+        source (ForeignKey): The article's Source, copied from the article.
+        created_at (DateTimeField): The timestamp when the link was created.
+    """
+    keyword = models.ForeignKey(Keyword, on_delete=models.CASCADE, related_name='article_links')
+    article = models.ForeignKey(NewsArticle, on_delete=models.CASCADE, related_name='keyword_links')
+    language = models.CharField(max_length=10, default='en')
+    published_at = models.DateTimeField()
+    source = models.ForeignKey(Source, on_delete=models.PROTECT, related_name='+', db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('keyword', 'article')
+        indexes = [
+            # Serves the keyword articles page: equality on keyword and
+            # language, then (published_at, article) keyset order either way.
+            models.Index(fields=['keyword', 'language', 'published_at', 'article']),
+            # The same within one source, for the source filter.
+            models.Index(fields=['keyword', 'source', 'language', 'published_at', 'article']),
+        ]
+
+    def __str__(self):
+        """Returns a string representation of the link."""
+        return f'{self.keyword} -> {self.article}'
@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils import timezone
+from news.models.keyword import Keyword
+
+
+class KeywordLanguage(models.Model):
+    """
+    A language a keyword's articles are viewed in.
+
+    The background refresh fetches each keyword in the languages its user
+    has viewed it in lately, each from its own watermark, instead of in one
+    fixed language (see `news.languages`). Views are recorded at most once
+    per LANGUAGE_VIEW_RESOLUTION per process, so the keyword page doesn't
+    write on every request.
+
+    Attributes:
+        keyword (ForeignKey): The Keyword.
+        language (CharField): The language code viewed.
+        last_viewed_at (DateTimeField): When the keyword was last viewed in
+            the language, to within LANGUAGE_VIEW_RESOLUTION.
+    """
+    keyword = models.ForeignKey(Keyword, on_delete=models.CASCADE, related_name='languages')
+    language = models.CharField(max_length=10)
+    last_viewed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('keyword', 'language')
+
+    def __str__(self):
+        """Returns a string representation of the keyword language."""
+        return f'{self.keyword} ({self.language})'
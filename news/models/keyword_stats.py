@@ -0,0 +1,40 @@
+from django.db import models
+from news.models.keyword import Keyword
+
+class KeywordStats(models.Model):
+    """
+    Running article statistics for one keyword in one language.
+
+    Updated by the ingestion path whenever new keyword links are written, so
+    pages that only need a count or the newest publish date read one row
+    instead of aggregating over the keyword's links.
+
+    Attributes:
+        keyword (ForeignKey): The Keyword the statistics describe.
+        language (CharField): The language code of the counted articles.
+        article_count (PositiveIntegerField): Number of articles linked to the keyword.
+        newest_published_at (DateTimeField): Publish date of the newest linked article.
+        oldest_published_at (DateTimeField): Publish date of the oldest linked article.
+        source_counts (JSONField): Number of linked articles per Source id
+            (see `news.sources.source_facets`).
+        version (PositiveIntegerField): Bumped whenever the keyword's article list
+            in this language may have changed; keys the keyword page's caches.
+        changed_at (DateTimeField): When the list last changed: the newest link's
+            `created_at`, or the time of a later archive or regrouping.
+    """
+    keyword = models.ForeignKey(Keyword, on_delete=models.CASCADE, related_name='stats')
+    language = models.CharField(max_length=10)
+    article_count = models.PositiveIntegerField(default=0)
+    newest_published_at = models.DateTimeField(null=True, blank=True)
+    oldest_published_at = models.DateTimeField(null=True, blank=True)
+    source_counts = models.JSONField(default=dict, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('keyword', 'language')
+        verbose_name_plural = 'keyword stats'
+
+    def __str__(self):
+        """Returns a string representation of the statistics row."""
+        return f'{self.keyword} ({self.language}): {self.article_count} articles'
@@ -1,37 +1,69 @@
 from django.db import models
 from news.models.keyword import Keyword
+from news.models.source import Source
 
 class NewsArticle(models.Model):
     """
     Represents a single news article fetched from the News API.
 
-    Each article is associated with a keyword and stores all relevant
-    information needed for display and filtering.
+    Each article is stored once per URL and linked to every keyword whose
+    search returned it. It stores all relevant information needed for
+    display and filtering.
 
     Attributes:
-        keyword (ForeignKey): The Keyword that this article was found under.
+        keyword (ForeignKey): The Keyword whose search first found this article.
+            Null once that keyword has been deleted.
+        keywords (ManyToManyField): Every Keyword this article was matched for,
+            through KeywordArticle.
         title (CharField): The headline or title of the article.
         description (TextField): A short summary or description of the article.
         url (URLField): The direct URL to the full, original article.
         url_to_image (URLField): A URL for a relevant image provided by the API.
         published_at (DateTimeField): The exact date and time the article was published.
-        source_name (CharField): The name of the news source (e.g., "BBC News").
+        source (ForeignKey): The Source that published the article.
         source_category (CharField): The category of the news source, if available.
         language (CharField): The language of the article (e.g., "en", "es").
         content (TextField): A snippet of the article's content, if available.
         created_at (DateTimeField): The timestamp when the article was saved to our database.
+        minhash_band_0 .. minhash_band_4 (IntegerField): Hashed bands of the
+            MinHash signature of the title and description, indexed for finding
+            syndicated copies (see news/dedup.py). Null if the text is too short.
+        cluster (ForeignKey): The first article of the story this article is a
+            copy of. Null for that article itself and for articles without copies.
+        archived_at (DateTimeField): When the description and content were moved
+            to the archive (see news/retention.py). Null while they are stored here.
     """
-    keyword = models.ForeignKey(Keyword, on_delete=models.CASCADE, related_name='articles')
+    keyword = models.ForeignKey(
+        Keyword,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='discovered_articles'
+    )
+    keywords = models.ManyToManyField(Keyword, through='KeywordArticle', related_name='articles')
     title = models.CharField(max_length=500)
     description = models.TextField(blank=True)
     url = models.URLField(unique=True)
     url_to_image = models.URLField(blank=True, null=True)
     published_at = models.DateTimeField()
-    source_name = models.CharField(max_length=200)
+    source = models.ForeignKey(Source, on_delete=models.PROTECT, related_name='articles')
     source_category = models.CharField(max_length=100, blank=True)
     language = models.CharField(max_length=10, default='en')
     content = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    minhash_band_0 = models.IntegerField(null=True, blank=True, db_index=True)
+    minhash_band_1 = models.IntegerField(null=True, blank=True, db_index=True)
+    minhash_band_2 = models.IntegerField(null=True, blank=True, db_index=True)
+    minhash_band_3 = models.IntegerField(null=True, blank=True, db_index=True)
+    minhash_band_4 = models.IntegerField(null=True, blank=True, db_index=True)
+    cluster = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='copies'
+    )
+    archived_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         # Default ordering for queries is the newest articles first.
@@ -39,7 +71,6 @@ class NewsArticle(models.Model):
         # Database indexes to speed up common filtering operations.
         indexes = [
             models.Index(fields=['published_at']),
-            models.Index(fields=['source_name']),
             models.Index(fields=['language']),
         ]
 
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class RefreshJob(models.Model):
+    """
+    A queued background refresh of one keyword text in one language.
+
+    Due keywords are grouped into jobs by `news.refresh_queue`, and any
+    number of worker processes claim them in batches. A claimed job is
+    leased to one worker until `lease_expires_at`, which the worker keeps
+    pushing back while it fetches; the job is deleted once its results are
+    stored. A job whose worker died is claimed again after its lease
+    expires.
+
+    Attributes:
+        text (CharField): The normalized keyword text to fetch.
+        language (CharField): The language code to fetch.
+        keyword_ids (JSONField): The ids of the keywords sharing the fetch.
+        due_at (DateTimeField): When the most overdue of them was due; jobs
+            are claimed in this order.
+        lease_owner (CharField): The worker holding the job, or '' if it is waiting.
+        lease_expires_at (DateTimeField): When the lease runs out if the
+            worker stops renewing it.
+        attempts (PositiveIntegerField): How many times the job was claimed.
+        created_at (DateTimeField): When the job was queued.
+    """
+    text = models.CharField(max_length=100)
+    language = models.CharField(max_length=10)
+    keyword_ids = models.JSONField(default=list)
+    due_at = models.DateTimeField(db_index=True)
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('text', 'language')
+        ordering = ['due_at', 'id']
+
+    def __str__(self):
+        """Returns a string representation of the job."""
+        return f'{self.text} ({self.language})'
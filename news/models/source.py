@@ -0,0 +1,25 @@
+from django.db import models
+
+class Source(models.Model):
+    """
+    A news source, stored once and referenced by id.
+
+    Source names repeat on nearly every article, so articles, keyword links
+    and feed entries keep the source's integer id instead of its name: a
+    source filter is an equality on an indexed integer column, and the name
+    is stored once. Rows are created as articles are ingested (see
+    `news.sources.intern_sources`).
+
+    Attributes:
+        name (CharField): The name of the news source (e.g., "BBC News").
+        created_at (DateTimeField): When an article from the source was first stored.
+    """
+    name = models.CharField(max_length=200, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        """Returns a string representation of the source, which is its name."""
+        return self.name
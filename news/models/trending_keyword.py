@@ -0,0 +1,31 @@
+from django.db import models
+
+class TrendingKeyword(models.Model):
+    """
+    Trending counters for one normalized keyword text, shared by every user
+    tracking it.
+
+    Article velocity is kept as exponentially decayed article counts with
+    1 hour, 24 hour and 7 day time constants. Each score is stored as the
+    logarithm of a forward-decayed sum (see `news.trending`), which only grows
+    as articles arrive, so ranking by a stored column gives the same order as
+    ranking by the current score and the top rows are an index scan.
+
+    Attributes:
+        text (CharField): The normalized keyword text.
+        subscriber_count (PositiveIntegerField): Number of keywords (one per user) tracking the text.
+        log_score_1h (FloatField): Log of the forward-decayed article count, 1 hour time constant.
+        log_score_24h (FloatField): Log of the forward-decayed article count, 24 hour time constant.
+        log_score_7d (FloatField): Log of the forward-decayed article count, 7 day time constant.
+        last_article_at (DateTimeField): When the most recent counted article was published.
+    """
+    text = models.CharField(max_length=100, unique=True)
+    subscriber_count = models.PositiveIntegerField(default=0, db_index=True)
+    log_score_1h = models.FloatField(null=True, blank=True, db_index=True)
+    log_score_24h = models.FloatField(null=True, blank=True, db_index=True)
+    log_score_7d = models.FloatField(null=True, blank=True, db_index=True)
+    last_article_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """Returns a string representation of the trending entry, which is its text."""
+        return self.text
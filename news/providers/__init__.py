@@ -0,0 +1,34 @@
+"""
+News providers: where articles come from.
+
+The provider is chosen with the NEWS_PROVIDER setting:
+
+    NEWS_PROVIDER = {
+        'BACKEND': 'news.providers.newsapi.NewsAPIProvider',
+        'OPTIONS': {},
+    }
+
+`NewsAPIProvider` searches NewsAPI.org. `StubProvider` generates synthetic
+articles offline, for load tests, e.g. with
+`'OPTIONS': {'latency': 0.05, 'articles_per_hour': 60}`.
+"""
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .base import BaseProvider, ProviderError, ProviderPage, RateLimitInfo
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Returns the process-wide provider configured by NEWS_PROVIDER."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                config = settings.NEWS_PROVIDER
+                _provider = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return _provider
@@ -0,0 +1,97 @@
+"""
+The news provider interface.
+
+A provider knows how to request one page of search results for a FetchJob,
+how to turn the response into article records and what its rate-limit headers
+mean. Everything else (paging, caching, the governor, retries and ingestion)
+is shared and lives in `news.fetcher`, so adding a provider never touches the
+views or the tasks.
+
+Article records are dicts with the keys `url`, `title`, `description`,
+`content`, `url_to_image`, `source_name` and `published_at` (an ISO 8601
+string). `news.ingestion` validates them and fits them to the columns.
+"""
+from typing import NamedTuple
+
+
+class RateLimitInfo(NamedTuple):
+    """
+    Rate-limit details a provider reported with a response.
+
+    Attributes:
+        retry_after (str): The raw Retry-After header, if any.
+        remaining (int): Calls left in the provider's current window, if reported.
+        limit (int): Size of the provider's current window, if reported.
+    """
+    retry_after: str = None
+    remaining: int = None
+    limit: int = None
+
+
+class ProviderPage(NamedTuple):
+    """
+    One page of search results.
+
+    Attributes:
+        articles (list): Article records, newest first.
+        total_results (int): Total matches for the query, or None if unknown.
+        rate_limit (RateLimitInfo): What the provider said about its limits.
+    """
+    articles: list
+    total_results: int = None
+    rate_limit: RateLimitInfo = RateLimitInfo()
+
+
+class ProviderError(Exception):
+    """
+    A page request that failed.
+
+    Attributes:
+        retryable (bool): True for rate limiting, server and network errors.
+        status (int): The HTTP status, or None if there was no response.
+        rate_limit (RateLimitInfo): What the provider said about its limits.
+    """
+
+    def __init__(self, message, retryable=False, status=None, rate_limit=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.rate_limit = rate_limit or RateLimitInfo()
+
+
+class BaseProvider:
+    """
+    Interface for news providers.
+
+    Attributes:
+        name (str): Short identifier, also used to keep cache entries of
+            different providers apart.
+    """
+    name = None
+
+    def configuration_error(self):
+        """Returns why the provider can't be used, e.g. a missing API key, or None."""
+        return None
+
+    def fetch_page(self, job, page, page_size):
+        """
+        Fetches one page of results for `job`, blocking.
+
+        Returns:
+            ProviderPage: The page's article records.
+
+        Raises:
+            ProviderError: If the request failed.
+        """
+        raise NotImplementedError
+
+    async def fetch_page_async(self, session, job, page, page_size):
+        """
+        The asyncio counterpart of `fetch_page`, using the cycle's shared
+        `aiohttp.ClientSession`.
+        """
+        raise NotImplementedError
+
+    def parse_rate_limit(self, headers):
+        """Returns the RateLimitInfo described by a response's headers."""
+        return RateLimitInfo(retry_after=headers.get('Retry-After'))
@@ -0,0 +1,151 @@
+"""
+The NewsAPI.org provider, searching `/v2/everything`.
+"""
+import aiohttp
+import asyncio
+import json
+import requests
+from django.conf import settings
+
+from ..governor import RETRY_STATUSES
+from ..metrics import PARSE, timed
+from .base import BaseProvider, ProviderError, ProviderPage, RateLimitInfo
+
+
+class NewsAPIProvider(BaseProvider):
+    """
+    Searches NewsAPI.org. The key is sent in the `X-Api-Key` header so it
+    never shows up in logged URLs.
+
+    Args:
+        base_url (str): The API base URL, ending in '/'; defaults to NEWS_API_BASE_URL.
+        api_key (str): The API key; defaults to NEWS_API_KEY.
+        timeout (float): Timeout of blocking requests; defaults to NEWS_API_TIMEOUT.
+    """
+    name = 'newsapi'
+
+    def __init__(self, base_url=None, api_key=None, timeout=None):
+        self.url = f"{base_url or settings.NEWS_API_BASE_URL}everything"
+        self.api_key = api_key or settings.NEWS_API_KEY
+        self.timeout = timeout or settings.NEWS_API_TIMEOUT
+
+    def configuration_error(self):
+        if not self.api_key:
+            return "News API key is not configured."
+        return None
+
+    def query_params(self, job, page, page_size):
+        """Returns the `/v2/everything` query parameters for one page of a FetchJob."""
+        params = {
+            'q': f'"{job.keyword_text}"',
+            'language': job.language,
+            'sortBy': 'publishedAt',
+            'page': page,
+            'pageSize': page_size,
+        }
+        if job.from_date:
+            params['from'] = job.from_date
+        if job.to_date:
+            params['to'] = job.to_date
+        return params
+
+    def fetch_page(self, job, page, page_size):
+        self._check_configured()
+        try:
+            response = requests.get(
+                self.url,
+                params=self.query_params(job, page, page_size),
+                headers={'X-Api-Key': self.api_key},
+                timeout=self.timeout,
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise ProviderError(str(e), retryable=True) from e
+        except requests.exceptions.RequestException as e:
+            raise ProviderError(str(e)) from e
+        empty = self._check_status(response.status_code, response.headers)
+        if empty is not None:
+            return empty
+        with timed(PARSE):
+            try:
+                data = response.json()
+            except ValueError as e:
+                raise ProviderError(f'Malformed response from the News API: {e}') from e
+            return self.parse_page(data, response.headers)
+
+    async def fetch_page_async(self, session, job, page, page_size):
+        self._check_configured()
+        try:
+            async with session.get(
+                self.url, params=self.query_params(job, page, page_size), headers={'X-Api-Key': self.api_key}
+            ) as response:
+                empty = self._check_status(response.status, response.headers)
+                if empty is not None:
+                    return empty
+                # Read the body here and decode it below, so the parse is timed on its own.
+                body = await response.read()
+                headers = response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ProviderError(str(e) or type(e).__name__, retryable=True) from e
+        with timed(PARSE):
+            try:
+                data = json.loads(body)
+            except ValueError as e:
+                raise ProviderError(f'Malformed response from the News API: {e}') from e
+            return self.parse_page(data, headers)
+
+    def parse_rate_limit(self, headers):
+        def as_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+
+        return RateLimitInfo(
+            retry_after=headers.get('Retry-After'),
+            remaining=as_int(headers.get('X-RateLimit-Remaining')),
+            limit=as_int(headers.get('X-RateLimit-Limit')),
+        )
+
+    def parse_page(self, data, headers):
+        """Converts a decoded `/v2/everything` response into a ProviderPage."""
+        return ProviderPage(
+            articles=[self.parse_article(article) for article in data.get('articles') or []],
+            total_results=data.get('totalResults'),
+            rate_limit=self.parse_rate_limit(headers),
+        )
+
+    @staticmethod
+    def parse_article(article_data):
+        """Converts one NewsAPI article into an article record."""
+        return {
+            'url': article_data.get('url'),
+            'title': article_data.get('title'),
+            'description': article_data.get('description'),
+            'content': article_data.get('content'),
+            'url_to_image': article_data.get('urlToImage'),
+            'source_name': (article_data.get('source') or {}).get('name'),
+            'published_at': article_data.get('publishedAt'),
+        }
+
+    def _check_configured(self):
+        error = self.configuration_error()
+        if error:
+            raise ProviderError(error)
+
+    def _check_status(self, status, headers):
+        """
+        Returns an empty page or raises ProviderError for a response that
+        carries no results, and returns None for a successful one.
+        """
+        # NewsAPI answers 426 once a page lies past the plan's result limit;
+        # there is nothing more to fetch for this window.
+        if status == 426:
+            return ProviderPage(articles=[], total_results=0, rate_limit=self.parse_rate_limit(headers))
+        if status in RETRY_STATUSES:
+            raise ProviderError(
+                f'HTTP {status} from the News API', retryable=True, status=status,
+                rate_limit=self.parse_rate_limit(headers),
+            )
+        if status >= 400:
+            raise ProviderError(f'HTTP {status} from the News API', status=status)
+        return None
@@ -0,0 +1,82 @@
+"""
+An offline provider generating deterministic synthetic articles, for load
+testing the fetch, ingestion and refresh pipeline without upstream calls.
+
+Every keyword text and language has an endless timeline of articles, one
+every `3600 / articles_per_hour` seconds, offset by a fixed per-keyword phase.
+A page holds the newest articles of the requested `from`/`to` window that
+have already been "published", so repeated fetches see the same articles, and
+new ones appear as time passes, just like a real feed. Each call waits
+`latency` seconds to stand in for the network round trip.
+"""
+import asyncio
+import math
+import time
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import quote
+
+from dateutil import parser
+from django.utils import timezone
+
+from .base import BaseProvider, ProviderPage
+
+# Article n of a timeline is published `n` intervals after this time.
+TIMELINE_EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class StubProvider(BaseProvider):
+    """
+    Serves synthetic articles from `https://stub.local/`.
+
+    Args:
+        latency (float): Seconds each call waits before answering.
+        articles_per_hour (float): Articles published per keyword text and language per hour.
+        history_days (float): How far back a fetch without a `from` date reaches.
+        sources (int): Number of distinct source names articles are spread over.
+    """
+    name = 'stub'
+
+    def __init__(self, latency=0.05, articles_per_hour=60, history_days=30, sources=20):
+        self.latency = latency
+        self.interval = 3600 / articles_per_hour
+        self.history = timedelta(days=history_days)
+        self.sources = sources
+
+    def fetch_page(self, job, page, page_size):
+        time.sleep(self.latency)
+        return self.build_page(job, page, page_size)
+
+    async def fetch_page_async(self, session, job, page, page_size):
+        await asyncio.sleep(self.latency)
+        return self.build_page(job, page, page_size)
+
+    def build_page(self, job, page, page_size, now=None):
+        """Returns one page of the job's window, newest first, as of `now`."""
+        now = now or timezone.now()
+        seed = zlib.crc32(f'{job.keyword_text}|{job.language}'.encode())
+        phase = seed % 1000 / 1000 * self.interval
+
+        to_date = min(parser.isoparse(job.to_date), now) if job.to_date else now
+        from_date = parser.isoparse(job.from_date) if job.from_date else now - self.history
+        first = math.ceil(((from_date - TIMELINE_EPOCH).total_seconds() - phase) / self.interval)
+        last = math.floor(((to_date - TIMELINE_EPOCH).total_seconds() - phase) / self.interval)
+        total = max(0, last - first + 1)
+
+        top = last - (page - 1) * page_size
+        bottom = max(first, top - page_size + 1)
+        articles = [self.build_article(job, n, seed, phase) for n in range(top, bottom - 1, -1)]
+        return ProviderPage(articles=articles, total_results=total)
+
+    def build_article(self, job, n, seed, phase):
+        """Returns article `n` of a keyword's timeline as an article record."""
+        published_at = TIMELINE_EPOCH + timedelta(seconds=phase + n * self.interval)
+        return {
+            'url': f'https://stub.local/{job.language}/{quote(job.keyword_text)}/{n}',
+            'title': f'{job.keyword_text} story {n}',
+            'description': f'Synthetic article {n} about {job.keyword_text}.',
+            'content': f'Synthetic coverage of {job.keyword_text}, item {n}. ' * 4,
+            'url_to_image': None,
+            'source_name': f'Stub Source {(seed + n) % self.sources}',
+            'published_at': published_at.isoformat(),
+        }
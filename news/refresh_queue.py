@@ -0,0 +1,237 @@
+"""
+The background refresh queue shared by the refresh workers.
+
+Due keywords are grouped by normalized text and language, as every user
+tracking the same search shares one API call, and each group is queued as a
+`RefreshJob`. Any number of worker processes then claim jobs in batches of
+NEWS_REFRESH_CLAIM_SIZE and fetch them (see `news.tasks.work_refresh_queue`),
+so refresh throughput grows with the number of workers.
+
+A claim leases its jobs to one worker for NEWS_REFRESH_LEASE_SECONDS. While
+the worker runs, a `LeaseHeartbeat` thread keeps renewing its leases, so a
+long fetch never loses its jobs; if the worker dies, the heartbeat stops
+with it and the jobs are claimed again once their leases expire. Claims are
+atomic: on PostgreSQL the waiting jobs are read with `FOR UPDATE SKIP
+LOCKED`, so workers claiming at once skip each other's rows instead of
+queueing on them, and on SQLite the claim's IMMEDIATE transaction holds the
+write lock. Either way the lease is only taken on rows still free, and a
+worker checks that it still holds a job before storing each page, so a job
+is fetched by one worker at a time and its results are never stored twice.
+A job whose workers died MAX_ATTEMPTS times is dropped and its keywords
+retried after NEWS_REFRESH_MAX_INTERVAL.
+"""
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .languages import refresh_languages
+from .models import Keyword, RefreshJob
+from .utils import normalize_keyword_text
+
+# A job is given up after this many claims that ended without its worker
+# finishing it (the worker crashed or was killed while fetching it).
+MAX_ATTEMPTS = 3
+
+
+def worker_name():
+    """Returns a name for this worker that is unique across hosts and restarts, for the lease columns."""
+    return f'{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def group_keywords(keywords, now=None):
+    """
+    Groups keywords by normalized text and language, with each keyword in a
+    group for every language it is refreshed in (see `news.languages`).
+    """
+    groups = defaultdict(list)
+    languages = refresh_languages(keywords, now)
+    for keyword in keywords:
+        for language in languages[keyword.id]:
+            groups[(normalize_keyword_text(keyword.keyword), language)].append(keyword)
+    return groups
+
+
+def enqueue_due_keywords(keywords=None, now=None, limit=None):
+    """
+    Queues a RefreshJob for each group of the keywords due at `now`, most
+    overdue first. A keyword joins its group's waiting job if there is one;
+    a keyword whose group is being fetched stays due and is queued again
+    once that job is done. Safe to run from several processes at once.
+
+    Args:
+        keywords (QuerySet): The Keyword rows to consider; defaults to all.
+        now (datetime): Keywords due at this time are queued.
+        limit (int): At most this many keywords are read.
+
+    Returns:
+        int: The number of jobs created or extended.
+    """
+    keywords = Keyword.objects.all() if keywords is None else keywords
+    now = now or timezone.now()
+    due = keywords.filter(next_refresh_at__lte=now)
+    if not due.exists():
+        return 0
+
+    with transaction.atomic():
+        # The due rows stay locked until the jobs are written, so a worker
+        # can't reschedule them, and delete their finished job, in between.
+        due = due.select_for_update(of=('self',)).order_by('next_refresh_at', 'id')
+        batch = list(due[:limit] if limit else due)
+        groups = group_keywords(batch, now)
+        existing = {
+            (job.text, job.language): job
+            for job in RefreshJob.objects.filter(
+                text__in={text for text, _ in groups}, language__in={language for _, language in groups}
+            )
+        }
+        created = []
+        extended = []
+        for (text, language), members in groups.items():
+            keyword_ids = {keyword.id for keyword in members}
+            due_at = min(keyword.next_refresh_at for keyword in members)
+            job = existing.get((text, language))
+            if job is None:
+                created.append(RefreshJob(
+                    text=text, language=language, keyword_ids=sorted(keyword_ids), due_at=due_at
+                ))
+            elif not _is_leased(job, now) and not keyword_ids <= set(job.keyword_ids):
+                job.keyword_ids = sorted(keyword_ids.union(job.keyword_ids))
+                job.due_at = min(job.due_at, due_at)
+                extended.append(job)
+        RefreshJob.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+        RefreshJob.objects.bulk_update(extended, ['keyword_ids', 'due_at'], batch_size=500)
+    return len(created) + len(extended)
+
+
+def claim_jobs(owner, limit=None, jobs=None, now=None):
+    """
+    Leases up to `limit` waiting or expired jobs to `owner`, most overdue
+    first, and returns them. Jobs claimed MAX_ATTEMPTS times already are
+    dropped instead (see `drop_exhausted_jobs`).
+
+    Args:
+        owner (str): The claiming worker's name, from `worker_name`.
+        limit (int): Defaults to NEWS_REFRESH_CLAIM_SIZE.
+        jobs (QuerySet): The RefreshJob rows to claim from; defaults to all.
+        now (datetime): The claim time.
+
+    Returns:
+        list: The claimed RefreshJob instances.
+    """
+    jobs = RefreshJob.objects.all() if jobs is None else jobs
+    limit = limit or settings.NEWS_REFRESH_CLAIM_SIZE
+    now = now or timezone.now()
+    free = Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+    with transaction.atomic():
+        drop_exhausted_jobs(jobs.filter(free, attempts__gte=MAX_ATTEMPTS), now)
+        job_ids = list(
+            jobs.filter(free).select_for_update(skip_locked=True)
+            .order_by('due_at', 'id').values_list('id', flat=True)[:limit]
+        )
+        # Only rows still free are taken, so a concurrent claim can't be overwritten.
+        RefreshJob.objects.filter(free, id__in=job_ids).update(
+            lease_owner=owner,
+            lease_expires_at=now + timedelta(seconds=settings.NEWS_REFRESH_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+        )
+    return list(RefreshJob.objects.filter(id__in=job_ids, lease_owner=owner))
+
+
+def drop_exhausted_jobs(jobs, now=None):
+    """Deletes the given jobs and postpones their keywords by NEWS_REFRESH_MAX_INTERVAL."""
+    now = now or timezone.now()
+    for job in jobs:
+        print(f"REFRESH QUEUE: Giving up on '{job.text}' ({job.language}) after {job.attempts} attempts.")
+        Keyword.objects.filter(id__in=job.keyword_ids).update(
+            next_refresh_at=now + timedelta(seconds=settings.NEWS_REFRESH_MAX_INTERVAL)
+        )
+        job.delete()
+
+
+def renew_leases(owner, now=None):
+    """Extends every lease `owner` holds by NEWS_REFRESH_LEASE_SECONDS from now. Returns how many."""
+    now = now or timezone.now()
+    return RefreshJob.objects.filter(lease_owner=owner).update(
+        lease_expires_at=now + timedelta(seconds=settings.NEWS_REFRESH_LEASE_SECONDS)
+    )
+
+
+def release_jobs(owner):
+    """Puts the jobs `owner` still holds back in the queue, e.g. when the worker is stopped."""
+    return RefreshJob.objects.filter(lease_owner=owner).update(lease_owner='', lease_expires_at=None)
+
+
+class Lease:
+    """
+    The jobs one worker claimed in a batch, looked up by (text, language)
+    as the fetcher's FetchJobs name them.
+
+    Args:
+        owner (str): The worker's name.
+        jobs (list): The claimed RefreshJob instances.
+    """
+
+    def __init__(self, owner, jobs):
+        self.owner = owner
+        self.job_ids = {(job.text, job.language): job.id for job in jobs}
+
+    def holds(self, text, language):
+        """Returns True if the worker still holds the job, i.e. no other worker reclaimed it."""
+        return RefreshJob.objects.filter(id=self.job_ids[(text, language)], lease_owner=self.owner).exists()
+
+    def finish(self, text=None, language=None):
+        """Deletes one finished job, or all of them, if the worker still holds them."""
+        if text is None:
+            job_ids = self.job_ids.values()
+        else:
+            job_ids = [self.job_ids[(text, language)]]
+        RefreshJob.objects.filter(id__in=job_ids, lease_owner=self.owner).delete()
+
+
+class LeaseHeartbeat:
+    """
+    Renews a worker's leases from a background thread every third of
+    NEWS_REFRESH_LEASE_SECONDS while the `with` block runs, and puts any
+    jobs it still holds back in the queue when the block exits.
+
+    Args:
+        owner (str): The worker's name.
+    """
+
+    def __init__(self, owner):
+        self.owner = owner
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+        release_jobs(self.owner)
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(settings.NEWS_REFRESH_LEASE_SECONDS / 3):
+                try:
+                    renew_leases(self.owner)
+                except DatabaseError as e:
+                    # Try again on the next beat; a lease outlives two missed ones.
+                    print(f"REFRESH QUEUE: Could not renew the leases of {self.owner}: {e}")
+        finally:
+            # Django opens a connection per thread; this one ends with the thread.
+            connections.close_all()
+
+
+def _is_leased(job, now):
+    return bool(job.lease_owner) and job.lease_expires_at is not None and job.lease_expires_at > now
@@ -0,0 +1,193 @@
+"""
+Retention and archival of old article text.
+
+Articles are kept in full for NEWS_RETENTION_DAYS after they are published,
+or for longer or shorter by keywords with `custom_retention_days`; an article
+linked to several keywords follows the one keeping it longest. After that,
+`archive_due_articles` moves its `description` and `content` into a gzipped
+JSON Lines segment per month of publication under NEWS_ARCHIVE_DIR and blanks
+them in the database. The slim row stays, with its title, URL, source and
+dates, so keyword links, counters, clusters and title search are unchanged.
+
+Archiving works in chunks, each written in its own short transaction, and the
+chunk size adapts so that no transaction holds the SQLite write lock for more
+than `max_lock_ms`. Segment files are appended to before the rows are
+blanked, so an interrupted run never loses text; a rerun may append an
+article again, and `read_archived` returns the last copy.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Keyword, KeywordArticle, NewsArticle
+from .stats import bump_versions
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+DEFAULT_MAX_LOCK_MS = 200
+
+
+class ArchiveStats(NamedTuple):
+    """
+    The outcome of one `archive_due_articles` run.
+
+    Attributes:
+        scanned (int): Articles old enough for the shortest retention limit.
+        archived (int): Articles whose text was moved to the archive.
+        chunks (int): Write transactions used.
+        max_lock_ms (float): The longest of those transactions.
+    """
+    scanned: int
+    archived: int
+    chunks: int
+    max_lock_ms: float
+
+
+def segment_path(published_at):
+    """Returns the archive segment file holding articles published in the month of `published_at`."""
+    return Path(settings.NEWS_ARCHIVE_DIR) / f'{published_at:%Y-%m}.jsonl.gz'
+
+
+def _retention_days(custom_days):
+    """The retention in days for a keyword's custom value, or None to keep articles forever."""
+    return custom_days or settings.NEWS_RETENTION_DAYS or None
+
+
+def due_articles(candidates, now):
+    """
+    Picks the candidate articles past the retention of every keyword that
+    links to them, with one query for the whole chunk.
+
+    Args:
+        candidates (list): (id, published_at) pairs of unarchived articles.
+        now (datetime): The reference time.
+
+    Returns:
+        list: The ids of the due articles.
+    """
+    limits = {}
+    for article_id, custom_days in KeywordArticle.objects.filter(
+        article_id__in=[article_id for article_id, _ in candidates]
+    ).values_list('article_id', 'keyword__custom_retention_days'):
+        limits.setdefault(article_id, []).append(_retention_days(custom_days))
+
+    due = []
+    for article_id, published_at in candidates:
+        # Articles without links follow the global limit.
+        days = limits.get(article_id, [_retention_days(None)])
+        if None not in days and published_at < now - timedelta(days=max(days)):
+            due.append(article_id)
+    return due
+
+
+def write_segments(articles):
+    """
+    Appends articles' text to the segments of their months, one gzip member
+    per segment, and syncs the files to disk.
+
+    Args:
+        articles (list): Dicts with the id, url, published_at, description
+            and content of each article.
+    """
+    by_segment = {}
+    for article in articles:
+        by_segment.setdefault(segment_path(article['published_at']), []).append(article)
+    for path, records in by_segment.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = ''.join(
+            json.dumps({**record, 'published_at': record['published_at'].isoformat()}, ensure_ascii=False) + '\n'
+            for record in records
+        )
+        with open(path, 'ab') as segment:
+            segment.write(gzip.compress(lines.encode()))
+            segment.flush()
+            os.fsync(segment.fileno())
+
+
+def archive_due_articles(now=None, chunk_size=DEFAULT_CHUNK_SIZE, max_lock_ms=DEFAULT_MAX_LOCK_MS, dry_run=False):
+    """
+    Archives the text of every article past its retention, oldest first.
+
+    Candidates are read in chunks by (published_at, id). Each chunk's due
+    articles are appended to their segments and then blanked in one
+    transaction; the next chunk is halved when that transaction took more
+    than half of `max_lock_ms` and doubled when it took less than a quarter.
+    With `dry_run`, only counts the due articles.
+
+    Returns:
+        ArchiveStats: What was scanned and archived.
+    """
+    now = now or timezone.now()
+    # Only articles older than the shortest limit in use can be due.
+    custom_days = Keyword.objects.filter(custom_retention_days__isnull=False).values_list(
+        'custom_retention_days', flat=True
+    ).distinct()
+    limits = {days for days in map(_retention_days, [None, *custom_days]) if days is not None}
+    if not limits:
+        return ArchiveStats(0, 0, 0, 0.0)
+
+    pending = NewsArticle.objects.filter(
+        archived_at__isnull=True, published_at__lt=now - timedelta(days=min(limits))
+    ).order_by('published_at', 'id')
+    scanned = archived = chunks = 0
+    max_lock = 0.0
+    after = None
+    while True:
+        page = pending
+        if after:
+            page = page.filter(published_at__gte=after[0]).exclude(published_at=after[0], id__lte=after[1])
+        candidates = list(page.values_list('id', 'published_at')[:chunk_size])
+        if not candidates:
+            break
+        after = candidates[-1][1], candidates[-1][0]
+        scanned += len(candidates)
+        due = due_articles(candidates, now)
+        if not due or dry_run:
+            archived += len(due)
+            continue
+
+        write_segments(list(
+            NewsArticle.objects.filter(id__in=due).values('id', 'url', 'published_at', 'description', 'content')
+        ))
+        started = time.perf_counter()
+        with transaction.atomic():
+            archived += NewsArticle.objects.filter(id__in=due, archived_at__isnull=True).update(
+                description='', content='', archived_at=now
+            )
+            bump_versions(KeywordArticle.objects.filter(article_id__in=due).values('keyword_id'))
+        elapsed = (time.perf_counter() - started) * 1000
+        chunks += 1
+        max_lock = max(max_lock, elapsed)
+        if elapsed > max_lock_ms / 2:
+            chunk_size = max(chunk_size // 2, 1)
+        elif elapsed < max_lock_ms / 4:
+            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+
+    return ArchiveStats(scanned, archived, chunks, max_lock)
+
+
+def read_archived(article):
+    """
+    Returns the archived description and content of an article as a dict, or
+    None if it is not archived or its segment is missing.
+    """
+    if article.archived_at is None:
+        return None
+    path = segment_path(article.published_at)
+    if not path.exists():
+        return None
+    found = None
+    with gzip.open(path, 'rt', encoding='utf-8') as segment:
+        for line in segment:
+            record = json.loads(line)
+            if record['id'] == article.id:
+                found = record
+    return found
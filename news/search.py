@@ -0,0 +1,160 @@
+"""
+Full-text search over stored articles.
+
+Searches `title`, `description` and `content` without calling NewsAPI again.
+On SQLite the index is the `news_article_fts` FTS5 table, kept in sync with
+`news_newsarticle` by triggers; on PostgreSQL it is the generated
+`search_vector` tsvector column with a GIN index. Both are created by the
+`0006_article_search_index` migration. Other databases fall back to
+`icontains` filters.
+
+Queries support bare words (all must match), "quoted phrases" and prefix
+matching with a trailing `*`, e.g. `"electric car" tesl*`.
+"""
+import re
+from typing import NamedTuple
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import NewsArticle
+
+# Relative weights of title, description and content when ranking matches.
+SQLITE_BM25_WEIGHTS = (10.0, 3.0, 1.0)
+POSTGRES_TEXT_SEARCH_CONFIG = 'simple'
+
+TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class SearchTerm(NamedTuple):
+    """One parsed query term: a single word, a prefix or a phrase of words."""
+    words: tuple
+    prefix: bool = False
+
+    @property
+    def is_phrase(self):
+        return len(self.words) > 1
+
+
+def parse_search_query(text):
+    """
+    Splits user input into SearchTerms. Punctuation is dropped, so the result
+    is always safe to turn into a MATCH or tsquery expression.
+    """
+    terms = []
+    for phrase, word in TERM_PATTERN.findall(text or ''):
+        if phrase:
+            words = tuple(w.lower() for w in WORD_PATTERN.findall(phrase))
+            if words:
+                terms.append(SearchTerm(words))
+            continue
+        prefix = word.endswith('*')
+        # A token like "e-mail" becomes the phrase "e mail", as the tokenizers
+        # would index it.
+        words = tuple(w.lower() for w in WORD_PATTERN.findall(word))
+        if words:
+            terms.append(SearchTerm(words, prefix=prefix))
+    return terms
+
+
+def build_fts5_query(terms):
+    """Returns an FTS5 MATCH expression requiring every term."""
+    parts = []
+    for term in terms:
+        part = '"{}"'.format(' '.join(term.words))
+        if term.prefix:
+            part += '*'
+        parts.append(part)
+    return ' '.join(parts)
+
+
+def build_tsquery(terms):
+    """Returns a `to_tsquery` expression requiring every term."""
+    parts = []
+    for term in terms:
+        words = list(term.words)
+        if term.prefix:
+            words[-1] += ':*'
+        part = ' <-> '.join(words)
+        parts.append(f'({part})' if term.is_phrase else part)
+    return ' & '.join(parts)
+
+
+def search_articles(text, scope, limit, offset=0):
+    """
+    Runs a ranked full-text search.
+
+    Args:
+        text (str): The user's query.
+        scope (QuerySet): A `values('article_id')` or `values('id')` queryset of
+            the articles the search may return, e.g. one user's keywords.
+        limit (int): Maximum number of results.
+        offset (int): Number of best-ranked results to skip.
+
+    Returns:
+        list: Matching article ids, best match first.
+    """
+    terms = parse_search_query(text)
+    if not terms:
+        return []
+
+    scope_sql, scope_params = scope.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            weights = ', '.join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+            cursor.execute(
+                f'SELECT rowid FROM news_article_fts '
+                f'WHERE news_article_fts MATCH %s AND rowid IN ({scope_sql}) '
+                f'ORDER BY bm25(news_article_fts, {weights}) LIMIT %s OFFSET %s',
+                [build_fts5_query(terms), *scope_params, limit, offset],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'SELECT a.id FROM news_newsarticle a, to_tsquery(%s, %s) query '
+                f'WHERE a.search_vector @@ query AND a.id IN ({scope_sql}) '
+                f'ORDER BY ts_rank_cd(a.search_vector, query) DESC, a.published_at DESC '
+                f'LIMIT %s OFFSET %s',
+                [POSTGRES_TEXT_SEARCH_CONFIG, build_tsquery(terms), *scope_params, limit, offset],
+            )
+        else:
+            return _search_without_index(terms, scope, limit, offset)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filter_matching(queryset, text):
+    """
+    Restricts a NewsArticle queryset to articles matching `text`, unranked.
+    Used where the caller applies its own ordering, such as the admin.
+    """
+    terms = parse_search_query(text)
+    if not terms:
+        return queryset
+    if connection.vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM news_article_fts WHERE news_article_fts MATCH %s', [build_fts5_query(terms)]
+        ))
+    if connection.vendor == 'postgresql':
+        return queryset.filter(id__in=RawSQL(
+            'SELECT id FROM news_newsarticle WHERE search_vector @@ to_tsquery(%s, %s)',
+            [POSTGRES_TEXT_SEARCH_CONFIG, build_tsquery(terms)]
+        ))
+    return queryset.filter(_term_filters(terms))
+
+
+def _term_filters(terms):
+    """Builds an unindexed `icontains` filter equivalent to the terms."""
+    condition = Q()
+    for term in terms:
+        needle = ' '.join(term.words)
+        condition &= (
+            Q(title__icontains=needle) | Q(description__icontains=needle) | Q(content__icontains=needle)
+        )
+    return condition
+
+
+def _search_without_index(terms, scope, limit, offset):
+    """Fallback for databases without a search index; newest matches first."""
+    matches = NewsArticle.objects.filter(id__in=scope).filter(_term_filters(terms)).order_by('-published_at')
+    return list(matches.values_list('id', flat=True)[offset:offset + limit])
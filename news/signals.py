@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .feed import prune_feed
+from .models import Keyword
+from .trending import record_subscriber
+from .utils import normalize_keyword_text
+
+@receiver(pre_save, sender=Keyword)
+def remember_keyword_text(sender, instance, update_fields=None, **kwargs):
+    """
+    Records the stored text of a keyword about to be saved, so a renamed
+    keyword can move its subscription to the new text.
+    """
+    instance._previous_text = None
+    if instance.pk and (update_fields is None or 'keyword' in update_fields):
+        instance._previous_text = sender.objects.filter(pk=instance.pk).values_list('keyword', flat=True).first()
+
+@receiver(post_save, sender=Keyword)
+def count_keyword_subscriber(sender, instance, created, **kwargs):
+    """
+    A signal to keep the trending subscriber counts in step with new and renamed keywords.
+    """
+    previous_text = getattr(instance, '_previous_text', None)
+    if created:
+        record_subscriber(instance.keyword, 1)
+    elif previous_text and normalize_keyword_text(previous_text) != normalize_keyword_text(instance.keyword):
+        record_subscriber(previous_text, -1)
+        record_subscriber(instance.keyword, 1)
+
+@receiver(post_delete, sender=Keyword)
+def uncount_keyword_subscriber(sender, instance, **kwargs):
+    """
+    A signal to remove a deleted keyword from the trending subscriber counts.
+    """
+    record_subscriber(instance.keyword, -1)
+
+@receiver(post_delete, sender=Keyword)
+def prune_keyword_feed(sender, instance, **kwargs):
+    """
+    A signal to take the articles only a deleted keyword matched out of its user's feed.
+    """
+    prune_feed(instance.user_id)
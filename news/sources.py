@@ -0,0 +1,58 @@
+"""
+Interned news sources and the keyword page's source facets.
+
+Articles reference a `Source` row instead of repeating the source name, and
+the id is copied onto their keyword links and feed entries, so filtering a
+list by source is an integer equality served by an index. `ingest_articles`
+calls `intern_sources` for each page it stores.
+
+A keyword's article count per source is kept in `KeywordStats.source_counts`,
+keyed by source id, by the ingestion path (see `news.stats`), so
+`source_facets` builds the keyword page's source picker from the statistics
+rows instead of counting links on every page load.
+"""
+from collections import Counter
+
+from .models import Source
+
+# Sources offered by the keyword page's source picker.
+SOURCE_FACET_LIMIT = 100
+
+
+def intern_sources(names):
+    """
+    Returns the Source id of each name, by name, creating the sources not
+    seen before. Safe to run from several writers at once.
+
+    Args:
+        names (iterable): Source names, at most as long as `Source.name` allows.
+    """
+    names = set(names)
+    source_ids = dict(Source.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - source_ids.keys()
+    if missing:
+        Source.objects.bulk_create([Source(name=name) for name in missing], ignore_conflicts=True)
+        source_ids.update(Source.objects.filter(name__in=missing).values_list('name', 'id'))
+    return source_ids
+
+
+def source_facets(stats_rows, selected=None, limit=SOURCE_FACET_LIMIT):
+    """
+    Returns the sources of a keyword's articles with their article counts,
+    most articles first, as (Source, count) pairs.
+
+    Args:
+        stats_rows (iterable): The keyword's KeywordStats rows of the listed
+            languages; counts are added up across them.
+        selected (int): The id of the source the list is filtered by, which
+            is always included.
+        limit (int): At most this many other sources are returned.
+    """
+    counts = Counter()
+    for stats in stats_rows:
+        counts.update({int(source_id): count for source_id, count in stats.source_counts.items()})
+    source_ids = [source_id for source_id, _ in counts.most_common(limit)]
+    if selected is not None and selected not in source_ids:
+        source_ids.append(selected)
+    sources = Source.objects.in_bulk(source_ids)
+    return [(sources[source_id], counts[source_id]) for source_id in source_ids if source_id in sources]
@@ -0,0 +1,141 @@
+"""
+Maintenance of the per-keyword article statistics in `KeywordStats`.
+
+`ingest_articles` calls `record_new_links` in the same transaction that
+writes the links, so the statistics are updated incrementally and page loads
+never aggregate over a keyword's links. `rebuild_keyword_stats` recomputes
+rows from the links, for use after articles are deleted in bulk.
+
+Each row also carries a version, bumped whenever the keyword's article list
+in that language may have changed, which the keyword page uses for its ETag
+and fragment cache keys. Code that changes listed articles outside ingestion
+calls `bump_versions`.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+
+from .models import KeywordArticle, KeywordStats
+
+
+def record_new_links(links):
+    """
+    Adds newly created keyword links to the statistics.
+
+    Must be called inside the transaction that created the links. Rows are
+    created if missing and then locked, so concurrent ingests of the same
+    keyword add their counts one after the other.
+
+    Args:
+        links (list): The KeywordArticle instances the transaction inserted,
+            without any that bulk_create's ignore_conflicts dropped.
+    """
+    deltas = defaultdict(lambda: {'count': 0, 'newest': None, 'oldest': None, 'sources': Counter()})
+    changed_at = max((link.created_at for link in links), default=None)
+    for link in links:
+        delta = deltas[(link.keyword_id, link.language)]
+        delta['count'] += 1
+        if delta['newest'] is None or link.published_at > delta['newest']:
+            delta['newest'] = link.published_at
+        if delta['oldest'] is None or link.published_at < delta['oldest']:
+            delta['oldest'] = link.published_at
+        # Keys are strings, as they come back from the JSON column.
+        delta['sources'][str(link.source_id)] += 1
+    if not deltas:
+        return
+
+    KeywordStats.objects.bulk_create(
+        [KeywordStats(keyword_id=keyword_id, language=language) for keyword_id, language in deltas],
+        ignore_conflicts=True,
+    )
+    rows = KeywordStats.objects.select_for_update().filter(
+        keyword_id__in={keyword_id for keyword_id, _ in deltas},
+        language__in={language for _, language in deltas},
+    )
+    updated = []
+    for stats in rows:
+        delta = deltas.get((stats.keyword_id, stats.language))
+        if delta is None:
+            continue
+        stats.article_count += delta['count']
+        if stats.newest_published_at is None or delta['newest'] > stats.newest_published_at:
+            stats.newest_published_at = delta['newest']
+        if stats.oldest_published_at is None or delta['oldest'] < stats.oldest_published_at:
+            stats.oldest_published_at = delta['oldest']
+        stats.source_counts = dict(Counter(stats.source_counts) + delta['sources'])
+        stats.version += 1
+        stats.changed_at = changed_at
+        updated.append(stats)
+    KeywordStats.objects.bulk_update(
+        updated,
+        ['article_count', 'newest_published_at', 'oldest_published_at', 'source_counts', 'version', 'changed_at'],
+    )
+
+
+def bump_versions(keyword_ids=None):
+    """
+    Marks the article lists of keywords as changed, e.g. after their
+    articles were archived or regrouped.
+
+    Args:
+        keyword_ids (iterable): Keywords whose lists changed; all keywords if None.
+    """
+    rows = KeywordStats.objects.all()
+    if keyword_ids is not None:
+        rows = rows.filter(keyword_id__in=keyword_ids)
+    rows.update(version=F('version') + 1, changed_at=timezone.now())
+
+
+def rebuild_keyword_stats(keyword_ids=None):
+    """
+    Recomputes statistics from the keyword links. Versions carry on from the
+    replaced rows, so pages cached before the rebuild are not served again.
+
+    Args:
+        keyword_ids (iterable): Keywords to rebuild; all keywords if None.
+
+    Returns:
+        int: The number of statistics rows written.
+    """
+    links = KeywordArticle.objects.all()
+    stats_rows = KeywordStats.objects.all()
+    if keyword_ids is not None:
+        keyword_ids = list(keyword_ids)
+        links = links.filter(keyword_id__in=keyword_ids)
+        stats_rows = stats_rows.filter(keyword_id__in=keyword_ids)
+
+    sources = defaultdict(dict)
+    for keyword_id, language, source_id, count in (
+        links.values_list('keyword_id', 'language', 'source_id')
+        .annotate(count=Count('id')).order_by()
+    ):
+        sources[(keyword_id, language)][str(source_id)] = count
+
+    with transaction.atomic():
+        versions = {
+            (keyword_id, language): version
+            for keyword_id, language, version in stats_rows.values_list('keyword_id', 'language', 'version')
+        }
+        now = timezone.now()
+        rebuilt = [
+            KeywordStats(
+                keyword_id=keyword_id,
+                language=language,
+                article_count=count,
+                newest_published_at=newest,
+                oldest_published_at=oldest,
+                source_counts=sources[(keyword_id, language)],
+                version=versions.get((keyword_id, language), 0) + 1,
+                changed_at=now,
+            )
+            for keyword_id, language, count, newest, oldest in (
+                links.values_list('keyword_id', 'language')
+                .annotate(count=Count('id'), newest=Max('published_at'), oldest=Min('published_at'))
+                .order_by()
+            )
+        ]
+        stats_rows.delete()
+        KeywordStats.objects.bulk_create(rebuilt, batch_size=1000)
+    return len(rebuilt)
@@ -1,9 +1,19 @@
 from background_task import background
-from .models import Keyword, NewsArticle
-import requests
+from background_task.models import Task
+from .backfill import plan_walks, save_progress
+from .cadence import update_refresh_intervals
+from .fetch_cache import bucket_from_date, get_fetch_cache
+from .fetcher import FetchJob, refresh
+from .governor import BACKGROUND, get_governor, sync_quota_usage
+from .ingestion import ingest_articles
+from .metrics import CYCLE, get_metrics, timed
+from .models import Keyword, KeywordStats
+from .providers import get_provider
+from .interactive import fetch_and_save_articles
+from .refresh_queue import Lease, LeaseHeartbeat, claim_jobs, enqueue_due_keywords, worker_name
+from collections import defaultdict
 from django.conf import settings
 from django.utils import timezone
-from dateutil import parser
 from datetime import timedelta
 import os
 
@@ -11,67 +21,300 @@ import os
 MASTER_TASK_INTERVAL = 300
 # The global default refresh interval (if no custom one is set)
 # Fetches from .env, defaults to 1 hour (3600s)
-REFRESH_INTERVAL_GLOBAL = int(os.getenv('BACKGROUND_TASK_REFRESH_INTERVAL', 3600))
+REFRESH_INTERVAL_GLOBAL = settings.REFRESH_INTERVAL_GLOBAL
+# Each run of the master task queues at most REFRESH_BATCH_SIZE *
+# REFRESH_MAX_BATCHES due keywords and works off at most REFRESH_MAX_BATCHES
+# claims itself, so a backlog (e.g. after the workers were down) is spread
+# over several cycles, or over the refresh_worker processes, instead of
+# holding up the first searches queued behind it.
+REFRESH_BATCH_SIZE = int(os.getenv('BACKGROUND_TASK_REFRESH_BATCH_SIZE', 500))
+REFRESH_MAX_BATCHES = int(os.getenv('BACKGROUND_TASK_REFRESH_MAX_BATCHES', 10))
+# First searches are queued above the default priority (0) so a waiting user
+# is served before scheduled refreshes.
+FIRST_SEARCH_PRIORITY = 100
 
 
-@background(schedule=10, repeat=MASTER_TASK_INTERVAL)
+# The repeat interval is passed when the task is scheduled; the decorator only
+# accepts the initial delay.
+@background(schedule=10)
 def refresh_all_keywords_master():
     """
-    The main repeating background task. It runs frequently, checks all keywords,
-    and decides if they need a refresh based on their individual interval.
+    The main repeating background task. It runs frequently, queues the
+    keywords whose `next_refresh_at` has passed and works off part of the
+    queue, most overdue first. Any `refresh_worker` processes claim the rest.
+
+    Due keywords are grouped by normalized text and by each language they
+    were viewed in lately, so that every user tracking the same keyword in
+    the same language shares a single API call (see `news.refresh_queue`),
+    and the groups are fetched concurrently by `news.fetcher`.
     """
-    print(f"MASTER TASK: Checking all keywords for scheduled refresh...")
-    keywords = Keyword.objects.all()
-    for keyword in keywords:
-        interval = keyword.custom_refresh_interval or REFRESH_INTERVAL_GLOBAL
+    print(f"MASTER TASK: Checking for keywords due for refresh...")
+    configuration_error = get_provider().configuration_error()
+    if configuration_error:
+        print(f"MASTER TASK: {configuration_error}")
+        return
+
+    governor = get_governor()
+    sync_quota_usage(governor)
+    if governor.remaining(BACKGROUND) == 0:
+        print("MASTER TASK: Background share of the daily News API quota is used up.")
+        return
+
+    refresh_due_keywords(max_claims=REFRESH_MAX_BATCHES, governor=governor)
+    sync_quota_usage(governor)
+    # The worker may sit idle until the next cycle; publish this one's counts now.
+    get_metrics().flush()
+
+
+def refresh_due_keywords(keywords=None, now=None, jobs=None, max_claims=None, **options):
+    """
+    Queues the keywords of a queryset whose `next_refresh_at` has passed and
+    refreshes queued jobs in this process until the queue is empty or
+    `max_claims` batches are done. Used by the master task and the
+    `refresh_worker` and `load_test_refresh` commands.
+
+    Args:
+        keywords (QuerySet): The Keyword rows to consider; defaults to all.
+        now (datetime): Keywords due at this time are queued.
+        jobs (QuerySet): The RefreshJob rows to claim from; defaults to all.
+        max_claims (int): Stop after this many claimed batches.
+        **options: Passed on to `work_refresh_queue`.
+
+    Returns:
+        list: The CycleStats of each batch.
+    """
+    queued = enqueue_due_keywords(keywords, now, limit=REFRESH_BATCH_SIZE * REFRESH_MAX_BATCHES)
+    if queued:
+        print(f"REFRESH QUEUE: Queued {queued} refresh jobs.")
+    return work_refresh_queue(jobs, max_claims, **options)
+
+
+def work_refresh_queue(jobs=None, max_claims=None, owner=None, **options):
+    """
+    Claims batches of queued refresh jobs and fetches them, until there are
+    none left, `max_claims` batches are done or the background quota is
+    used up. Any number of processes may run this at once; each job is
+    leased to one of them (see `news.refresh_queue`).
+
+    Args:
+        jobs (QuerySet): The RefreshJob rows to claim from; defaults to all.
+        max_claims (int): Stop after this many batches.
+        owner (str): The worker's name; defaults to a new one.
+        **options: Passed on to `news.fetcher.run_refresh_cycle`.
 
-        # If the keyword has never been searched, or if enough time has passed, run the fetch
-        if keyword.last_searched is None or (timezone.now() - keyword.last_searched > timedelta(seconds=interval)):
-            _fetch_for_keyword(keyword.id)
+    Returns:
+        list: The CycleStats of each batch.
+    """
+    governor = options.setdefault('governor', get_governor())
+    owner = owner or worker_name()
+    cycles = []
+    with LeaseHeartbeat(owner):
+        while max_claims is None or len(cycles) < max_claims:
+            if governor.remaining(BACKGROUND) == 0:
+                break
+            claimed = claim_jobs(owner, jobs=jobs)
+            if not claimed:
+                break
+            print(f"REFRESH WORKER: {owner} claimed {len(claimed)} jobs.")
+            with timed(CYCLE):
+                cycles.append(_refresh_claimed(claimed, Lease(owner, claimed), **options))
+    return [stats for stats in cycles if stats is not None]
 
 
-def _fetch_for_keyword(keyword_id):
-    """A helper function to fetch articles for a single keyword."""
-    print(f"HELPER: Fetching articles for keyword_id: {keyword_id}")
+@background(schedule=0)
+def fetch_first_search(keyword_id, language):
+    """
+    Fetches the first page of articles for a keyword the user has just opened in
+    a language with no stored articles. Queued by the keyword articles view so
+    the page renders without waiting on the API.
+    """
     try:
         keyword = Keyword.objects.get(id=keyword_id)
     except Keyword.DoesNotExist:
         return
 
-    api_key = settings.NEWS_API_KEY
-    if not api_key: return
+    # Another search may have filled this language since the task was queued.
+    if keyword.stats.filter(language=language, article_count__gt=0).exists():
+        return
+
+    new_count, error_message = fetch_and_save_articles(keyword, language=language)
+    if error_message:
+        print(f"FIRST SEARCH: Failed for '{keyword.keyword}' ({language}): {error_message}")
+    else:
+        print(f"FIRST SEARCH: Found {new_count} articles for '{keyword.keyword}' ({language})")
+    get_metrics().flush()
 
-    latest_article = keyword.articles.order_by('-published_at').first()
-    url = f'https://newsapi.org/v2/everything?q="{keyword.keyword}"&apiKey={api_key}&sortBy=publishedAt'
 
-    if latest_article:
-        from_date = (latest_article.published_at + timedelta(seconds=1)).isoformat()
-        url += f'&from={from_date}'
+def is_first_search_pending(keyword_id, language):
+    """Returns True if a first search for this keyword and language is queued or running."""
+    return Task.objects.get_task(fetch_first_search.name, args=(keyword_id, language)).filter(
+        failed_at__isnull=True
+    ).exists()
 
+
+def queue_first_search(keyword_id, language):
+    """Queues a high-priority first search unless one is already pending."""
+    if not is_first_search_pending(keyword_id, language):
+        fetch_first_search(keyword_id, language, priority=FIRST_SEARCH_PRIORITY)
+
+
+def _refresh_claimed(claimed, lease, **options):
+    """
+    Fetches a batch of claimed RefreshJobs, then deletes them. Keywords
+    deleted since they were queued are left out.
+
+    Returns:
+        CycleStats: The batch's counts, or None if none of its keywords are left.
+    """
+    keywords = Keyword.objects.in_bulk([keyword_id for job in claimed for keyword_id in job.keyword_ids])
+    groups = {}
+    for job in claimed:
+        members = [keywords[keyword_id] for keyword_id in job.keyword_ids if keyword_id in keywords]
+        if members:
+            groups[(job.text, job.language)] = members
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-    except requests.exceptions.RequestException:
+        return _refresh_groups(groups, lease, **options)
+    finally:
+        # Failed groups were rescheduled for a retry; a group whose results
+        # couldn't be stored is still due and is queued again.
+        lease.finish()
+
+
+def _refresh_groups(groups, lease=None, **options):
+    """
+    Fetches each (keyword text, language) group once and attaches the results to
+    every keyword in the group. Options are passed on to `run_refresh_cycle`.
+
+    Args:
+        groups (dict): Lists of Keyword instances by (keyword text, language).
+        lease (Lease): The claim the groups came from, if any. Pages of a job
+            another worker has taken over since are not stored.
+
+    Returns:
+        CycleStats: The cycle's counts, or None if there was nothing to fetch.
+    """
+    if not groups:
+        return None
+
+    options.setdefault('cache', get_fetch_cache())
+    started = timezone.now()
+    outcomes = {'finished': set(), 'unfinished': set()}
+
+    def save_result(result):
+        job = result.job
+        if lease is not None and not lease.holds(job.keyword_text, job.language):
+            print(f"HELPER: Lost the lease on '{job.keyword_text}' ({job.language}); "
+                  f"not storing page {result.page}.")
+            return
+        _save_fetch_result(result, outcomes)
+        if lease is not None and (result.error or result.last):
+            lease.finish(job.keyword_text, job.language)
+
+    stats = refresh(_build_fetch_jobs(groups), save_result, **options)
+    print(f"MASTER TASK: Refreshed {stats.fetched} groups ({stats.failed} failed, {stats.pages} pages) "
+          f"in {stats.elapsed:.1f}s, {stats.jobs_per_second:.1f} groups/s.")
+
+    # Only keywords fetched in full, in every language, measure their arrival rate.
+    finished = outcomes['finished'] - outcomes['unfinished']
+    update_refresh_intervals(
+        list({keyword.id: keyword for keywords in groups.values() for keyword in keywords
+              if keyword.id in finished}.values()),
+        since=started,
+    )
+    return stats
+
+
+def _build_fetch_jobs(groups):
+    """
+    Builds one FetchJob per group. Each job only asks for articles newer than
+    what every keyword in the group already has; a keyword with no articles yet
+    needs the full result. A group with an unfinished walk resumes it instead,
+    unless one of its keywords has no articles yet.
+    """
+    keyword_ids = [keyword.id for keywords in groups.values() for keyword in keywords]
+    languages = {language for _, language in groups}
+
+    # One lookup of the stats rows for the newest article of every keyword.
+    latest_per_keyword = {
+        (keyword_id, language): newest
+        for keyword_id, language, newest in KeywordStats.objects.filter(
+            keyword_id__in=keyword_ids, language__in=languages
+        ).values_list('keyword_id', 'language', 'newest_published_at')
+    }
+
+    from_dates = {}
+    fresh = set()
+    for (keyword_text, language), keywords in groups.items():
+        latest = [latest_per_keyword.get((keyword.id, language)) for keyword in keywords]
+        from_date = None
+        if all(latest):
+            from_date = bucket_from_date(min(latest) + timedelta(seconds=1)).isoformat()
+        else:
+            fresh.add((keyword_text, language))
+        from_dates[(keyword_text, language)] = from_date
+
+    plans = plan_walks(from_dates, fresh)
+    return [
+        FetchJob(keyword_text, language, [keyword.id for keyword in keywords], *plans[(keyword_text, language)])
+        for (keyword_text, language), keywords in groups.items()
+    ]
+
+
+def _save_fetch_result(result, outcomes=None):
+    """
+    Stores one fetched page and the walk's progress, and reschedules the
+    group's keywords after its last page. Called from the fetcher's single
+    writer thread.
+
+    Args:
+        result (FetchResult): The page or error.
+        outcomes (dict): If given, the ids of the group's keywords are added
+            to its `finished` set once the group's results were fetched and
+            stored in full from the first page, and to `unfinished` otherwise.
+    """
+    job = result.job
+    now = timezone.now()
+    if result.error:
+        if outcomes is not None:
+            outcomes['unfinished'].update(job.keyword_ids)
+        print(f"HELPER: Fetch failed for '{job.keyword_text}' ({job.language}): {result.error}")
+        # Retry on the next cycle rather than straight away.
+        Keyword.objects.filter(id__in=job.keyword_ids).update(
+            next_refresh_at=now + timedelta(seconds=MASTER_TASK_INTERVAL)
+        )
         return
 
-    for article_data in data.get('articles', []):
-        if not NewsArticle.objects.filter(url=article_data['url']).exists():
-            try:
-                if not article_data.get('publishedAt'): continue
-                NewsArticle.objects.create(
-                    keyword=keyword,
-                    title=article_data.get('title'),
-                    description=article_data.get('description') or '',
-                    content=article_data.get('content') or '',
-                    url=article_data.get('url'),
-                    url_to_image=article_data.get('urlToImage'),
-                    published_at=parser.isoparse(article_data['publishedAt']),
-                    source_name=article_data.get('source', {}).get('name', 'Unknown Source'),
-                    language=article_data.get('language', 'en')
-                )
-            except Exception as e:
-                print(f"ERROR saving article: {e}")
-
-    keyword.last_searched = timezone.now()
-    keyword.save()
+    try:
+        keywords = list(Keyword.objects.filter(id__in=job.keyword_ids))
+        ingested = ingest_articles(keywords, result.articles, job.language)
+        save_progress(job.keyword_text, job.language, job.from_date, job.to_date, result.page, result.more)
+    except Exception:
+        # The page is lost: the keywords are not rescheduled, so they stay
+        # due, and this cycle tells nothing about their arrival rate.
+        if outcomes is not None:
+            outcomes['unfinished'].update(job.keyword_ids)
+        raise
+    if outcomes is not None and result.last:
+        finished = not result.more and job.start_page == 1
+        outcomes['finished' if finished else 'unfinished'].update(job.keyword_ids)
+    print(f"HELPER: Saved {ingested.inserted} new articles and {ingested.linked} keyword links "
+          f"for '{job.keyword_text}' ({job.language}), page {result.page}")
+    if not result.last:
+        return
+
+    if result.more:
+        # Stopped at the page limit: carry on with the walk next cycle.
+        Keyword.objects.filter(id__in=job.keyword_ids).update(
+            last_searched=now, next_refresh_at=now + timedelta(seconds=MASTER_TASK_INTERVAL)
+        )
+        return
+
+    # One update per distinct interval; usually every keyword uses the global one.
+    ids_by_interval = defaultdict(list)
+    for keyword in keywords:
+        ids_by_interval[keyword.refresh_interval].append(keyword.id)
+    for interval, keyword_ids in ids_by_interval.items():
+        Keyword.objects.filter(id__in=keyword_ids).update(
+            last_searched=now,
+            next_refresh_at=now + timedelta(seconds=interval),
+        )
@@ -1,3 +1,1424 @@
-from django.test import TestCase
+import asyncio
+import email.utils
+import json
+import math
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from background_task.models import Task
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from news import fetch_cache, governor, live, metrics, providers, trending
+from news.cadence import adaptive_interval, update_refresh_intervals
+from news.dedup import (
+    MIN_SIMILARITY, article_shingles, cluster_source_counts, hide_copies, shingles, similarity,
+)
+from news.feed import rebuild_feeds
+from news.fetcher import FetchJob, has_more_pages, refresh
+from news.interactive import fetch_and_save_articles
+from news.ingestion import IngestResult, ingest_articles
+from news.languages import DEFAULT_LANGUAGE, record_language_view, refresh_languages
+from news.middleware import QueryCounter
+from news.models import (
+    ApiQuotaUsage, ApiToken, FeedEntry, FetchCursor, Keyword, KeywordArticle, KeywordLanguage, KeywordStats,
+    NewsArticle, RefreshJob, Source,
+)
+from news.pagination import paginate_keyset
+from news.providers import ProviderError, RateLimitInfo
+from news.providers.newsapi import NewsAPIProvider
+from news.providers.stub import StubProvider
+from news.refresh_queue import (
+    MAX_ATTEMPTS, Lease, claim_jobs, enqueue_due_keywords, release_jobs, renew_leases,
+)
+from news.retention import archive_due_articles, read_archived
+from news.search import SearchTerm, build_fts5_query, build_tsquery, parse_search_query, search_articles
+from news.sources import intern_sources, source_facets
+from news.stats import bump_versions, rebuild_keyword_stats
+from news.tasks import FIRST_SEARCH_PRIORITY, _build_fetch_jobs, fetch_first_search, refresh_due_keywords
+from news.trending import rebuild_trending, top_trending
+
+
+def reset_side_stores():
+    """
+    Forgets the process-wide provider, metrics, governor, fetch cache and
+    live event log, so they are built from the settings again. Buffered
+    metrics are written first, while their file still exists.
+    """
+    if metrics._metrics is not None:
+        metrics._metrics.flush()
+    providers._provider = None
+    metrics._metrics = None
+    governor._governor = None
+    fetch_cache._cache = None
+    live._events = None
+    live._hub = None
+
+
+def article_record(n, keyword='tesla', source='BBC News', published_at=None):
+    """Returns a provider article record, as `news.providers` produce them."""
+    published_at = published_at or timezone.now() - timedelta(hours=n)
+    return {
+        'url': f'https://example.com/{keyword}/{n}',
+        'title': f'{keyword} story {n}',
+        'description': f'Article {n} about {keyword}.',
+        'content': f'Coverage of {keyword}, item {n}.',
+        'url_to_image': None,
+        'source_name': source,
+        'published_at': published_at.isoformat(),
+    }
+
+
+class IsolatedStoresMixin:
+    """
+    Keeps the SQLite files shared by processes (metrics, governor, fetch
+    cache, live events) and the archive in a directory of each test's own,
+    starts from an empty Django cache, and fetches from the stub provider
+    without delay or rate limit.
+    """
+
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp(prefix='news-tests-'))
+        self.addCleanup(shutil.rmtree, directory, True)
+        overrides = self.settings(
+            NEWS_METRICS_PATH=directory / 'metrics.sqlite3',
+            NEWS_API_GOVERNOR_PATH=directory / 'governor.sqlite3',
+            NEWS_LIVE_PATH=directory / 'live.sqlite3',
+            NEWS_ARCHIVE_DIR=directory / 'archive',
+            NEWS_FETCH_CACHE={
+                'BACKEND': 'news.fetch_cache.SQLiteFetchCache',
+                'OPTIONS': {'path': directory / 'fetch_cache.sqlite3'},
+            },
+            NEWS_PROVIDER={
+                'BACKEND': 'news.providers.stub.StubProvider',
+                'OPTIONS': {'latency': 0, 'articles_per_hour': 60, 'history_days': 1},
+            },
+            NEWS_API_REQUESTS_PER_SECOND=0,
+            NEWS_API_DAILY_QUOTA=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_side_stores()
+        self.addCleanup(reset_side_stores)
+        # Keyword ids are reused between tests, so cached pages and view
+        # records of one test would leak into the next.
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create_keyword(self, text='tesla', username='reader'):
+        user, _ = User.objects.get_or_create(username=username)
+        return Keyword.objects.create(user=user, keyword=text)
+
+
+class NewsTestCase(IsolatedStoresMixin, TestCase):
+    pass
+
+
+class NewsTransactionTestCase(IsolatedStoresMixin, TransactionTestCase):
+    """For the background refresh, whose writer thread needs committed rows."""
+
+
+class StubCounter(StubProvider):
+    """The stub provider, counting the pages asked for by (keyword text, language, page)."""
+
+    def __init__(self, articles_per_hour=60, history_days=1, **options):
+        super().__init__(latency=0, articles_per_hour=articles_per_hour, history_days=history_days, **options)
+        self.calls = Counter()
+
+    def build_page(self, job, page, page_size, now=None):
+        self.calls[(job.keyword_text, job.language, page)] += 1
+        return super().build_page(job, page, page_size, now)
+
+
+@override_settings(NEWS_FETCH_PAGE_SIZE=10, NEWS_FETCH_MAX_PAGES=2)
+class BackgroundRefreshTests(NewsTransactionTestCase):
+    """Due keywords are fetched once per text and language, for every user tracking them."""
+
+    def setUp(self):
+        super().setUp()
+        self.provider = StubCounter()
+        providers._provider = self.provider
+
+    def test_users_tracking_the_same_text_share_one_fetch(self):
+        first = self.create_keyword('Tesla', username='first')
+        second = self.create_keyword(' tesla ', username='second')
+        other = self.create_keyword('nasa', username='third')
+
+        cycles = refresh_due_keywords()
+
+        self.assertEqual(sum(stats.fetched for stats in cycles), 2)
+        self.assertEqual(self.provider.calls, Counter({
+            ('tesla', 'en', 1): 1, ('tesla', 'en', 2): 1, ('nasa', 'en', 1): 1, ('nasa', 'en', 2): 1,
+        }))
+        for keyword in (first, second, other):
+            self.assertEqual(KeywordArticle.objects.filter(keyword=keyword).count(), 20)
+        self.assertEqual(NewsArticle.objects.count(), 40)
+        self.assertFalse(RefreshJob.objects.exists())
+
+    def test_only_due_keywords_are_refreshed(self):
+        now = timezone.now()
+        due = self.create_keyword('tesla', username='first')
+        later = self.create_keyword('nasa', username='second')
+        Keyword.objects.filter(id=later.id).update(next_refresh_at=now + timedelta(hours=1))
+
+        refresh_due_keywords()
+
+        self.assertEqual({text for text, _, _ in self.provider.calls}, {'tesla'})
+        due.refresh_from_db()
+        self.assertGreater(due.next_refresh_at, now)
+
+        # Nothing is due any more, so a second run doesn't fetch.
+        calls = sum(self.provider.calls.values())
+        self.assertEqual(refresh_due_keywords(), [])
+        self.assertEqual(sum(self.provider.calls.values()), calls)
+
+    def test_pages_that_cannot_be_stored_leave_the_keyword_due(self):
+        # Twelve articles a day: both pages, the whole result.
+        providers._provider = StubCounter(articles_per_hour=0.5)
+        keyword = self.create_keyword()
+        now = timezone.now()
+        Keyword.objects.filter(id=keyword.id).update(
+            arrival_rate=10, last_yield=5, last_searched=now - timedelta(hours=2), next_refresh_at=now,
+        )
+
+        with mock.patch('news.tasks.ingest_articles', side_effect=OperationalError('database is locked')):
+            cycle, = refresh_due_keywords()
+
+        self.assertEqual((cycle.fetched, cycle.failed, cycle.pages), (0, 1, 0))
+        keyword.refresh_from_db()
+        self.assertEqual((keyword.arrival_rate, keyword.last_yield), (10, 5))
+        self.assertLessEqual(keyword.next_refresh_at, timezone.now())
+
+        # The next cycle stores the pages and measures the rate.
+        cycle, = refresh_due_keywords()
+        self.assertEqual((cycle.fetched, cycle.failed, cycle.pages), (1, 0, 2))
+        keyword.refresh_from_db()
+        self.assertEqual(keyword.last_yield, 12)
+        self.assertGreater(keyword.next_refresh_at, timezone.now())
+
+
+class IngestTests(NewsTestCase):
+    """Ingesting a page counts, links and records each article once."""
+
+    def stats_count(self, keyword):
+        return KeywordStats.objects.get(keyword=keyword, language='en').article_count
+
+    def test_ingest_is_idempotent(self):
+        keyword = self.create_keyword()
+        page = [article_record(n) for n in range(5)] + [article_record(2)]
+
+        first = ingest_articles(keyword, page, 'en')
+        again = ingest_articles(keyword, page, 'en')
+
+        self.assertEqual(first, IngestResult(inserted=5, linked=5, skipped=1))
+        self.assertEqual(again, IngestResult(inserted=0, linked=0, skipped=6))
+        self.assertEqual(NewsArticle.objects.count(), 5)
+        self.assertEqual(KeywordArticle.objects.filter(keyword=keyword).count(), 5)
+        self.assertEqual(FeedEntry.objects.filter(user=keyword.user).count(), 5)
+        self.assertEqual(self.stats_count(keyword), 5)
+
+    def test_rows_another_writer_inserted_first_are_not_counted(self):
+        keyword = self.create_keyword()
+        other = self.create_keyword(username='other')
+        page = [article_record(n) for n in range(3)]
+        ingest_articles(other, page[:1], 'en')
+        bulk_create = NewsArticle.objects.bulk_create
+        raced = NewsArticle.objects.get(url=page[0]['url'])
+
+        def insert_first(articles, **options):
+            # Another process stores the second URL between the lookup and the insert.
+            NewsArticle.objects.create(
+                url=page[1]['url'], title='raced', published_at=timezone.now(), source=raced.source
+            )
+            return bulk_create(articles, **options)
+
+        link_bulk_create = KeywordArticle.objects.bulk_create
+
+        def link_first(links, **options):
+            # ... and links the first article to the keyword before this page does.
+            KeywordArticle.objects.create(
+                keyword=keyword, article=raced, published_at=raced.published_at, source=raced.source
+            )
+            return link_bulk_create(links, **options)
+
+        with mock.patch.object(NewsArticle.objects, 'bulk_create', insert_first), \
+                mock.patch.object(KeywordArticle.objects, 'bulk_create', link_first):
+            result = ingest_articles(keyword, page, 'en')
+
+        self.assertEqual(result, IngestResult(inserted=1, linked=2, skipped=2))
+        self.assertEqual(KeywordArticle.objects.filter(keyword=keyword).count(), 3)
+        self.assertEqual(self.stats_count(keyword), 2)
+        self.assertEqual(FeedEntry.objects.filter(user=keyword.user).count(), 2)
+
+
+class SearchTests(NewsTestCase):
+    """Ranked full-text search, whose index of 0006 must stay in sync through later migrations."""
+
+    def search(self, keyword, text):
+        scope = KeywordArticle.objects.filter(keyword=keyword).values('article_id')
+        return search_articles(text, scope, limit=50)
+
+    def test_ingested_articles_are_found(self):
+        keyword = self.create_keyword()
+        ingest_articles(keyword, [article_record(n) for n in range(5)], 'en')
+
+        found = self.search(keyword, '"story 3"')
+
+        self.assertEqual(found, [NewsArticle.objects.get(url='https://example.com/tesla/3').id])
+
+    def test_updated_and_deleted_articles_leave_the_index(self):
+        keyword = self.create_keyword()
+        ingest_articles(keyword, [article_record(n) for n in range(2)], 'en')
+        article = NewsArticle.objects.get(url='https://example.com/tesla/0')
+
+        NewsArticle.objects.filter(id=article.id).update(title='Renamed', description='', content='')
+        self.assertEqual(self.search(keyword, 'renamed'), [article.id])
+        self.assertNotIn(article.id, self.search(keyword, 'coverage'))
+
+        NewsArticle.objects.filter(id=article.id).delete()
+        self.assertEqual(self.search(keyword, 'renamed'), [])
+
+    def test_title_matches_rank_first_and_scope_is_kept(self):
+        keyword = self.create_keyword()
+        other = self.create_keyword(username='other')
+        in_content, in_title = article_record(1), article_record(2)
+        in_content['content'] = 'A rocket launch was delayed.'
+        in_title['title'] = 'Rocket launch delayed'
+        ingest_articles(keyword, [in_content, in_title, article_record(3)], 'en')
+        ingest_articles(other, [dict(article_record(4), title='Rocket news elsewhere')], 'en')
+
+        found = self.search(keyword, 'rocket')
+
+        ids = dict(NewsArticle.objects.values_list('url', 'id'))
+        self.assertEqual(found, [ids[in_title['url']], ids[in_content['url']]])
+        self.assertEqual(self.search(keyword, 'rock*'), found)
+        self.assertEqual(self.search(keyword, '"launch rocket"'), [])
+
+    def test_queries_are_sanitized(self):
+        terms = parse_search_query('"Electric  car" tesl* e-mail) OR "')
+        self.assertEqual(terms, [
+            SearchTerm(('electric', 'car')), SearchTerm(('tesl',), prefix=True), SearchTerm(('e', 'mail')),
+            SearchTerm(('or',)),
+        ])
+        self.assertEqual(build_fts5_query(terms), '"electric car" "tesl"* "e mail" "or"')
+        self.assertEqual(build_tsquery(terms), '(electric <-> car) & tesl:* & (e <-> mail) & or')
+
+    def test_sqlite_triggers_exist(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The triggers only exist on SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'news_article_fts_%'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertEqual(
+            triggers, {'news_article_fts_insert', 'news_article_fts_delete', 'news_article_fts_update'}
+        )
+
+
+@override_settings(NEWS_FETCH_PAGE_SIZE=10, NEWS_FETCH_MAX_PAGES=2)
+class FetchCursorTests(NewsTestCase):
+    """Walks stop after NEWS_FETCH_MAX_PAGES pages and resume where they stopped."""
+
+    def linked_urls(self, keyword):
+        return set(KeywordArticle.objects.filter(keyword=keyword).values_list('article__url', flat=True))
+
+    def test_walk_resumes_from_cursor(self):
+        keyword = self.create_keyword()
+
+        linked, error = fetch_and_save_articles(keyword)
+        self.assertIsNone(error)
+        self.assertEqual(linked, 20)
+        cursor = FetchCursor.objects.get(text='tesla', language='en')
+        self.assertEqual(cursor.next_page, 3)
+
+        linked, error = fetch_and_save_articles(keyword)
+        self.assertEqual(linked, 20)
+        resumed = FetchCursor.objects.get(text='tesla', language='en')
+        self.assertEqual(resumed.next_page, 5)
+        # The window stays fixed for the whole walk.
+        self.assertEqual(resumed.to_date, cursor.to_date)
+        self.assertEqual(len(self.linked_urls(keyword)), 40)
+
+    def test_first_walk_of_a_keyword_starts_at_page_one(self):
+        first = self.create_keyword(username='first')
+        fetch_and_save_articles(first)
+        newest = self.linked_urls(first)
+
+        second = self.create_keyword(username='second')
+        linked, error = fetch_and_save_articles(second)
+
+        self.assertIsNone(error)
+        self.assertEqual(linked, 20)
+        self.assertTrue(newest <= self.linked_urls(second))
+        self.assertEqual(FetchCursor.objects.get(text='tesla', language='en').next_page, 3)
+
+    def test_background_group_with_a_new_keyword_starts_at_page_one(self):
+        first = self.create_keyword(username='first')
+        fetch_and_save_articles(first)
+        second = self.create_keyword(username='second')
+
+        resumed, = _build_fetch_jobs({('tesla', 'en'): [first]})
+        fresh, = _build_fetch_jobs({('tesla', 'en'): [first, second]})
+
+        self.assertEqual(resumed.start_page, 3)
+        self.assertEqual(fresh.start_page, 1)
+
+
+class LanguageViewTests(NewsTestCase):
+    """Only known language codes are recorded for the background refresh."""
+
+    def test_unknown_languages_are_ignored(self):
+        keyword = self.create_keyword()
+
+        record_language_view(keyword.id, 'zz')
+        record_language_view(keyword.id, 'x' * 500)
+        record_language_view(keyword.id, '')
+        record_language_view(keyword.id, 'de')
+
+        self.assertEqual(list(KeywordLanguage.objects.values_list('language', flat=True)), ['de'])
+        self.assertEqual(refresh_languages([keyword]), {keyword.id: ['de']})
+
+    def test_keyword_page_ignores_an_unknown_language(self):
+        keyword = self.create_keyword()
+        self.client.force_login(keyword.user)
+
+        self.client.get(reverse('keyword_articles', args=[keyword.id]), {'language': 'zz'})
+
+        self.assertFalse(KeywordLanguage.objects.exists())
+        # Nor is a first search sent upstream for it.
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(refresh_languages([keyword]), {keyword.id: [DEFAULT_LANGUAGE]})
+
+
+class LockedGovernor(governor.Governor):
+    """A governor whose state file is locked for its first `locked` decisions."""
+
+    def __init__(self, path, locked=1):
+        super().__init__(path, requests_per_second=0)
+        self.locked = locked
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def _take(self, channel):
+        self.threads.add(threading.get_ident())
+        with self._lock:
+            if self.locked:
+                self.locked -= 1
+                raise sqlite3.OperationalError('database is locked')
+        return super()._take(channel)
+
+
+class LockedFetchCache(fetch_cache.LocMemFetchCache):
+    """A fetch cache whose file is locked for pages of the keyword 'locked'."""
+
+    def get(self, key):
+        if key.split(':', 1)[1].startswith('locked|'):
+            raise sqlite3.OperationalError('database is locked')
+        return super().get(key)
+
+
+class BackgroundFetchTests(NewsTestCase):
+    """The background cycle keeps SQLite off the event loop and survives a locked file."""
+
+    def run_cycle(self, jobs, **options):
+        results = []
+        stats = refresh(jobs, results.append, max_pages=1, page_size=10, **options)
+        return stats, results
+
+    def test_a_locked_governor_fails_only_one_job(self):
+        jobs = [FetchJob('tesla', 'en', [1]), FetchJob('nasa', 'en', [2])]
+
+        stats, results = self.run_cycle(jobs, governor=LockedGovernor(settings.NEWS_API_GOVERNOR_PATH), concurrency=1)
+
+        self.assertEqual((stats.fetched, stats.failed), (1, 1))
+        failed, = [result for result in results if result.error]
+        self.assertIn('database is locked', failed.error)
+
+    def test_a_locked_fetch_cache_fails_only_its_job(self):
+        jobs = [FetchJob('locked', 'en', [1]), FetchJob('nasa', 'en', [2])]
+
+        stats, results = self.run_cycle(
+            jobs, governor=LockedGovernor(settings.NEWS_API_GOVERNOR_PATH, locked=0), cache=LockedFetchCache()
+        )
+
+        self.assertEqual((stats.fetched, stats.failed), (1, 1))
+        self.assertEqual({result.job.keyword_text for result in results if result.error}, {'locked'})
+
+    def test_governor_decisions_run_off_the_event_loop(self):
+        locked = LockedGovernor(settings.NEWS_API_GOVERNOR_PATH, locked=0)
+
+        async def acquire():
+            await locked.acquire_async(governor.BACKGROUND)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(acquire())
+
+        self.assertTrue(locked.threads)
+        self.assertNotIn(loop_thread, locked.threads)
+
+
+@override_settings(NEWS_QUERY_COUNTER='raise')
+class QueryCountTests(NewsTestCase):
+    """The list pages run a fixed number of queries however many articles they show."""
+
+    def setUp(self):
+        super().setUp()
+        self.tesla = self.create_keyword('tesla')
+        self.nasa = self.create_keyword('nasa')
+        self.token = ApiToken.issue(self.tesla.user)[1]
+        self.client.force_login(self.tesla.user)
+
+    def ingest(self, count):
+        """Links `count` more articles to each keyword, from a few sources, some shared by both."""
+        for keyword in (self.tesla, self.nasa):
+            records = [
+                article_record(n, keyword.keyword, source=f'Source {n % 4}') for n in range(count)
+            ] + [article_record(n, 'space', source='Wire') for n in range(count // 2)]
+            ingest_articles(keyword, records, 'en')
+
+    def queries(self, url, params=None, **headers):
+        with QueryCounter() as queries:
+            response = self.client.get(url, params, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return queries.total
+
+    def assert_fixed(self, expected, url, params=None, **headers):
+        # The first request also records the token's use and the language view.
+        self.queries(url, params, **headers)
+        self.ingest(3)
+        self.assertEqual(self.queries(url, params, **headers), expected)
+        self.ingest(20)
+        self.assertEqual(self.queries(url, params, **headers), expected)
+
+    def test_keyword_page(self):
+        self.assert_fixed(8, reverse('keyword_articles', args=[self.tesla.id]))
+
+    def test_feed(self):
+        self.assert_fixed(5, reverse('feed'))
+
+    def test_api_keywords(self):
+        self.assert_fixed(3, reverse('api_keywords'), authorization=f'Bearer {self.token}')
+
+    def test_api_keyword_articles(self):
+        self.assert_fixed(
+            4, reverse('api_keyword_articles', args=[self.tesla.id]), authorization=f'Bearer {self.token}'
+        )
+
+
+@override_settings(NEWS_FETCH_PAGE_SIZE=10, NEWS_FETCH_MAX_PAGES=2)
+class FirstSearchTests(NewsTestCase):
+    """A keyword's first search runs in the background while its page renders."""
+
+    def setUp(self):
+        super().setUp()
+        self.keyword = self.create_keyword()
+        self.client.force_login(self.keyword.user)
+
+    def status(self):
+        return self.client.get(reverse('keyword_fetch_status', args=[self.keyword.id])).json()
+
+    def test_page_renders_without_waiting_and_queues_one_search(self):
+        for _ in range(2):
+            response = self.client.get(reverse('keyword_articles', args=[self.keyword.id]))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['fetching'])
+
+        task, = Task.objects.all()
+        self.assertEqual(task.priority, FIRST_SEARCH_PRIORITY)
+        self.assertFalse(NewsArticle.objects.exists())
+        self.assertEqual(self.status(), {'pending': True, 'article_count': 0})
+
+        fetch_first_search.now(self.keyword.id, 'en')
+        task.delete()
+
+        self.assertEqual(self.status(), {'pending': False, 'article_count': 20})
+        response = self.client.get(reverse('keyword_articles', args=[self.keyword.id]))
+        self.assertFalse(response.context['fetching'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_empty_first_search_is_not_repeated_within_the_cooldown(self):
+        providers._provider = StubCounter(history_days=0)
+        url = reverse('keyword_articles', args=[self.keyword.id])
+        self.client.get(url)
+        Task.objects.all().delete()
+        fetch_first_search.now(self.keyword.id, 'en')
+        self.assertEqual(self.status(), {'pending': False, 'article_count': 0})
+
+        response = self.client.get(url)
+        self.assertFalse(response.context['fetching'])
+        self.assertFalse(Task.objects.exists())
+
+        Keyword.objects.filter(id=self.keyword.id).update(
+            last_searched=timezone.now() - timedelta(minutes=settings.SEARCH_COOLDOWN_MINUTES + 1)
+        )
+        self.assertTrue(self.client.get(url).context['fetching'])
+        self.assertEqual(Task.objects.count(), 1)
+
+
+class KeysetPaginationTests(NewsTestCase):
+    """Cursors walk every row exactly once, in both directions, ties included."""
+
+    def setUp(self):
+        super().setUp()
+        self.keyword = self.create_keyword()
+        # Articles in threes share a publish date, so pages split ties.
+        published = timezone.now().replace(microsecond=0)
+        ingest_articles(self.keyword, [
+            article_record(n, published_at=published - timedelta(hours=n // 3)) for n in range(25)
+        ], 'en')
+        self.links = KeywordArticle.objects.filter(keyword=self.keyword)
+
+    def paginate(self, descending=True, **cursor):
+        return paginate_keyset(
+            self.links, 'published_at', 'article_id', per_page=10, descending=descending, **cursor
+        )
+
+    def ids(self, page):
+        return [link.article_id for link in page.items]
+
+    def test_walks_forward_and_back(self):
+        for descending in (True, False):
+            order = '-' if descending else ''
+            expected = list(self.links.order_by(f'{order}published_at', f'{order}article_id')
+                            .values_list('article_id', flat=True))
+
+            pages = [self.paginate(descending)]
+            while pages[-1].next_cursor:
+                pages.append(self.paginate(descending, after=pages[-1].next_cursor))
+            self.assertEqual([len(page.items) for page in pages], [10, 10, 5])
+            self.assertEqual([article_id for page in pages for article_id in self.ids(page)], expected)
+            self.assertIsNone(pages[0].previous_cursor)
+
+            # Back from the last page, the same pages come out.
+            page = pages[-1]
+            for previous in reversed(pages[:-1]):
+                page = self.paginate(descending, before=page.previous_cursor)
+                self.assertEqual(self.ids(page), self.ids(previous))
+            self.assertIsNone(page.previous_cursor)
+
+    def test_malformed_cursor_gives_the_first_page(self):
+        self.assertEqual(self.ids(self.paginate(after='not-a-cursor')), self.ids(self.paginate()))
+
+
+class FetchCacheTests(NewsTestCase):
+    """Both fetch cache backends expire entries after their TTL and evict the least recently used."""
+
+    def backends(self):
+        yield fetch_cache.LocMemFetchCache(max_entries=2, ttl=60)
+        yield fetch_cache.SQLiteFetchCache(
+            Path(settings.NEWS_METRICS_PATH).parent / 'cache-test.sqlite3', max_entries=2, ttl=60
+        )
+
+    def test_ttl_and_lru_eviction(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                clock = iter(range(1000, 1010))
+                with mock.patch('news.fetch_cache.time.time', lambda: next(clock)):
+                    backend.set('a', {'articles': [1]})
+                    backend.set('b', {'articles': [2]})
+                    self.assertEqual(backend.get('a'), {'articles': [1]})
+                    # 'b' is now the least recently used.
+                    backend.set('c', {'articles': [3]})
+                    self.assertIsNone(backend.get('b'))
+                with mock.patch('news.fetch_cache.time.time', return_value=1070):
+                    self.assertIsNone(backend.get('a'))
+
+                stats = backend.stats()
+                self.assertEqual(
+                    {name: stats[name] for name in ('hits', 'misses', 'evictions')},
+                    {'hits': 1, 'misses': 2, 'evictions': 1},
+                )
+
+    def test_keys_share_normalized_text_and_rounded_dates(self):
+        with self.settings(NEWS_FETCH_CACHE_BUCKET=600):
+            start = timezone.now().replace(minute=0, second=0, microsecond=0)
+            bucket = fetch_cache.bucket_from_date(start + timedelta(minutes=4)).isoformat()
+            self.assertEqual(bucket, fetch_cache.bucket_from_date(start + timedelta(minutes=9)).isoformat())
+            self.assertEqual(
+                fetch_cache.make_cache_key(' Tesla  Motors', 'en', bucket),
+                fetch_cache.make_cache_key('tesla motors', 'en', bucket),
+            )
+
+    @override_settings(NEWS_FETCH_PAGE_SIZE=10, NEWS_FETCH_MAX_PAGES=1)
+    def test_second_user_is_served_from_the_cache(self):
+        provider = StubCounter()
+        providers._provider = provider
+
+        fetch_and_save_articles(self.create_keyword('tesla', username='first'))
+        fetch_and_save_articles(self.create_keyword('Tesla', username='second'))
+
+        self.assertEqual(sum(provider.calls.values()), 1)
+        self.assertEqual(fetch_cache.get_fetch_cache().stats()['hits'], 1)
+
+
+class KeywordStatsTests(NewsTestCase):
+    """The incremental statistics match a rebuild from the links."""
+
+    def snapshot(self, keyword):
+        return {
+            stats.language: (
+                stats.article_count, stats.newest_published_at, stats.oldest_published_at, stats.source_counts
+            )
+            for stats in KeywordStats.objects.filter(keyword=keyword)
+        }
+
+    def test_incremental_stats_match_a_rebuild(self):
+        keyword = self.create_keyword()
+        ingest_articles(keyword, [article_record(n, source=f'Source {n % 3}') for n in range(7)], 'en')
+        ingest_articles(keyword, [article_record(n, source=f'Source {n % 3}') for n in range(4, 12)], 'en')
+        ingest_articles(keyword, [article_record(n, 'tesla-de') for n in range(3)], 'de')
+        incremental = self.snapshot(keyword)
+        version = KeywordStats.objects.get(keyword=keyword, language='en').version
+
+        self.assertEqual(incremental['en'][0], 12)
+        self.assertEqual(sum(incremental['en'][3].values()), 12)
+        self.assertEqual(incremental['de'][0], 3)
+
+        rebuild_keyword_stats([keyword.id])
+
+        self.assertEqual(self.snapshot(keyword), incremental)
+        self.assertGreater(KeywordStats.objects.get(keyword=keyword, language='en').version, version)
+
+    def test_rebuild_after_deleting_articles(self):
+        keyword = self.create_keyword()
+        ingest_articles(keyword, [article_record(n) for n in range(5)], 'en')
+        newest = NewsArticle.objects.order_by('-published_at').first()
+        newest.delete()
+
+        rebuild_keyword_stats([keyword.id])
+
+        stats = KeywordStats.objects.get(keyword=keyword, language='en')
+        self.assertEqual(stats.article_count, 4)
+        self.assertLess(stats.newest_published_at, newest.published_at)
+
+
+class TrendingTests(NewsTestCase):
+    """Trending counters count each article once per text and match a rebuild."""
+
+    def scores(self, now):
+        return {
+            entry.text: (entry.subscriber_count, {window: round(score, 6) for window, score in entry.scores.items()})
+            for entry in top_trending('24h', now=now)
+        }
+
+    def test_counters_match_decay_and_rebuild(self):
+        now = timezone.now()
+        first = self.create_keyword('Tesla', username='first')
+        second = self.create_keyword('tesla', username='second')
+        nasa = self.create_keyword('nasa', username='second')
+        page = [article_record(n, published_at=now - timedelta(hours=n)) for n in range(5)]
+        ingest_articles([first, second], page[:3], 'en')
+        # Linking the same articles to another user's keyword adds nothing.
+        ingest_articles(first, page, 'en')
+        ingest_articles(second, page, 'en')
+        ingest_articles(nasa, [article_record(0, 'nasa', published_at=now)], 'en')
+
+        entries = {entry.text: entry for entry in top_trending('24h', now=now)}
+        self.assertEqual(entries['tesla'].subscriber_count, 2)
+        expected = sum(math.exp(-n * 3600 / trending.WINDOWS['24h']) for n in range(5))
+        self.assertAlmostEqual(entries['tesla'].scores['24h'], expected)
+        self.assertEqual([entry.text for entry in top_trending('24h', now=now)], ['tesla', 'nasa'])
+
+        incremental = self.scores(now)
+        rebuild_trending(now)
+        self.assertEqual(self.scores(now), incremental)
+
+    def test_subscribers_follow_keywords(self):
+        keyword = self.create_keyword('tesla', username='first')
+        self.create_keyword('Tesla ', username='second')
+        keyword.delete()
+
+        entry, = top_trending(trending.SUBSCRIBERS)
+        self.assertEqual((entry.text, entry.subscriber_count), ('tesla', 1))
+
+
+class GovernorTests(NewsTestCase):
+    """The shared governor enforces cooldowns, rates and the daily quota."""
+
+    def governor(self, **options):
+        return governor.Governor(settings.NEWS_API_GOVERNOR_PATH, **options)
+
+    def test_429_cooldown_holds_back_every_channel(self):
+        shared = self.governor(requests_per_second=0)
+        with mock.patch('news.governor.random.uniform', return_value=0):
+            delay = shared.report_failure(governor.BACKGROUND, 429, retry_after='30')
+
+        self.assertEqual(delay, 30)
+        # Another process sees the same cooldown.
+        other = self.governor(requests_per_second=0)
+        self.assertAlmostEqual(other._take(governor.INTERACTIVE), 30, delta=1)
+        with self.assertRaises(governor.RateLimitExceeded) as raised:
+            other.acquire(governor.INTERACTIVE, max_wait=5)
+        self.assertAlmostEqual(raised.exception.retry_after, 30, delta=1)
+
+        with mock.patch('news.governor.time.time', return_value=time.time() + 31):
+            self.assertEqual(other._take(governor.BACKGROUND), 0)
+
+    def test_retry_after_dates_and_backoff(self):
+        when = email.utils.formatdate(time.time() + 120, usegmt=True)
+        self.assertAlmostEqual(governor.parse_retry_after(when), 120, delta=2)
+        self.assertEqual(governor.parse_retry_after('7'), 7)
+        self.assertIsNone(governor.parse_retry_after('soon'))
+        for attempt in range(10):
+            self.assertLessEqual(governor.backoff_delay(attempt, 1.0, 60.0), min(60.0, 2 ** attempt))
+
+    def test_background_stops_at_its_share_of_the_daily_quota(self):
+        shared = self.governor(requests_per_second=0, daily_quota=10, interactive_share=0.2)
+        for _ in range(8):
+            shared.acquire(governor.BACKGROUND)
+        with self.assertRaises(governor.RateLimitExceeded):
+            shared.acquire(governor.BACKGROUND)
+
+        self.assertEqual(shared.remaining(governor.INTERACTIVE), 2)
+        shared.acquire(governor.INTERACTIVE)
+        shared.acquire(governor.INTERACTIVE)
+        with self.assertRaises(governor.RateLimitExceeded):
+            shared.acquire(governor.INTERACTIVE)
+
+        self.assertEqual(governor.sync_quota_usage(shared), 2)
+        self.assertEqual(
+            dict(ApiQuotaUsage.objects.values_list('channel', 'requests')),
+            {governor.BACKGROUND: 8, governor.INTERACTIVE: 2},
+        )
+
+    def test_interactive_calls_borrow_from_the_background_bucket(self):
+        shared = self.governor(requests_per_second=2, interactive_share=0.5)
+        with mock.patch('news.governor.time.time', return_value=time.time()):
+            self.assertEqual(shared._take(governor.INTERACTIVE), 0)
+            self.assertEqual(shared._take(governor.INTERACTIVE), 0)
+            # Both buckets are spent now; background calls wait for their own.
+            self.assertAlmostEqual(shared._take(governor.BACKGROUND), 1.0)
+            self.assertAlmostEqual(shared._take(governor.INTERACTIVE), 1.0)
+
+    def test_a_channel_without_a_share_of_the_rate_only_borrows(self):
+        interactive_only = governor.Governor(':memory:', requests_per_second=2, interactive_share=1)
+        with self.assertRaises(governor.RateLimitExceeded):
+            interactive_only.acquire(governor.BACKGROUND)
+        self.assertEqual(interactive_only._take(governor.INTERACTIVE), 0)
+
+        background_only = governor.Governor(':memory:', requests_per_second=1, interactive_share=0)
+        with mock.patch('news.governor.time.time', return_value=time.time()):
+            self.assertEqual(background_only._take(governor.INTERACTIVE), 0)
+            self.assertAlmostEqual(background_only._take(governor.INTERACTIVE), 1.0)
+
+        for share in (-0.1, 1.5):
+            with self.assertRaises(ValueError):
+                self.governor(interactive_share=share)
+
+
+class ProviderTests(NewsTestCase):
+    """Providers turn upstream pages into article records and errors the fetchers understand."""
+
+    def test_configured_provider_is_built_from_settings(self):
+        provider = providers.get_provider()
+        self.assertIsInstance(provider, StubProvider)
+        self.assertEqual(provider.latency, 0)
+        self.assertIsNone(provider.configuration_error())
+
+    def test_stub_pages_are_stable_and_consecutive(self):
+        provider = providers.get_provider()
+        now = timezone.now()
+        # One article a minute, so the window holds 24 or 25 depending on the phase.
+        job = FetchJob('tesla', 'en', [1], (now - timedelta(minutes=25)).isoformat(), now.isoformat())
+
+        first, second = provider.build_page(job, 1, 10, now), provider.build_page(job, 2, 10, now)
+
+        self.assertEqual(provider.build_page(job, 1, 10, now), first)
+        self.assertIn(first.total_results, (24, 25))
+        dates = [article['published_at'] for article in first.articles + second.articles]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertEqual(len({article['url'] for article in first.articles + second.articles}), 20)
+        last = provider.build_page(job, 3, 10, now).articles
+        self.assertEqual(len(last), first.total_results - 20)
+        self.assertTrue(has_more_pages(2, 10, first.total_results, 10))
+        self.assertFalse(has_more_pages(3, len(last), first.total_results, 10))
+
+    def test_newsapi_responses(self):
+        provider = NewsAPIProvider(base_url='https://newsapi.example/v2/', api_key='key')
+        job = FetchJob('electric car', 'de', [1], from_date='2026-10-01T00:00:00+00:00')
+
+        self.assertEqual(provider.query_params(job, 2, 50), {
+            'q': '"electric car"', 'language': 'de', 'sortBy': 'publishedAt', 'page': 2, 'pageSize': 50,
+            'from': '2026-10-01T00:00:00+00:00',
+        })
+        page = provider.parse_page({'totalResults': 1, 'articles': [{
+            'url': 'https://example.com/1', 'title': 'Title', 'urlToImage': 'https://example.com/1.jpg',
+            'source': {'name': 'Example'}, 'publishedAt': '2026-10-01T10:00:00Z',
+        }]}, {'X-RateLimit-Remaining': '99', 'X-RateLimit-Limit': 'many'})
+        self.assertEqual(page.articles[0]['source_name'], 'Example')
+        self.assertEqual(page.articles[0]['url_to_image'], 'https://example.com/1.jpg')
+        self.assertEqual(page.rate_limit, RateLimitInfo(remaining=99))
+
+        # Past the plan's result limit there is nothing more to fetch.
+        self.assertEqual(provider._check_status(426, {}).articles, [])
+        with self.assertRaises(ProviderError) as raised:
+            provider._check_status(429, {'Retry-After': '30'})
+        self.assertTrue(raised.exception.retryable)
+        self.assertEqual(raised.exception.rate_limit.retry_after, '30')
+        with self.assertRaises(ProviderError) as raised:
+            provider._check_status(401, {})
+        self.assertFalse(raised.exception.retryable)
+
+        with self.settings(NEWS_API_KEY=''):
+            self.assertIsNotNone(NewsAPIProvider().configuration_error())
+
+
+class FeedTests(NewsTestCase):
+    """A user's feed lists each matching article once, across all their keywords."""
+
+    def setUp(self):
+        super().setUp()
+        self.tesla = self.create_keyword('tesla')
+        self.musk = self.create_keyword('musk')
+        self.shared = article_record(0, 'shared')
+        ingest_articles(self.tesla, [self.shared] + [article_record(n) for n in range(1, 4)], 'en')
+        ingest_articles(self.musk, [self.shared, article_record(1, 'musk')], 'de')
+        self.client.force_login(self.tesla.user)
+
+    def feed_urls(self, **params):
+        response = self.client.get(reverse('feed'), params)
+        self.assertEqual(response.status_code, 200)
+        return {article.url: article.matched_keywords for article in response.context['articles']}
+
+    def test_articles_matching_several_keywords_appear_once(self):
+        feed = self.feed_urls()
+
+        self.assertEqual(len(feed), 5)
+        self.assertEqual(feed[self.shared['url']], ['musk', 'tesla'])
+        self.assertEqual(set(self.feed_urls(language='de')), {'https://example.com/musk/1'})
+
+    def test_deleting_a_keyword_prunes_only_its_articles(self):
+        self.musk.delete()
+
+        self.assertEqual(len(self.feed_urls()), 4)
+        self.assertEqual(self.feed_urls()[self.shared['url']], ['tesla'])
+
+    def test_rebuild_matches_the_incremental_feed(self):
+        entries = set(FeedEntry.objects.values_list('user_id', 'article_id', 'language', 'published_at'))
+
+        self.assertEqual(rebuild_feeds(), 5)
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user_id', 'article_id', 'language', 'published_at')), entries
+        )
+
+
+class DedupTests(NewsTestCase):
+    """Syndicated copies join the cluster of the first article, within a page and across pages."""
+
+    STORY = {
+        'title': 'Tesla recalls two million cars over autopilot safety concerns',
+        'description': 'The carmaker will update software on vehicles sold in the United States since 2012.',
+    }
+
+    def copy(self, n, source, title_suffix=''):
+        return dict(
+            article_record(n, source=source),
+            title=self.STORY['title'] + title_suffix,
+            description=self.STORY['description'],
+        )
+
+    def test_copies_are_clustered_and_hidden(self):
+        keyword = self.create_keyword()
+        ingest_articles(
+            keyword, [self.copy(1, 'Reuters'), self.copy(2, 'AP', ' - report'), article_record(3)], 'en'
+        )
+        ingest_articles(keyword, [self.copy(4, 'BBC News', ', regulator says')], 'en')
+
+        articles = {article.url: article for article in NewsArticle.objects.all()}
+        # Story 2 is published before story 1, so it starts the cluster.
+        first = articles['https://example.com/tesla/2']
+        self.assertIsNone(first.cluster_id)
+        self.assertEqual(articles['https://example.com/tesla/1'].cluster_id, first.id)
+        self.assertEqual(articles['https://example.com/tesla/4'].cluster_id, first.id)
+        self.assertIsNone(articles['https://example.com/tesla/3'].cluster_id)
+
+        links = KeywordArticle.objects.filter(keyword=keyword)
+        shown = set(hide_copies(links, links).values_list('article_id', flat=True))
+        self.assertEqual(shown, {first.id, articles['https://example.com/tesla/3'].id})
+        self.assertEqual(cluster_source_counts(links, [first])[first.id], 3)
+
+    def test_short_or_different_texts_are_not_copies(self):
+        self.assertEqual(shingles('Tesla up'), set())
+        story = article_shingles(self.STORY['title'], self.STORY['description'])
+        other = article_shingles('Tesla opens a new factory in Berlin', 'Production starts next month.')
+        copy = article_shingles(self.STORY['title'] + ' - report', self.STORY['description'])
+        self.assertGreaterEqual(similarity(story, copy), MIN_SIMILARITY)
+        self.assertLess(similarity(story, other), MIN_SIMILARITY)
+
+
+@override_settings(NEWS_RETENTION_DAYS=90)
+class RetentionTests(NewsTestCase):
+    """Old article text moves to the archive and can be read back."""
+
+    def test_archive_round_trip(self):
+        now = timezone.now()
+        keyword = self.create_keyword()
+        keeper = self.create_keyword('keeper', username='keeper')
+        Keyword.objects.filter(id=keeper.id).update(custom_retention_days=365)
+        old = [article_record(n, published_at=now - timedelta(days=100 + n)) for n in range(5)]
+        ingest_articles(keyword, old + [article_record(5, published_at=now - timedelta(days=10))], 'en')
+        # An article another keyword keeps for a year stays in full.
+        ingest_articles(keeper, old[:1], 'en')
+        texts = dict(NewsArticle.objects.values_list('url', 'content'))
+        version = KeywordStats.objects.get(keyword=keyword).version
+
+        stats = archive_due_articles(now, chunk_size=2)
+
+        self.assertEqual((stats.scanned, stats.archived), (5, 4))
+        archived = NewsArticle.objects.filter(archived_at__isnull=False)
+        self.assertEqual({article.url for article in archived}, {record['url'] for record in old[1:]})
+        for article in archived:
+            self.assertEqual(article.content, '')
+            self.assertEqual(read_archived(article)['content'], texts[article.url])
+        self.assertEqual(NewsArticle.objects.get(url=old[0]['url']).content, texts[old[0]['url']])
+        self.assertGreater(KeywordStats.objects.get(keyword=keyword).version, version)
+
+        # Titles stay searchable, and a rerun finds nothing more to do.
+        scope = KeywordArticle.objects.filter(keyword=keyword).values('article_id')
+        self.assertEqual(len(search_articles('"story 3"', scope, limit=10)), 1)
+        self.assertEqual(archive_due_articles(now).archived, 0)
+
+
+class DatabaseProfileTests(NewsTestCase):
+    """The SQLite profile tunes every connection it opens."""
+
+    def test_sqlite_connections_use_wal_and_immediate_transactions(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The profile under test is the SQLite one.')
+        path = Path(settings.NEWS_METRICS_PATH).parent / 'profile.sqlite3'
+        wrapper = type(connections['default'])({**connection.settings_dict, 'NAME': str(path)}, 'profile')
+        self.addCleanup(wrapper.close)
+
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for pragma in ('journal_mode', 'synchronous', 'temp_store'):
+                cursor.execute(f'PRAGMA {pragma}')
+                pragmas[pragma] = cursor.fetchone()[0]
+
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2})
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+
+
+def counter_value(name, **labels):
+    """Returns a counter's stored value in the process-wide metrics, or 0."""
+    for sample_name, sample_labels, value in metrics.get_metrics().samples():
+        if sample_name == name and sample_labels == labels:
+            return value
+    return 0
+
+
+class KeywordPageCacheTests(NewsTestCase):
+    """The keyword page answers conditional requests and caches its list by statistics version."""
+
+    def setUp(self):
+        super().setUp()
+        self.keyword = self.create_keyword()
+        ingest_articles(self.keyword, [article_record(n) for n in range(3)], 'en')
+        self.client.force_login(self.keyword.user)
+        self.url = reverse('keyword_articles', args=[self.keyword.id])
+
+    def test_conditional_requests_and_invalidation(self):
+        first = self.client.get(self.url)
+        etag = first['ETag']
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(set(first['Cache-Control'].split(', ')), {'private', 'no-cache'})
+
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 304)
+        # Each query has its own tag.
+        self.assertNotEqual(self.client.get(self.url, {'sort': 'oldest'})['ETag'], etag)
+
+        # Distinct text, so the new story is not collapsed into an older copy.
+        record = article_record(-1, published_at=timezone.now())
+        record.update(title='Tesla opens a new factory', description='Production starts next spring.')
+        ingest_articles(self.keyword, [record], 'en')
+        changed = self.client.get(self.url, headers={'if-none-match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertContains(changed, 'https://example.com/tesla/-1')
+
+    def test_article_list_is_served_from_the_cache(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        self.assertEqual(counter_value('news_page_cache_total', result='miss'), 1)
+        self.assertEqual(counter_value('news_page_cache_total', result='hit'), 1)
+
+        bump_versions([self.keyword.id])
+        self.client.get(self.url)
+        self.assertEqual(counter_value('news_page_cache_total', result='miss'), 2)
+
+
+class ApiTests(NewsTestCase):
+    """The JSON API authenticates by token, pages with cursors and streams exports."""
+
+    def setUp(self):
+        super().setUp()
+        self.keyword = self.create_keyword()
+        ingest_articles(self.keyword, [article_record(n, source=f'Source {n}') for n in range(5)], 'en')
+        self.auth = {'authorization': f'Bearer {ApiToken.issue(self.keyword.user)[1]}'}
+
+    def test_requests_without_a_valid_token_are_refused(self):
+        response = self.client.get(reverse('api_keywords'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        self.assertEqual(
+            self.client.get(reverse('api_keywords'), headers={'authorization': 'Bearer nope'}).status_code, 401
+        )
+
+    def test_keywords_are_listed_and_tracked(self):
+        listed = self.client.get(reverse('api_keywords'), headers=self.auth).json()
+        self.assertEqual([(row['keyword'], row['article_count']) for row in listed['results']], [('tesla', 5)])
+
+        created = self.client.post(
+            reverse('api_keywords'), {'keyword': ' NASA ', 'language': 'de'},
+            content_type='application/json', headers=self.auth,
+        )
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(created.json()['keyword'], 'nasa')
+        self.assertTrue(KeywordLanguage.objects.filter(keyword__keyword='nasa', language='de').exists())
+        self.assertEqual(Task.objects.count(), 1)
+
+        again = self.client.post(
+            reverse('api_keywords'), {'keyword': 'nasa'}, content_type='application/json', headers=self.auth
+        )
+        self.assertEqual(again.status_code, 200)
+        unknown = self.client.post(
+            reverse('api_keywords'), {'keyword': 'mars', 'language': 'xx'},
+            content_type='application/json', headers=self.auth,
+        )
+        self.assertEqual(unknown.status_code, 400)
+
+    def test_articles_are_paged_with_cursors_and_chosen_fields(self):
+        url = reverse('api_keyword_articles', args=[self.keyword.id])
+        first = self.client.get(url, {'limit': 2, 'fields': 'id,title'}, headers=self.auth).json()
+        self.assertEqual([row['title'] for row in first['results']], ['tesla story 0', 'tesla story 1'])
+        self.assertEqual(set(first['results'][0]), {'id', 'title'})
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(
+            url, {'limit': 2, 'fields': 'title', 'after': first['next']}, headers=self.auth
+        ).json()
+        self.assertEqual([row['title'] for row in second['results']], ['tesla story 2', 'tesla story 3'])
+
+        self.assertEqual(self.client.get(url, {'fields': 'password'}, headers=self.auth).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 0}, headers=self.auth).status_code, 400)
+        other = self.create_keyword('nasa', username='someone else')
+        self.assertEqual(
+            self.client.get(reverse('api_keyword_articles', args=[other.id]), headers=self.auth).status_code, 404
+        )
+
+    def test_export_streams_every_article(self):
+        response = self.client.get(
+            reverse('api_export'), {'keyword': self.keyword.id, 'fields': 'title,source_name', 'sort': 'oldest'},
+            headers=self.auth,
+        )
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{'title': f'tesla story {n}', 'source_name': f'Source {n}'} for n in reversed(range(5))],
+        )
+
+        response = self.client.get(reverse('api_export'), {'format': 'csv', 'fields': 'title'}, headers=self.auth)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], 'title')
+        self.assertEqual(sorted(rows[1:]), [f'tesla story {n}' for n in range(5)])
+
+
+class MetricsTests(NewsTestCase):
+    """Counters and stage timings are shared through a file and served on /metrics."""
+
+    def test_ingest_counts_articles_by_outcome(self):
+        keyword = self.create_keyword()
+        records = [article_record(n) for n in range(3)]
+        ingest_articles(keyword, records + [records[0], {'url': ''}], 'en')
+        ingest_articles(keyword, records, 'en')
+
+        self.assertEqual(counter_value('news_articles_total', outcome='inserted'), 3)
+        self.assertEqual(counter_value('news_articles_total', outcome='skipped'), 5)
+        self.assertEqual(counter_value('news_keyword_links_total'), 3)
+
+    def test_buffered_counts_of_each_process_add_up(self):
+        first = metrics.Metrics(settings.NEWS_METRICS_PATH, flush_interval=3600)
+        second = metrics.Metrics(settings.NEWS_METRICS_PATH, flush_interval=3600)
+        first.inc('news_keyword_links_total', 2)
+        second.inc('news_keyword_links_total', 3)
+        first.observe('news_stage_seconds', 0.02, stage='write')
+        first.observe('news_stage_seconds', 2, stage='write')
+        first.flush()
+
+        samples = {(name, tuple(sorted(labels.items()))): value for name, labels, value in second.samples()}
+        self.assertEqual(samples[('news_keyword_links_total', ())], 5)
+        self.assertEqual(samples[('news_stage_seconds_count', (('stage', 'write'),))], 2)
+        self.assertEqual(samples[('news_stage_seconds_bucket', (('le', '0.025'), ('stage', 'write')))], 1)
+        self.assertEqual(samples[('news_stage_seconds_bucket', (('le', '+Inf'), ('stage', 'write')))], 2)
+
+    @override_settings(NEWS_METRICS_TOKEN='scraper')
+    def test_metrics_page_requires_the_scrape_token(self):
+        metrics.get_metrics().inc('news_page_cache_total', result='hit')
+        self.assertEqual(self.client.get(reverse('prometheus_metrics')).status_code, 401)
+
+        response = self.client.get(reverse('prometheus_metrics'), headers={'authorization': 'Bearer scraper'})
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE news_page_cache_total counter', body)
+        self.assertIn('news_page_cache_total{result="hit"} 1', body)
+        self.assertIn('news_refresh_jobs{state="waiting"} 0', body)
+
+
+@override_settings(
+    NEWS_REFRESH_TARGET_YIELD=20, NEWS_REFRESH_MIN_INTERVAL=900, NEWS_REFRESH_MAX_INTERVAL=12 * 3600,
+    REFRESH_INTERVAL_GLOBAL=3600,
+)
+class CadenceTests(NewsTestCase):
+    """Each keyword is refreshed about as often as it gathers the target yield."""
+
+    def test_interval_follows_the_rate_within_bounds(self):
+        now = timezone.now()
+        self.assertEqual(adaptive_interval(10, now, now), 2 * 3600)
+        self.assertEqual(adaptive_interval(1000, now, now), 900)
+        self.assertEqual(adaptive_interval(0, now, now), 12 * 3600)
+        # Keywords nobody opens lately are polled less often.
+        self.assertEqual(adaptive_interval(10, now - timedelta(days=2), now), 4 * 3600)
+        self.assertEqual(adaptive_interval(10, None, now), 8 * 3600)
+
+    def test_refresh_updates_the_rate_and_schedules_the_next_one(self):
+        keyword = self.create_keyword()
+        record_language_view(keyword.id, 'en')
+        since = timezone.now()
+        keyword.last_searched = since - timedelta(hours=2)
+        ingest_articles(keyword, [article_record(n) for n in range(10)], 'en')
+
+        now = since + timedelta(minutes=1)
+        update_refresh_intervals([keyword], since, now)
+        keyword.refresh_from_db()
+        self.assertEqual(keyword.arrival_rate, 5)
+        self.assertEqual(keyword.last_yield, 10)
+        self.assertEqual(keyword.adaptive_interval, 4 * 3600)
+        self.assertEqual(keyword.next_refresh_at, now + timedelta(hours=4))
+
+        # The next refresh finds nothing in four hours: the prediction is kept
+        # next to the yield, and the average falls towards the observation.
+        keyword.last_searched = since
+        later = since + timedelta(hours=4)
+        update_refresh_intervals([keyword], later, later)
+        keyword.refresh_from_db()
+        self.assertEqual(keyword.predicted_yield, 20)
+        self.assertEqual(keyword.last_yield, 0)
+        self.assertAlmostEqual(keyword.arrival_rate, 3.5)
+
+    def test_first_refresh_and_admin_interval_keep_their_schedule(self):
+        keyword = self.create_keyword()
+        now = timezone.now()
+        update_refresh_intervals([keyword], now, now)
+        keyword.refresh_from_db()
+        self.assertIsNone(keyword.arrival_rate)
+        self.assertEqual(keyword.next_refresh_at, now + timedelta(seconds=3600))
+
+        keyword.custom_refresh_interval = 600
+        keyword.last_searched = now - timedelta(hours=1)
+        update_refresh_intervals([keyword], now, now)
+        keyword.refresh_from_db()
+        self.assertEqual(keyword.next_refresh_at, now + timedelta(seconds=600))
+
+
+@override_settings(NEWS_REFRESH_LEASE_SECONDS=60, NEWS_REFRESH_CLAIM_SIZE=10, NEWS_REFRESH_MAX_INTERVAL=12 * 3600)
+class RefreshQueueTests(NewsTestCase):
+    """Due keywords are queued as jobs that workers lease, and reclaim when a worker dies."""
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.keywords = [self.create_keyword('Tesla', username='ann'), self.create_keyword('tesla', username='bob')]
+        Keyword.objects.update(next_refresh_at=self.now - timedelta(minutes=5))
+
+    def test_users_tracking_one_search_share_a_job(self):
+        self.assertEqual(enqueue_due_keywords(now=self.now), 1)
+        job, = RefreshJob.objects.all()
+        self.assertEqual((job.text, job.language), ('tesla', 'en'))
+        self.assertEqual(job.keyword_ids, sorted(keyword.id for keyword in self.keywords))
+        # Queuing again while the keywords are still due doesn't add a job.
+        self.assertEqual(enqueue_due_keywords(now=self.now), 0)
+        self.assertEqual(RefreshJob.objects.count(), 1)
+
+    def test_expired_lease_is_taken_over(self):
+        enqueue_due_keywords(now=self.now)
+        first = Lease('worker-1', claim_jobs('worker-1', now=self.now))
+        self.assertEqual(claim_jobs('worker-2', now=self.now + timedelta(seconds=30)), [])
+
+        # worker-1 stopped renewing its lease, so worker-2 takes the job over.
+        job, = claim_jobs('worker-2', now=self.now + timedelta(seconds=61))
+        self.assertEqual(job.attempts, 2)
+        second = Lease('worker-2', [job])
+        self.assertFalse(first.holds('tesla', 'en'))
+        self.assertTrue(second.holds('tesla', 'en'))
+
+        # The first worker can't finish a job it lost; the one holding it can.
+        first.finish()
+        self.assertTrue(RefreshJob.objects.exists())
+        second.finish('tesla', 'en')
+        self.assertFalse(RefreshJob.objects.exists())
+
+    def test_renewed_lease_is_kept_and_released_job_is_free(self):
+        enqueue_due_keywords(now=self.now)
+        claim_jobs('worker-1', now=self.now)
+        self.assertEqual(renew_leases('worker-1', now=self.now + timedelta(seconds=50)), 1)
+        self.assertEqual(claim_jobs('worker-2', now=self.now + timedelta(seconds=61)), [])
+
+        self.assertEqual(release_jobs('worker-1'), 1)
+        self.assertEqual(len(claim_jobs('worker-2', now=self.now + timedelta(seconds=61))), 1)
+
+    def test_job_is_dropped_after_its_attempts(self):
+        enqueue_due_keywords(now=self.now)
+        claim_at = self.now
+        for _ in range(MAX_ATTEMPTS):
+            self.assertEqual(len(claim_jobs('worker', now=claim_at)), 1)
+            claim_at += timedelta(seconds=61)
+
+        self.assertEqual(claim_jobs('worker', now=claim_at), [])
+        self.assertFalse(RefreshJob.objects.exists())
+        for keyword in Keyword.objects.all():
+            self.assertEqual(keyword.next_refresh_at, claim_at + timedelta(hours=12))
+
+
+@override_settings(NEWS_LIVE_POLL_INTERVAL=0.05)
+class LiveStreamTests(NewsTransactionTestCase):
+    """Stored articles are published to an event log and streamed to the keyword's page."""
+
+    def setUp(self):
+        super().setUp()
+        self.keyword = self.create_keyword()
+        self.client.force_login(self.keyword.user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def stream(self, cookie, path=None, query=b'', during=None):
+        """
+        Requests a stream through `LiveStreamApplication` and returns the
+        response status and body once an `articles` event arrived, running
+        `during` in a thread after the stream opened.
+        """
+        async def run():
+            messages = []
+            received = asyncio.Event()
+
+            async def inner(scope, receive, send):
+                await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+                await send({'type': 'http.response.body', 'body': b'django'})
+
+            async def receive():
+                await received.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                body = message.get('body', b'')
+                if b'retry:' in body and during:
+                    # Let the hub start reading before publishing.
+                    await asyncio.sleep(0.2)
+                    await asyncio.to_thread(during)
+                if b'event: articles' in body or not message.get('more_body', True):
+                    received.set()
+
+            scope = {
+                'type': 'http', 'method': 'GET', 'query_string': query,
+                'path': path or reverse('keyword_live', args=[self.keyword.id]),
+                'headers': [(b'cookie', cookie.encode())],
+            }
+            await asyncio.wait_for(live.LiveStreamApplication(inner)(scope, receive, send), 5)
+            return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:]).decode()
+        return asyncio.run(run())
+
+    def test_ingest_publishes_new_links_once(self):
+        ingest_articles(self.keyword, [article_record(n) for n in range(2)], 'en')
+        ingest_articles(self.keyword, [article_record(n) for n in range(2)], 'en')
+
+        event, = live.get_article_events().read(0)
+        self.assertEqual((event.keyword_id, event.language), (self.keyword.id, 'en'))
+        self.assertEqual(
+            sorted(event.article_ids), sorted(NewsArticle.objects.values_list('id', flat=True))
+        )
+        self.assertEqual(live.get_article_events().read(event.id), [])
+
+    def test_reconnecting_client_catches_up(self):
+        ingest_articles(self.keyword, [article_record(0)], 'en')
+        status, body = self.stream(self.cookie, query=b'language=en&after=0')
+        self.assertEqual(status, 200)
+        self.assertIn('retry: 5000', body)
+        self.assertIn('id: 1\nevent: articles\n', body)
+        self.assertIn('https://example.com/tesla/0', body)
+
+    def test_new_articles_are_pushed_to_open_streams(self):
+        status, body = self.stream(
+            self.cookie, query=b'language=en',
+            during=lambda: ingest_articles(self.keyword, [article_record(0)], 'en'),
+        )
+        self.assertEqual(status, 200)
+        self.assertIn('event: articles', body)
+        self.assertIn('tesla story 0', body)
+
+    def test_other_users_and_urls(self):
+        status, _ = self.stream('')
+        self.assertEqual(status, 403)
+        other = self.create_keyword('nasa', username='someone else')
+        status, _ = self.stream(self.cookie, path=reverse('keyword_live', args=[other.id]))
+        self.assertEqual(status, 403)
+        # Every other request goes to Django.
+        self.assertEqual(self.stream(self.cookie, path=reverse('feed')), (200, 'django'))
+
+
+class SourceTests(NewsTestCase):
+    """Source names are stored once, and the keyword page filters and counts by source id."""
+
+    def setUp(self):
+        super().setUp()
+        self.keyword = self.create_keyword()
+        sources = ['BBC News', 'BBC News', 'Reuters', 'BBC News', 'Wired']
+        ingest_articles(
+            self.keyword, [article_record(n, source=source) for n, source in enumerate(sources)], 'en'
+        )
+        self.source_ids = dict(Source.objects.values_list('name', 'id'))
+
+    def test_sources_are_interned_once(self):
+        self.assertEqual(sorted(self.source_ids), ['BBC News', 'Reuters', 'Wired'])
+        self.assertEqual(intern_sources(['Reuters', 'AP']), {
+            'Reuters': self.source_ids['Reuters'], 'AP': Source.objects.get(name='AP').id,
+        })
+        self.assertEqual(Source.objects.count(), 4)
+        # Links carry their article's source for the page's filter.
+        for link in KeywordArticle.objects.select_related('article'):
+            self.assertEqual(link.source_id, link.article.source_id)
+
+    def test_facets_come_from_the_statistics(self):
+        stats = list(self.keyword.stats.all())
+        with self.assertNumQueries(1):
+            facets = source_facets(stats)
+        self.assertEqual(
+            [(source.name, count) for source, count in facets], [('BBC News', 3), ('Reuters', 1), ('Wired', 1)]
+        )
+        # The selected source stays offered however small its count.
+        facets = source_facets(stats, selected=self.source_ids['Wired'], limit=1)
+        self.assertEqual([(source.name, count) for source, count in facets], [('BBC News', 3), ('Wired', 1)])
+
+    def test_keyword_page_filters_by_source(self):
+        self.client.force_login(self.keyword.user)
+        url = reverse('keyword_articles', args=[self.keyword.id])
+        response = self.client.get(url, {'source': self.source_ids['Reuters']})
+        self.assertContains(response, 'https://example.com/tesla/2')
+        self.assertNotContains(response, 'https://example.com/tesla/0')
+        self.assertContains(response, 'BBC News (3)')
+
+        response = self.client.get(url, {'source_name': 'wir'})
+        self.assertContains(response, 'https://example.com/tesla/4')
+        self.assertNotContains(response, 'https://example.com/tesla/2')
@@ -0,0 +1,216 @@
+"""
+Trending keyword counters.
+
+`TrendingKeyword` holds one row per normalized keyword text with its number
+of subscribers and its article velocity. Subscribers are counted by the
+Keyword signals in `news.signals`; velocity is updated by `ingest_articles`
+with the articles newly linked to each text.
+
+Velocity uses forward exponential decay. An article published at `t` adds
+`exp((t - EPOCH) / tau)` to a window's sum, and the score at `now` is that
+sum times `exp(-(now - EPOCH) / tau)`, i.e. the sum over articles of
+`exp(-(now - t) / tau)`: roughly the number of articles in the last `tau`,
+with older ones fading out instead of dropping off a cliff. The sums never
+need decaying in the database, and since the factor for `now` is the same for
+every row, ordering by the stored sum is ordering by the current score. Sums
+are stored as logarithms so they don't overflow.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Keyword, KeywordArticle, TrendingKeyword
+from .utils import normalize_keyword_text
+
+# Fixed reference time for the forward-decayed sums. Never change it without
+# rebuilding the scores.
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+# Time constant of each velocity window, in seconds.
+WINDOWS = {
+    '1h': 3600,
+    '24h': 24 * 3600,
+    '7d': 7 * 24 * 3600,
+}
+SUBSCRIBERS = 'subscribers'
+
+
+class TrendingEntry(NamedTuple):
+    """
+    One keyword text on the trending dashboard.
+
+    Attributes:
+        text (str): The normalized keyword text.
+        subscriber_count (int): Number of users tracking the text.
+        scores (dict): Current decayed article count per window name.
+    """
+    text: str
+    subscriber_count: int
+    scores: dict
+
+
+def score_field(window):
+    """Returns the TrendingKeyword field holding a window's log score."""
+    return f'log_score_{window}'
+
+
+def log_add(a, b):
+    """Returns log(exp(a) + exp(b)) without overflow; None stands for log(0)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def event_log_weight(when, window):
+    """Returns the log of the forward-decay weight of an event at `when`."""
+    return (when - EPOCH).total_seconds() / WINDOWS[window]
+
+
+def current_score(log_score, window, now=None):
+    """Converts a stored log score into the decayed article count at `now`."""
+    if log_score is None:
+        return 0.0
+    now = now or timezone.now()
+    return math.exp(log_score - event_log_weight(now, window))
+
+
+def record_subscriber(text, delta):
+    """Adds `delta` (1 or -1) to the subscriber count of a keyword text."""
+    text = normalize_keyword_text(text)
+    TrendingKeyword.objects.bulk_create([TrendingKeyword(text=text)], ignore_conflicts=True)
+    TrendingKeyword.objects.filter(text=text).update(
+        subscriber_count=Greatest(F('subscriber_count') + delta, Value(0))
+    )
+
+
+def record_articles(keywords, links, existing_links, now=None):
+    """
+    Adds newly linked articles to the velocity of their keyword texts.
+
+    An article counts once per text, however many users' keywords it is
+    linked to: links to an article some keyword with the same text already
+    had are ignored. Must be called inside the transaction that created the
+    links.
+
+    Args:
+        keywords (list): The keywords the links were created for.
+        links (list): The new KeywordArticle instances.
+        existing_links (set): (keyword id, article id) pairs that existed
+            before the links were created.
+        now (datetime): The current time; articles dated later count as now.
+    """
+    if not links:
+        return
+    now = now or timezone.now()
+    text_by_keyword = {keyword.id: normalize_keyword_text(keyword.keyword) for keyword in keywords}
+
+    published = defaultdict(dict)
+    for link in links:
+        published[text_by_keyword[link.keyword_id]][link.article_id] = min(link.published_at, now)
+
+    known = {(text_by_keyword[keyword_id], article_id) for keyword_id, article_id in existing_links}
+    # Other users' keywords with the same text may have the articles already.
+    # Texts are compared normalized, as a keyword saved in the admin may not be.
+    known.update(
+        (normalize_keyword_text(text), article_id)
+        for text, article_id in KeywordArticle.objects.filter(
+            article_id__in={article_id for articles in published.values() for article_id in articles},
+        ).exclude(keyword_id__in=list(text_by_keyword)).values_list('keyword__keyword', 'article_id').distinct()
+    )
+
+    increments = {}
+    for text, articles in published.items():
+        dates = [published_at for article_id, published_at in articles.items() if (text, article_id) not in known]
+        if dates:
+            increments[text] = dates
+    if not increments:
+        return
+
+    TrendingKeyword.objects.bulk_create(
+        [TrendingKeyword(text=text) for text in increments], ignore_conflicts=True
+    )
+    rows = list(TrendingKeyword.objects.select_for_update().filter(text__in=list(increments)))
+    for row in rows:
+        dates = increments[row.text]
+        for window in WINDOWS:
+            log_score = getattr(row, score_field(window))
+            for published_at in dates:
+                log_score = log_add(log_score, event_log_weight(published_at, window))
+            setattr(row, score_field(window), log_score)
+        newest = max(dates)
+        if row.last_article_at is None or newest > row.last_article_at:
+            row.last_article_at = newest
+    TrendingKeyword.objects.bulk_update(
+        rows, [score_field(window) for window in WINDOWS] + ['last_article_at']
+    )
+
+
+def top_trending(window='24h', limit=10, now=None):
+    """
+    Returns the top `limit` keyword texts by velocity in `window`, or by
+    subscriber count if `window` is 'subscribers'. Each ranking is served by
+    an index on its column, so the cost doesn't grow with the number of texts.
+
+    Returns:
+        list: TrendingEntry tuples, highest first.
+    """
+    rows = TrendingKeyword.objects.filter(subscriber_count__gt=0)
+    if window == SUBSCRIBERS:
+        rows = rows.order_by('-subscriber_count', 'text')
+    else:
+        field = score_field(window)
+        rows = rows.filter(**{f'{field}__isnull': False}).order_by(f'-{field}')
+
+    now = now or timezone.now()
+    return [
+        TrendingEntry(
+            text=row.text,
+            subscriber_count=row.subscriber_count,
+            scores={name: current_score(getattr(row, score_field(name)), name, now) for name in WINDOWS},
+        )
+        for row in rows[:limit]
+    ]
+
+
+def rebuild_trending(now=None):
+    """
+    Recomputes every TrendingKeyword row from the keywords and their links.
+
+    Returns:
+        int: The number of rows written.
+    """
+    now = now or timezone.now()
+    rows = {}
+    for user_id, text in set(
+        (user_id, normalize_keyword_text(text)) for user_id, text in Keyword.objects.values_list('user_id', 'keyword')
+    ):
+        row = rows.setdefault(text, TrendingKeyword(text=text))
+        row.subscriber_count += 1
+
+    counted = set()
+    links = KeywordArticle.objects.values_list('keyword__keyword', 'article_id', 'published_at')
+    for text, article_id, published_at in links.iterator(chunk_size=5000):
+        text = normalize_keyword_text(text)
+        if (text, article_id) in counted:
+            continue
+        counted.add((text, article_id))
+        row = rows.setdefault(text, TrendingKeyword(text=text))
+        published_at = min(published_at, now)
+        for window in WINDOWS:
+            field = score_field(window)
+            setattr(row, field, log_add(getattr(row, field), event_log_weight(published_at, window)))
+        if row.last_article_at is None or published_at > row.last_article_at:
+            row.last_article_at = published_at
+
+    with transaction.atomic():
+        TrendingKeyword.objects.all().delete()
+        TrendingKeyword.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
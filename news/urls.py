@@ -1,8 +1,17 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('feed/', views.feed, name='feed'),
+    path('search/', views.search_archive, name='search_archive'),
     path('keyword/<int:keyword_id>/', views.keyword_articles, name='keyword_articles'),
     path('keyword/<int:keyword_id>/refresh/', views.refresh_articles, name='refresh_articles'),
-]
\ No newline at end of file
+    path('keyword/<int:keyword_id>/status/', views.keyword_fetch_status, name='keyword_fetch_status'),
+    path('keyword/<int:keyword_id>/live/', views.keyword_live, name='keyword_live'),
+    path('metrics', views.prometheus_metrics, name='prometheus_metrics'),
+    path('api/v1/keywords/', api.keywords, name='api_keywords'),
+    path('api/v1/keywords/<int:keyword_id>/articles/', api.keyword_articles, name='api_keyword_articles'),
+    path('api/v1/keywords/<int:keyword_id>/refresh/', api.refresh_keyword, name='api_refresh_keyword'),
+    path('api/v1/export/', api.export_articles, name='api_export'),
+]
@@ -0,0 +1,6 @@
+def normalize_keyword_text(text):
+    """
+    Returns the canonical form of a keyword's text, used to recognise keywords
+    that different users track under the same search.
+    """
+    return ' '.join(text.lower().split())
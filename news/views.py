@@ -1,30 +1,37 @@
-import requests
+import hashlib
+import hmac
+from urllib.parse import urlencode
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
-from django.utils import timezone
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.urls import reverse
-from dateutil import parser
-from datetime import timedelta
-from .models import Keyword, NewsArticle
-
-# Mapping of language codes to full names
-LANGUAGE_MAP = {
-    'ar': 'Arabic',
-    'de': 'German',
-    'en': 'English',
-    'es': 'Spanish',
-    'fr': 'French',
-    'he': 'Hebrew',
-    'it': 'Italian',
-    'nl': 'Dutch',
-    'no': 'Norwegian',
-    'pt': 'Portuguese',
-    'ru': 'Russian',
-    'sv': 'Swedish',
-    'zh': 'Chinese',
-}
+from django.db.models import Count, Max, Sum
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .dedup import cluster_source_counts, hide_copies
+from .feed import matched_keywords
+from .models import FeedEntry, Keyword, KeywordArticle, KeywordStats, NewsArticle, Source
+from .interactive import fetch_and_save_articles
+from .languages import LANGUAGE_MAP, record_language_view
+from .live import get_article_events
+from .metrics import RENDER, get_metrics, live_samples, render_prometheus, timed
+from .pagination import paginate_keyset
+from .search import search_articles
+from .sources import source_facets
+from .tasks import is_first_search_pending, queue_first_search
+from .utils import normalize_keyword_text
+
+# Articles shown per page on the keyword articles page.
+ARTICLES_PER_PAGE = 24
+# The article columns the article cards need; `content` and the other article
+# fields are never loaded for a list.
+ARTICLE_FIELDS = ('title', 'description', 'url', 'url_to_image', 'source__name', 'published_at', 'cluster')
+# The same, loaded through a keyword's links or feed entries, plus their keyset columns.
+ARTICLE_CARD_FIELDS = ('published_at', 'article_id') + tuple(f'article__{field}' for field in ARTICLE_FIELDS)
 
 
 @login_required
@@ -34,7 +41,7 @@ def home(request):
     tracked keywords. Enforces a quota on the number of keywords a user can track.
     """
     if request.method == 'POST':
-        keyword_text = request.POST.get('keyword', '').strip().lower()
+        keyword_text = normalize_keyword_text(request.POST.get('keyword', ''))
         language = request.POST.get('language', 'en')
 
         if not keyword_text:
@@ -65,7 +72,14 @@ def home(request):
         redirect_url = f"{reverse('keyword_articles', args=[keyword.id])}?language={language}"
         return redirect(redirect_url)
 
-    keywords = Keyword.objects.filter(user=request.user).order_by('-created_at')
+    keywords = list(Keyword.objects.filter(user=request.user).order_by('-created_at'))
+    # Article counts come from the stats rows: one query for the whole list.
+    article_counts = dict(
+        KeywordStats.objects.filter(keyword__user=request.user)
+        .values('keyword').annotate(total=Sum('article_count')).values_list('keyword', 'total')
+    )
+    for keyword in keywords:
+        keyword.article_count = article_counts.get(keyword.id, 0)
     context = {
         'keywords': keywords,
         'language_map': LANGUAGE_MAP,
@@ -73,110 +87,361 @@ def home(request):
     return render(request, 'news/home.html', context)
 
 
-def _fetch_and_save_articles(keyword, fetch_only_new=False, language='en'):
+def filter_article_rows(rows, filter_params, default_language='en'):
     """
-    Helper function to fetch articles from the API and save them.
+    Filters KeywordArticle or FeedEntry rows by the keyword page filters:
+    `language` (`default_language` if missing, every language if empty),
+    `source` (a Source id), `source_name` (part of a source's name), and
+    `start_date` and `end_date` as ISO dates.
     """
-    api_key = settings.NEWS_API_KEY
-    if not api_key:
-        print("ERROR: News API key is not configured.")
-        return 0, "News API key is not configured."
+    language = filter_params.get('language', default_language).strip()
+    source_id = _source_id(filter_params)
+    source_name = filter_params.get('source_name', '').strip()
+    start_date = filter_params.get('start_date', '').strip()
+    end_date = filter_params.get('end_date', '').strip()
 
-    url = (f'https://newsapi.org/v2/everything?'
-           f'q="{keyword.keyword}"&'
-           f'language={language}&'
-           f'apiKey={api_key}&'
-           f'sortBy=publishedAt')
+    if language:
+        rows = rows.filter(language=language)
+    if source_id is not None:
+        rows = rows.filter(source_id=source_id)
+    if source_name:
+        # The name is matched in the small Source table, and the rows by id.
+        rows = rows.filter(source__in=Source.objects.filter(name__icontains=source_name))
+    if start_date:
+        rows = rows.filter(published_at__gte=start_date)
+    if end_date:
+        rows = rows.filter(published_at__lte=end_date)
+    return rows
 
-    if fetch_only_new:
-        latest_article = keyword.articles.filter(language=language).order_by('-published_at').first()
-        if latest_article:
-            from_date = (latest_article.published_at + timedelta(seconds=1)).isoformat()
-            url += f'&from={from_date}'
 
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"API Request failed: {e}")
-        return 0, f"Could not fetch news from the provider: {e}"
-
-    new_articles_found = 0
-    for article_data in data.get('articles', []):
-        if not NewsArticle.objects.filter(url=article_data['url']).exists():
-            try:
-                if not article_data.get('publishedAt'):
-                    continue
-
-                published_time = parser.isoparse(article_data['publishedAt'])
-
-                NewsArticle.objects.create(
-                    keyword=keyword,
-                    title=article_data.get('title'),
-                    description=article_data.get('description') or '',
-                    content=article_data.get('content') or '',
-                    url=article_data.get('url'),
-                    url_to_image=article_data.get('urlToImage'),
-                    published_at=published_time,
-                    source_name=article_data.get('source', {}).get('name', 'Unknown Source'),
-                    language=language
-                )
-                new_articles_found += 1
-            except Exception as e:
-                print(f"Could not save article '{article_data.get('title')}': {e}")
-
-    keyword.last_searched = timezone.now()
-    keyword.save()
-    return new_articles_found, None
+def _source_id(filter_params):
+    """Returns the Source id given as `source`, or None if missing or invalid."""
+    source = filter_params.get('source', '').strip()
+    return int(source) if source.isdigit() else None
+
+
+def _keyword_source_facets(keyword, language, stats, filter_params):
+    """
+    Returns the keyword page's source picker: the sources of the keyword's
+    articles in the listed language (all languages if empty) with their
+    article counts, read from the statistics rows.
+    """
+    if language:
+        stats_rows = [stats] if stats else []
+    else:
+        stats_rows = keyword.stats.all()
+    return source_facets(stats_rows, selected=_source_id(filter_params))
+
+
+def _keyword_page_state(request, keyword_id):
+    """
+    Returns the version, change time and article count of the requested
+    language of one of the user's keywords (all languages if none is given),
+    read with one query and kept on the request.
+    """
+    if not hasattr(request, '_keyword_page_state'):
+        rows = KeywordStats.objects.filter(keyword_id=keyword_id, keyword__user=request.user)
+        language = request.GET.get('language', 'en').strip()
+        if language:
+            rows = rows.filter(language=language)
+        request._keyword_page_state = rows.aggregate(
+            version=Sum('version'), rows=Count('id'), changed_at=Max('changed_at'), articles=Sum('article_count')
+        )
+    return request._keyword_page_state
+
+
+def _keyword_page_etag(request, keyword_id):
+    """
+    The keyword page's ETag: its statistics version, and a digest of the URL
+    and session so each user and query has its own. None while the first
+    search is pending or a message is waiting to be shown.
+    """
+    state = _keyword_page_state(request, keyword_id)
+    if not state['articles'] or len(messages.get_messages(request)):
+        return None
+    # A 304 doesn't reach the view, but is still a view of the language.
+    record_language_view(keyword_id, request.GET.get('language', 'en').strip())
+    digest = hashlib.md5(f'{request.session.session_key}:{request.get_full_path()}'.encode()).hexdigest()
+    return f"{keyword_id}-{state['version']}.{state['rows']}-{digest}"
+
+
+def _keyword_page_last_modified(request, keyword_id):
+    """The keyword page's Last-Modified: when its articles last changed."""
+    state = _keyword_page_state(request, keyword_id)
+    if not state['articles'] or len(messages.get_messages(request)):
+        return None
+    return state['changed_at']
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_keyword_page_etag, last_modified_func=_keyword_page_last_modified)
 def keyword_articles(request, keyword_id):
     """
     Displays articles for a specific keyword, with sorting and filtering.
+
+    Articles are paged with keyset cursors over the keyword's links, ordered by
+    (published_at, article id), and only the columns shown on the cards are
+    loaded. Syndicated copies of a story are collapsed into one card unless
+    `copies=all` is given.
+
+    The page only changes when the keyword's statistics version does, so it
+    is sent with an ETag and Last-Modified for conditional requests, and the
+    rendered cards and page links are cached under that version.
     """
     keyword = get_object_or_404(Keyword, id=keyword_id, user=request.user)
 
     filter_params = request.GET.copy()
     language = filter_params.get('language', 'en').strip()
+    links = filter_article_rows(KeywordArticle.objects.filter(keyword=keyword), filter_params)
+    # The background refresh fetches the languages the keyword is viewed in.
+    record_language_view(keyword.id, language)
 
-    if not keyword.articles.filter(language=language).exists():
-        new_count, error_message = _fetch_and_save_articles(keyword, language=language)
-        if error_message:
-            messages.error(request, error_message)
-        elif new_count > 0:
-            messages.success(request,
-                             f"Found {new_count} articles in {LANGUAGE_MAP.get(language, '')} for '{keyword.keyword}'.")
+    stats = keyword.stats.filter(language=language).first() if language else None
 
-    articles_queryset = keyword.articles.all()
-    source_name = filter_params.get('source_name', '').strip()
-    start_date = filter_params.get('start_date', '').strip()
-    end_date = filter_params.get('end_date', '').strip()
-
-    if source_name:
-        articles_queryset = articles_queryset.filter(source_name__icontains=source_name)
-    if language:
-        articles_queryset = articles_queryset.filter(language=language)
-    if start_date:
-        articles_queryset = articles_queryset.filter(published_at__gte=start_date)
-    if end_date:
-        articles_queryset = articles_queryset.filter(published_at__lte=end_date)
+    # The first search for a language runs in the background; the page renders
+    # straight away and polls `keyword_fetch_status` until it finishes. A
+    # search that found nothing is not repeated within the search cooldown.
+    fetching = False
+    if language in LANGUAGE_MAP and not (stats and stats.article_count) and not keyword.search_cooldown_left():
+        queue_first_search(keyword.id, language)
+        fetching = True
 
     sort_option = filter_params.get('sort', 'newest')
-    if sort_option == 'oldest':
-        articles = articles_queryset.order_by('published_at')
-    else:
-        articles = articles_queryset.order_by('-published_at')
+    search_query = filter_params.get('q', '').strip()
+    if search_query:
+        return _render_search_results(
+            request, 'news/keyword_articles.html', search_query, links.values('article_id'), {
+                'keyword': keyword,
+                'current_sort': sort_option,
+                'language_map': LANGUAGE_MAP,
+                'filter_params': filter_params,
+                'fetching': fetching,
+                'stats': stats,
+                'source_facets': _keyword_source_facets(keyword, language, stats, filter_params),
+                'language': language,
+                'language_name': LANGUAGE_MAP.get(language, language),
+            })
+
+    show_copies = filter_params.get('copies') == 'all'
+    # Pagination links keep the filters and sort but not the current cursor.
+    page_params = filter_params.copy()
+    page_params.pop('after', None)
+    page_params.pop('before', None)
+
+    state = _keyword_page_state(request, keyword.id)
+    cache_key = None
+    if state['articles']:
+        query = hashlib.md5(filter_params.urlencode().encode()).hexdigest()
+        cache_key = f"keyword-articles:{keyword.id}:{state['version']}.{state['rows']}:{query}"
+    article_list = cache.get(cache_key) if cache_key else None
+    if cache_key:
+        get_metrics().inc('news_page_cache_total', result='miss' if article_list is None else 'hit')
+    if article_list is None:
+        listed = links if show_copies else hide_copies(links, links)
+        page = paginate_keyset(
+            listed.select_related('article__source').only(*ARTICLE_CARD_FIELDS),
+            sort_field='published_at',
+            id_field='article_id',
+            per_page=ARTICLES_PER_PAGE,
+            descending=sort_option != 'oldest',
+            after=filter_params.get('after'),
+            before=filter_params.get('before'),
+        )
+        articles = [link.article for link in page.items]
+        if not show_copies:
+            _attach_source_counts(links, articles)
+        with timed(RENDER):
+            article_list = render_to_string('news/_keyword_article_list.html', {
+                'articles': articles,
+                'page': page,
+                'page_query': page_params.urlencode(),
+            }, request=request)
+        if cache_key:
+            cache.set(cache_key, article_list, settings.NEWS_PAGE_CACHE_TIMEOUT)
+
+    # New articles are streamed into the first page of the unfiltered,
+    # newest-first list, where they belong at the top.
+    live_url = None
+    if sort_option != 'oldest' and not any(
+        filter_params.get(name) for name in filter_params if name not in ('language', 'sort', 'copies')
+    ):
+        live_url = f"{reverse('keyword_live', args=[keyword.id])}?" + urlencode({
+            'language': language, 'after': get_article_events().last_id(),
+        })
 
     context = {
         'keyword': keyword,
-        'articles': articles,
+        'article_list': article_list,
+        'live_url': live_url,
+        'show_copies': show_copies,
+        'copies_query': _toggle_copies(page_params),
         'current_sort': sort_option,
         'language_map': LANGUAGE_MAP,
         'filter_params': filter_params,
+        'fetching': fetching,
+        'stats': stats,
+        'source_facets': _keyword_source_facets(keyword, language, stats, filter_params),
+        'language': language,
+        'language_name': LANGUAGE_MAP.get(language, language),
     }
-    return render(request, 'news/keyword_articles.html', context)
+    with timed(RENDER):
+        return render(request, 'news/keyword_articles.html', context)
+
+
+@login_required
+def feed(request):
+    """
+    Displays the newest articles across all the user's keywords.
+
+    Pages are read with keyset cursors from the user's precomputed feed
+    entries, where an article matching several keywords appears once, and
+    each card lists the keywords that matched it. Syndicated copies are
+    collapsed as on the keyword page.
+    """
+    filter_params = request.GET.copy()
+    language = filter_params.get('language', '').strip()
+
+    entries = FeedEntry.objects.filter(user=request.user)
+    if language:
+        entries = entries.filter(language=language)
+    show_copies = filter_params.get('copies') == 'all'
+    listed = entries if show_copies else hide_copies(entries, entries)
+    page = paginate_keyset(
+        listed.select_related('article__source').only(*ARTICLE_CARD_FIELDS),
+        sort_field='published_at',
+        id_field='article_id',
+        per_page=ARTICLES_PER_PAGE,
+        after=filter_params.get('after'),
+        before=filter_params.get('before'),
+    )
+
+    matches = matched_keywords(request.user, [entry.article_id for entry in page.items])
+    articles = []
+    for entry in page.items:
+        entry.article.matched_keywords = matches.get(entry.article_id, [])
+        articles.append(entry.article)
+    if not show_copies:
+        _attach_source_counts(entries, articles)
+
+    page_params = filter_params.copy()
+    page_params.pop('after', None)
+    page_params.pop('before', None)
+
+    context = {
+        'articles': articles,
+        'page': page,
+        'show_copies': show_copies,
+        'copies_query': _toggle_copies(page_params),
+        'page_query': page_params.urlencode(),
+        'language_map': LANGUAGE_MAP,
+        'filter_params': filter_params,
+    }
+    with timed(RENDER):
+        return render(request, 'news/feed.html', context)
+
+
+def _toggle_copies(page_params):
+    """Returns the query string switching a list between collapsed and all copies."""
+    params = page_params.copy()
+    if params.get('copies') == 'all':
+        params.pop('copies')
+    else:
+        params['copies'] = 'all'
+    return params.urlencode()
+
+
+def _attach_source_counts(scope, articles):
+    """
+    Sets `cluster_sources` on each article to the number of sources within
+    `scope` that carried its story, for the "N sources" badge.
+    """
+    counts = cluster_source_counts(scope, articles)
+    for article in articles:
+        article.cluster_sources = counts[article.id]
+
+
+@login_required
+def search_archive(request):
+    """
+    Full-text search across the stored articles of all the user's keywords,
+    ranked by relevance. Does not call the News API.
+    """
+    filter_params = request.GET.copy()
+    search_query = filter_params.get('q', '').strip()
+    language = filter_params.get('language', '').strip()
+
+    links = KeywordArticle.objects.filter(keyword__user=request.user)
+    if language:
+        links = links.filter(language=language)
+
+    context = {
+        'language_map': LANGUAGE_MAP,
+        'filter_params': filter_params,
+    }
+    if not search_query:
+        return render(request, 'news/search.html', dict(context, articles=[]))
+    return _render_search_results(request, 'news/search.html', search_query, links.values('article_id'), context)
+
+
+def _render_search_results(request, template_name, search_query, scope, context):
+    """
+    Renders one page of ranked full-text search results within `scope`, a
+    `values('article_id')` queryset. Pages are numbered, since results are
+    ordered by rank rather than a keyset.
+    """
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+
+    article_ids = search_articles(
+        search_query,
+        scope,
+        limit=ARTICLES_PER_PAGE + 1,
+        offset=(page_number - 1) * ARTICLES_PER_PAGE,
+    )
+    has_next = len(article_ids) > ARTICLES_PER_PAGE
+    article_ids = article_ids[:ARTICLES_PER_PAGE]
+    articles_by_id = NewsArticle.objects.select_related('source').only(*ARTICLE_FIELDS).in_bulk(article_ids)
+
+    page_params = request.GET.copy()
+    page_params.pop('page', None)
+    context.update({
+        'articles': [articles_by_id[article_id] for article_id in article_ids if article_id in articles_by_id],
+        'search_query': search_query,
+        'page_query': page_params.urlencode(),
+        'page_number': page_number,
+        'previous_page_number': page_number - 1 if page_number > 1 else None,
+        'next_page_number': page_number + 1 if has_next else None,
+    })
+    return render(request, template_name, context)
+
+
+@login_required
+def keyword_fetch_status(request, keyword_id):
+    """
+    Reports whether the background first search for a keyword and language is
+    still pending, and how many articles are stored for it. Polled by the
+    keyword articles page while it shows the fetching state.
+    """
+    keyword = get_object_or_404(Keyword, id=keyword_id, user=request.user)
+    language = request.GET.get('language', 'en').strip()
+    stats = keyword.stats.filter(language=language).first()
+    return JsonResponse({
+        'pending': is_first_search_pending(keyword.id, language),
+        'article_count': stats.article_count if stats else 0,
+    })
+
+
+def keyword_live(request, keyword_id):
+    """
+    The URL of a keyword's live article stream. Streams are served by
+    `news.live.LiveStreamApplication`, which `asgi.py` puts in front of
+    Django, so a request only gets here under WSGI (e.g. runserver). The
+    204 tells the browser not to reconnect; the page then works as before.
+    """
+    return HttpResponse(status=204)
 
 
 @login_required
@@ -187,17 +452,14 @@ def refresh_articles(request, keyword_id):
     keyword = get_object_or_404(Keyword, id=keyword_id, user=request.user)
     language = request.GET.get('language', 'en')
 
-    if keyword.last_searched:
-        throttle_period = timedelta(minutes=15)
-        time_since_last_search = timezone.now() - keyword.last_searched
-
-        if time_since_last_search < throttle_period:
-            minutes_left = int((throttle_period - time_since_last_search).total_seconds() / 60) + 1
-            messages.warning(request, f"You recently searched. Please wait {minutes_left} more minute(s).")
-            return redirect('keyword_articles', keyword_id=keyword.id)
+    cooldown_left = keyword.search_cooldown_left()
+    if cooldown_left:
+        minutes_left = int(cooldown_left.total_seconds() / 60) + 1
+        messages.warning(request, f"You recently searched. Please wait {minutes_left} more minute(s).")
+        return redirect('keyword_articles', keyword_id=keyword.id)
 
     messages.info(request, f"Checking for new articles in {LANGUAGE_MAP.get(language, '')} for '{keyword.keyword}'...")
-    new_count, error_message = _fetch_and_save_articles(keyword, fetch_only_new=True, language=language)
+    new_count, error_message = fetch_and_save_articles(keyword, fetch_only_new=True, language=language)
 
     if error_message:
         messages.error(request, error_message)
@@ -208,3 +470,15 @@ def refresh_articles(request, keyword_id):
 
     redirect_url = f"{reverse('keyword_articles', args=[keyword.id])}?language={language}"
     return redirect(redirect_url)
+
+
+def prometheus_metrics(request):
+    """
+    Serves the metrics of `news.metrics` in the Prometheus text format. When
+    NEWS_METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    """
+    token = settings.NEWS_METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized', status=401, headers={'WWW-Authenticate': 'Bearer'})
+    body = render_prometheus(get_metrics().samples(), live_samples())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'news_search_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Serves the keyword pages' live article
+# streams itself and hands everything else to Django.
+from news.live import LiveStreamApplication  # noqa: E402
+
+application = LiveStreamApplication(django_application)
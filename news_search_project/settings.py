@@ -52,6 +52,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'news.middleware.RequestMetricsMiddleware',
+    'news.middleware.QueryCountMiddleware',
 ]
 
 ROOT_URLCONF = 'news_search_project.urls'
@@ -78,12 +80,50 @@ WSGI_APPLICATION = 'news_search_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The database profile is chosen with DATABASE_ENGINE. 'postgresql' reads the
+# connection from the POSTGRES_* variables and needs `pip install "psycopg[binary]"`.
+# 'sqlite' (the default) tunes the file for the web process and the
+# process_tasks worker sharing it: WAL lets readers run while the worker
+# writes, IMMEDIATE transactions take the write lock up front so a writer
+# waits for the busy timeout instead of failing with "database is locked",
+# and synchronous=NORMAL is safe under WAL. Both profiles reuse connections for
+# DATABASE_CONN_MAX_AGE seconds and check them before reuse.
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', 60))
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'news_search'),
+            'USER': os.getenv('POSTGRES_USER', 'news_search'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a connection waits for the write lock.
+                'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -128,9 +168,93 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # News API Configuration
+# Where articles are fetched from (see news/providers/). Set NEWS_PROVIDER to
+# 'news.providers.stub.StubProvider' to serve synthetic articles offline for load tests.
+NEWS_PROVIDER = {
+    'BACKEND': os.getenv('NEWS_PROVIDER', 'news.providers.newsapi.NewsAPIProvider'),
+    'OPTIONS': {},
+}
 NEWS_API_BASE_URL = 'https://newsapi.org/v2/'
 NEWS_API_KEY = os.getenv('NEWS_API_KEY')
 SEARCH_COOLDOWN_MINUTES = 15
+# Default background refresh interval in seconds for keywords without a custom one
+REFRESH_INTERVAL_GLOBAL = int(os.getenv('BACKGROUND_TASK_REFRESH_INTERVAL', 3600))
+# Adaptive refresh intervals (see news/cadence.py): each keyword is refreshed
+# about as often as it gathers NEWS_REFRESH_TARGET_YIELD new articles, within
+# these bounds in seconds. An admin's custom interval overrides them.
+NEWS_REFRESH_TARGET_YIELD = int(os.getenv('NEWS_REFRESH_TARGET_YIELD', 20))
+NEWS_REFRESH_MIN_INTERVAL = int(os.getenv('NEWS_REFRESH_MIN_INTERVAL', 900))
+NEWS_REFRESH_MAX_INTERVAL = int(os.getenv('NEWS_REFRESH_MAX_INTERVAL', 12 * 3600))
+# Keywords are refreshed in the background in each language viewed within this
+# many days (see news/languages.py).
+NEWS_REFRESH_LANGUAGE_DAYS = int(os.getenv('NEWS_REFRESH_LANGUAGE_DAYS', 14))
+# Refresh workers (see news/refresh_queue.py) claim this many (keyword text,
+# language) jobs at a time and lease them for this many seconds, renewing the
+# lease while they work; a dead worker's jobs are reclaimed once it expires.
+NEWS_REFRESH_CLAIM_SIZE = int(os.getenv('NEWS_REFRESH_CLAIM_SIZE', 50))
+NEWS_REFRESH_LEASE_SECONDS = int(os.getenv('NEWS_REFRESH_LEASE_SECONDS', 120))
+# Background refresh fetcher: requests in flight, per-request timeout (seconds)
+# and the global request rate allowed by the NewsAPI plan (0 disables limiting).
+NEWS_FETCH_CONCURRENCY = int(os.getenv('NEWS_FETCH_CONCURRENCY', 8))
+NEWS_API_TIMEOUT = float(os.getenv('NEWS_API_TIMEOUT', 10))
+NEWS_API_REQUESTS_PER_SECOND = float(os.getenv('NEWS_API_REQUESTS_PER_SECOND', 5))
+# Upstream governor shared by every process (see news/governor.py): calls per UTC
+# day allowed by the plan (0 for no limit), the share of the rate and quota kept
+# for user-triggered searches (0 to 1), and retries after a 429 or server error.
+NEWS_API_GOVERNOR_PATH = BASE_DIR / 'governor.sqlite3'
+NEWS_API_DAILY_QUOTA = int(os.getenv('NEWS_API_DAILY_QUOTA', 0))
+NEWS_API_INTERACTIVE_SHARE = float(os.getenv('NEWS_API_INTERACTIVE_SHARE', 0.2))
+NEWS_API_MAX_RETRIES = int(os.getenv('NEWS_API_MAX_RETRIES', 3))
+# Fetches walk up to NEWS_FETCH_MAX_PAGES pages of NEWS_FETCH_PAGE_SIZE articles
+# per run; deeper pages are resumed on the next run (see news/backfill.py).
+NEWS_FETCH_PAGE_SIZE = int(os.getenv('NEWS_FETCH_PAGE_SIZE', 100))
+NEWS_FETCH_MAX_PAGES = int(os.getenv('NEWS_FETCH_MAX_PAGES', 5))
+# Cache of News API responses shared by all fetch paths (see news/fetch_cache.py).
+# Use 'news.fetch_cache.LocMemFetchCache' (without 'path') for a per-process cache.
+NEWS_FETCH_CACHE = {
+    'BACKEND': 'news.fetch_cache.SQLiteFetchCache',
+    'OPTIONS': {
+        'path': BASE_DIR / 'fetch_cache.sqlite3',
+        'max_entries': int(os.getenv('NEWS_FETCH_CACHE_MAX_ENTRIES', 512)),
+        'ttl': int(os.getenv('NEWS_FETCH_CACHE_TTL', 300)),
+    },
+}
+# Cache for rendered parts of pages. Keyword page entries are keyed by the
+# keyword's statistics version, so an ingest makes them unreachable and the
+# timeout only bounds their lifetime. Use Redis or Memcached here to share the
+# cache between web processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'news-pages',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+NEWS_PAGE_CACHE_TIMEOUT = int(os.getenv('NEWS_PAGE_CACHE_TIMEOUT', 600))
+# Articles are kept in full for this many days after publication (0 keeps them
+# forever) unless a keyword sets its own limit; then their description and
+# content move to monthly gzipped segments in NEWS_ARCHIVE_DIR (see news/retention.py).
+NEWS_RETENTION_DAYS = int(os.getenv('NEWS_RETENTION_DAYS', 90))
+NEWS_ARCHIVE_DIR = Path(os.getenv('NEWS_ARCHIVE_DIR', BASE_DIR / 'archive'))
+# Hot-path timings and counters (see news/metrics.py), buffered per process and
+# flushed every NEWS_METRICS_FLUSH_INTERVAL seconds to a file shared by every
+# process, and served on /metrics. Set NEWS_METRICS_TOKEN to require it as a
+# bearer token there.
+NEWS_METRICS_PATH = BASE_DIR / 'metrics.sqlite3'
+NEWS_METRICS_FLUSH_INTERVAL = float(os.getenv('NEWS_METRICS_FLUSH_INTERVAL', 10))
+NEWS_METRICS_TOKEN = os.getenv('NEWS_METRICS_TOKEN', '')
+# Live article streams (see news/live.py): new keyword links are published to
+# this file, shared by every process, and each ASGI process reads it every
+# NEWS_LIVE_POLL_INTERVAL seconds.
+NEWS_LIVE_PATH = BASE_DIR / 'live.sqlite3'
+NEWS_LIVE_POLL_INTERVAL = float(os.getenv('NEWS_LIVE_POLL_INTERVAL', 1))
+# Per-request query counter (see news/middleware.py): '' to turn it off, 'warn'
+# to print requests running one statement NEWS_QUERY_REPEAT_LIMIT times or more
+# (the N+1 pattern), or 'raise' to fail them, e.g. in tests.
+NEWS_QUERY_COUNTER = os.getenv('NEWS_QUERY_COUNTER', '')
+NEWS_QUERY_REPEAT_LIMIT = int(os.getenv('NEWS_QUERY_REPEAT_LIMIT', 5))
+# 'from' and 'to' dates are rounded to this many seconds so nearby queries share entries.
+NEWS_FETCH_CACHE_BUCKET = 900
 
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379'